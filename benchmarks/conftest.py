@@ -0,0 +1,30 @@
+"""Benchmark setup: import path for src/brainwash, and a minimal `benchmark` fixture when pytest-benchmark is absent.
+
+Run with:  python -m pytest benchmarks -s
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+_LIB = str(Path(__file__).resolve().parent.parent / "src" / "brainwash")
+if _LIB not in sys.path:
+    sys.path.insert(0, _LIB)
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+
+    @pytest.fixture
+    def benchmark(request):
+        """Single timed call, printed; same call signature as pytest-benchmark's fixture."""
+
+        def run(func, *args, **kwargs):
+            t0 = time.perf_counter()
+            result = func(*args, **kwargs)
+            print(f"\n{request.node.name}: {func.__name__} {time.perf_counter() - t0:.3f}s")
+            return result
+
+        return run
@@ -0,0 +1,215 @@
+"""Deterministic synthetic fEPSP recordings, written in every format parse.source2dfs reads.
+
+synthetic_sweeps() builds the voltage of every sweep: per stim a biphasic stim artefact,
+a fibre volley between two small positive peaks (the M-shape find_timepoints looks for)
+and a double-exponential EPSP, plus white noise. The same spec always gives the same
+recording, bit for bit. write_abf, write_ibw_folder, write_atf and write_csv store it;
+generate() writes one scale in all of them, by default into data_generated/.
+
+Run:  python benchmarks/synthetic_recordings.py small [--formats abf,csv] [--folder data_generated]
+"""
+
+from __future__ import annotations
+
+import argparse
+import struct
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyabf.abfWriter
+
+DATA_GENERATED = Path(__file__).resolve().parent.parent / "data_generated"
+FORMATS = ("abf", "ibw", "atf", "csv")
+RECORDING_START = pd.Timestamp("2024-01-01 09:00:00")
+# Igor stores creation dates in seconds since 1904-01-01; parse._ibw_results_to_df converts from 1900-01-01.
+_IGOR_EPOCH = pd.Timestamp("1900-01-01")
+
+
+@dataclass(frozen=True)
+class SyntheticSpec:
+    n_sweeps: int = 60
+    sample_rate: int = 10_000  # Hz
+    sweep_duration: float = 0.2  # s
+    stims: tuple = (0.01, 0.06)  # s within each sweep; paired pulses by default
+    n_channels: int = 1
+    sweep_interval: float = 10.0  # s between sweep starts
+    artefact_amp: float = 0.008  # V, negative lobe; the positive lobe is 3/4 of it
+    volley_amp: float = 0.0004  # V
+    epsp_amp: float = 0.002  # V, first stim; later stims are facilitated by paired_pulse_ratio
+    paired_pulse_ratio: float = 1.3
+    potentiation: float = 0.0  # EPSP growth over the recording, as a fraction of epsp_amp
+    noise: float = 0.00002  # V, white noise standard deviation
+    seed: int = 0
+
+    @property
+    def n_samples(self) -> int:
+        return int(round(self.sweep_duration * self.sample_rate))
+
+
+# Sweep counts at 0.1 Hz: ten minutes, two hours and twenty hours of recording.
+SCALES = {
+    "small": SyntheticSpec(n_sweeps=60),
+    "medium": SyntheticSpec(n_sweeps=720),
+    "huge": SyntheticSpec(n_sweeps=7200),
+}
+
+
+def _evoked_response(time: np.ndarray, t_stim: float, volley_amp: float, epsp_amp: float) -> np.ndarray:
+    # Volley: negative gaussian 1.5 ms after the stim, flanked by a small positive peak before it and
+    # the return to baseline after it; EPSP: double exponential from 2.5 ms, scaled to peak at -epsp_amp.
+    dt = time - t_stim
+    response = 0.3 * volley_amp * np.exp(-(((dt - 0.0008) / 0.0002) ** 2))
+    response -= volley_amp * np.exp(-(((dt - 0.0015) / 0.00025) ** 2))
+    tau_rise, tau_decay = 0.002, 0.008
+    t_peak = tau_rise * tau_decay / (tau_decay - tau_rise) * np.log(tau_decay / tau_rise)
+    norm = np.exp(-t_peak / tau_decay) - np.exp(-t_peak / tau_rise)
+    t_epsp = np.clip(dt - 0.0025, 0, None)
+    response -= epsp_amp * (np.exp(-t_epsp / tau_decay) - np.exp(-t_epsp / tau_rise)) / norm
+    return response
+
+
+def synthetic_sweeps(spec: SyntheticSpec) -> tuple[np.ndarray, dict]:
+    """(time, {channel: voltage}): the within-sweep time grid and a (n_sweeps, n_samples) float64 matrix in V per channel."""
+    time = np.arange(spec.n_samples) / spec.sample_rate
+    rng = np.random.default_rng(spec.seed)
+    growth = 1 + spec.potentiation * np.linspace(0, 1, spec.n_sweeps)
+    channels = {}
+    for channel in range(spec.n_channels):
+        scale = 1 - 0.25 * channel  # each further channel records a weaker response
+        voltage = np.zeros((spec.n_sweeps, spec.n_samples))
+        for k, t_stim in enumerate(spec.stims):
+            epsp_amp = spec.epsp_amp * scale * spec.paired_pulse_ratio**k
+            volley = _evoked_response(time, t_stim, spec.volley_amp * scale, 0.0)
+            epsp = _evoked_response(time, t_stim, 0.0, epsp_amp)
+            voltage += volley + growth[:, None] * epsp
+            i_stim = int(round(t_stim * spec.sample_rate))
+            voltage[:, i_stim] -= spec.artefact_amp
+            voltage[:, i_stim + 1] += 0.75 * spec.artefact_amp
+        voltage += rng.normal(0, spec.noise, voltage.shape)
+        channels[channel] = voltage
+    return time, channels
+
+
+def _sweep_starts(spec: SyntheticSpec) -> pd.DatetimeIndex:
+    return RECORDING_START + pd.to_timedelta(np.arange(spec.n_sweeps) * spec.sweep_interval, unit="s")
+
+
+def _single_channel(spec: SyntheticSpec, fmt: str) -> None:
+    if spec.n_channels != 1:
+        raise ValueError(f"{fmt} files are written single-channel; got n_channels={spec.n_channels}")
+
+
+def write_abf(path, spec: SyntheticSpec) -> Path:
+    """ABF1 via pyabf's writer (single channel, mV). Sweeps are back to back: the writer stores no sweep interval."""
+    _single_channel(spec, "abf")
+    _, channels = synthetic_sweeps(spec)
+    pyabf.abfWriter.writeABF1(channels[0] * 1000, str(path), spec.sample_rate, units="mV")
+    # The writer leaves lFileStartDate/Time at 0, which pyabf replaces by the file's ctime; stamp RECORDING_START instead.
+    start = RECORDING_START
+    with open(path, "r+b") as fh:
+        fh.seek(20)
+        fh.write(struct.pack("<ii", int(start.strftime("%Y%m%d")), start.hour * 3600 + start.minute * 60 + start.second))
+    return Path(path)
+
+
+def _write_ibw_sweep(path: Path, voltage: np.ndarray, dt: float, creation_date: int) -> None:
+    # Minimal Igor binary wave, version 5, little-endian float32 (the layout igor2 reads).
+    data = np.asarray(voltage, dtype="<f4").tobytes()
+    n = len(voltage)
+    wave_header = struct.pack("<IIIihh6sh32siI4i4d", 0, creation_date, creation_date, n, 2, 0, b"", 1, b"wave0", 0, 0, n, 0, 0, 0, dt, 0, 0, 0)
+    bin_header = struct.pack("<hhllll4l4llll", 5, 0, 320 + len(data), 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+    path.write_bytes(bin_header + wave_header.ljust(320, b"\0") + data)
+
+
+def write_ibw_folder(folder, spec: SyntheticSpec) -> Path:
+    """One .ibw per sweep (single channel, V), stamped sweep_interval apart."""
+    _single_channel(spec, "ibw")
+    _, channels = synthetic_sweeps(spec)
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    created = ((_sweep_starts(spec) - _IGOR_EPOCH).total_seconds()).astype(np.int64)
+    for i, voltage in enumerate(channels[0]):
+        _write_ibw_sweep(folder / f"sweep{i:05d}.ibw", voltage, 1 / spec.sample_rate, int(created[i]))
+    return folder
+
+
+def write_atf(path, spec: SyntheticSpec) -> Path:
+    """Axon Text Format 1.0 in mV: a time column, then one column per sweep and channel (sweep-major)."""
+    time, channels = synthetic_sweeps(spec)
+    signals = [f"IN {channel}" for channel in range(spec.n_channels)]
+    columns = [channels[channel][sweep] * 1000 for sweep in range(spec.n_sweeps) for channel in range(spec.n_channels)]
+    sweep_starts_ms = ",".join(f"{1000 * spec.sweep_interval * i:.3f}" for i in range(spec.n_sweeps))
+    header = [
+        '"AcquisitionMode=Episodic Stimulation"',
+        '"Comment=synthetic fEPSP"',
+        f'"SweepStartTimesMS={sweep_starts_ms}"',
+        f'"SignalsExported={",".join(signals)}"',
+        "\t".join(['"Signals="'] + [f'"{signal}"' for signal in signals * spec.n_sweeps]),
+    ]
+    names = ['"Time (s)"'] + [f'"Trace #{sweep + 1} ({signal}) (mV)"' for sweep in range(spec.n_sweeps) for signal in signals]
+    with open(path, "w") as fh:
+        fh.write(f"ATF\t1.0\n{len(header)}\t{len(names)}\n")
+        fh.write("\n".join(header) + "\n")
+        fh.write("\t".join(names) + "\n")
+        np.savetxt(fh, np.column_stack([time] + columns), fmt="%.7g", delimiter="\t")
+    return Path(path)
+
+
+def write_csv(path, spec: SyntheticSpec, channel: int = 0) -> Path:
+    """Brainwash raw sweep CSV (sweep, time, voltage_raw, t0, datetime) of one channel, in V."""
+    time, channels = synthetic_sweeps(spec)
+    n_sweeps, n_samples = spec.n_sweeps, spec.n_samples
+    t0 = np.arange(n_sweeps) * spec.sweep_interval
+    df = pd.DataFrame(
+        {
+            "sweep": np.repeat(np.arange(n_sweeps), n_samples),
+            "time": np.tile(time, n_sweeps),
+            "voltage_raw": channels[channel].ravel(),
+            "t0": np.repeat(t0, n_samples),
+            "datetime": np.repeat(_sweep_starts(spec), n_samples) + pd.to_timedelta(np.tile(time, n_sweeps), unit="s"),
+        }
+    )
+    df.to_csv(path, index=False)
+    return Path(path)
+
+
+def generate(scale="small", folder=None, formats=FORMATS, name=None) -> dict:
+    """
+    Write one recording in each of formats; returns {format: path}. scale is a SCALES key or a SyntheticSpec.
+    ABF and IBW are written for channel 0 only; CSV gets one file per channel.
+    """
+    spec = SCALES[scale] if isinstance(scale, str) else scale
+    name = name or (f"synthetic_{scale}" if isinstance(scale, str) else "synthetic")
+    folder = Path(folder or DATA_GENERATED)
+    folder.mkdir(parents=True, exist_ok=True)
+    single = replace(spec, n_channels=1)
+    paths = {}
+    for fmt in formats:
+        if fmt == "abf":
+            paths[fmt] = write_abf(folder / f"{name}.abf", single)
+        elif fmt == "ibw":
+            paths[fmt] = write_ibw_folder(folder / f"{name}_ibw", single)
+        elif fmt == "atf":
+            paths[fmt] = write_atf(folder / f"{name}.atf", spec)
+        elif fmt == "csv":
+            for channel in range(spec.n_channels):
+                suffix = f"_ch{channel}" if spec.n_channels > 1 else ""
+                paths.setdefault(fmt, write_csv(folder / f"{name}{suffix}.csv", spec, channel=channel))
+        else:
+            raise ValueError(f"generate: unknown format '{fmt}', expected one of {FORMATS}")
+        print(f"generate: {fmt} → {paths[fmt]}")
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write deterministic synthetic fEPSP recordings.")
+    parser.add_argument("scale", nargs="?", default="small", choices=list(SCALES))
+    parser.add_argument("--formats", default=",".join(FORMATS), help="comma-separated subset of abf,ibw,atf,csv")
+    parser.add_argument("--folder", default=str(DATA_GENERATED))
+    parser.add_argument("--channels", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    spec = replace(SCALES[args.scale], n_channels=args.channels, seed=args.seed)
+    generate(spec, folder=args.folder, formats=args.formats.split(","), name=f"synthetic_{args.scale}")
@@ -0,0 +1,144 @@
+"""End-to-end pipeline stages on synthetic paired-pulse recordings, per scale: parse → mean → filter → dft → output → group mean.
+
+Scales are synthetic_recordings.SCALES; "huge" runs only with BRAINWASH_BENCH_HUGE=1. Each stage is timed on
+inputs prepared (untimed) by the previous stage, from the ABF of that scale. The group mean is built over
+GROUP_SIZE recordings of that scale, each with its own noise seed and potentiation.
+"""
+
+import os
+from dataclasses import replace
+from types import SimpleNamespace
+
+import analysis_v3
+import numpy as np
+import pandas as pd
+import parse
+import pytest
+import synthetic_recordings
+from test_pipeline_fixtures import make_default_dict_t
+from ui_data_frames import DataFrameMixin
+
+SCALE_NAMES = ["small", "medium"] + (["huge"] if os.environ.get("BRAINWASH_BENCH_HUGE") else [])
+# Text and one-file-per-sweep formats are only generated up to medium.
+FORMATS_BY_SCALE = {"small": synthetic_recordings.FORMATS, "medium": synthetic_recordings.FORMATS, "huge": ("abf", "csv")}
+GROUP_SIZE = 6  # recordings in the benchmarked group, two per subject
+
+
+@pytest.fixture(scope="module", params=SCALE_NAMES)
+def scale(request):
+    return request.param
+
+
+@pytest.fixture(scope="module")
+def sources(scale, tmp_path_factory):
+    folder = tmp_path_factory.mktemp(f"synthetic_{scale}")
+    return synthetic_recordings.generate(scale, folder=folder, formats=FORMATS_BY_SCALE[scale])
+
+
+@pytest.fixture(scope="module")
+def dfdata(sources):
+    return parse.source2dfs(str(sources["abf"]))[0]
+
+
+@pytest.fixture(scope="module")
+def dfmean(dfdata):
+    return parse.build_dfmean(dfdata)
+
+
+@pytest.fixture(scope="module")
+def dffilter(dfdata, dfmean):
+    return parse.zeroSweeps(dfdata, i_stim=dfmean[1])
+
+
+@pytest.fixture(scope="module")
+def dft(dfmean):
+    return analysis_v3.find_events(dfmean[0], make_default_dict_t())
+
+
+class GroupHost(DataFrameMixin):
+    """Just enough of a project for DataFrameMixin.get_dfgroupmean: dfoutputs in memory, nothing written."""
+
+    def __init__(self, dfoutputs, cache_folder):
+        self.config = SimpleNamespace(verbose=False)
+        self.dict_folders = {"cache": cache_folder}
+        self.dd_groups = {"g": {"rec_IDs": list(dfoutputs)}}
+        self.dict_group_means = {}
+        self.dfoutputs = dfoutputs
+
+    def get_df_project(self):
+        recs = list(self.dfoutputs)
+        return pd.DataFrame({"ID": recs, "recording_name": recs, "subject": [f"s{i // 2}" for i in range(len(recs))], "slice": "1"})
+
+    def get_dfoutput(self, row):
+        return self.dfoutputs[row["ID"]]
+
+    def df2file(self, df, filename=None, key=None):
+        pass
+
+
+@pytest.fixture(scope="module")
+def group_host(scale, tmp_path_factory):
+    folder = tmp_path_factory.mktemp(f"group_{scale}")
+    dfoutputs = {}
+    for seed in range(GROUP_SIZE):
+        spec = replace(synthetic_recordings.SCALES[scale], seed=seed, potentiation=0.1 * seed)
+        path = synthetic_recordings.generate(spec, folder=folder, formats=("abf",), name=f"rec{seed}")["abf"]
+        df = parse.source2dfs(str(path))[0]
+        dfmean, i_stim = parse.build_dfmean(df)
+        dft = analysis_v3.find_events(dfmean, make_default_dict_t())
+        dfoutputs[f"rec{seed}"] = analysis_v3.build_dfoutput(parse.zeroSweeps(df, i_stim=i_stim), dfmean, dft)
+    return GroupHost(dfoutputs, folder)
+
+
+def test_synthetic_formats_round_trip(scale, sources):
+    # Not timed: every written format parses back to the generated voltages.
+    spec = synthetic_recordings.SCALES[scale]
+    _, channels = synthetic_recordings.synthetic_sweeps(spec)
+    for fmt, path in sources.items():
+        df = parse.source2dfs(str(path))[0]
+        assert df["sweep"].nunique() == spec.n_sweeps, fmt
+        voltage = df["voltage_raw"].to_numpy().reshape(spec.n_sweeps, spec.n_samples)
+        np.testing.assert_allclose(voltage, channels[0], atol=1e-6, err_msg=fmt)
+
+
+@pytest.mark.parametrize("fmt", synthetic_recordings.FORMATS)
+def test_source2dfs(benchmark, scale, sources, fmt):
+    if fmt not in sources:
+        pytest.skip(f"{fmt} not generated at {scale} scale")
+    df = benchmark(parse.source2dfs, str(sources[fmt]))[0]
+    assert df["sweep"].nunique() == synthetic_recordings.SCALES[scale].n_sweeps
+
+
+def test_build_dfmean(benchmark, dfdata):
+    dfmean, i_stim = benchmark(parse.build_dfmean, dfdata)
+    assert dfmean["time"].iloc[i_stim] == pytest.approx(0.01, abs=3e-4)
+
+
+def test_zeroSweeps(benchmark, dfdata, dfmean):
+    dffilter = benchmark(parse.zeroSweeps, dfdata, i_stim=dfmean[1])
+    assert len(dffilter) == len(dfdata)
+
+
+def test_find_events(benchmark, dfmean):
+    dft = benchmark(analysis_v3.find_events, dfmean[0], make_default_dict_t())
+    assert dft["t_stim"].tolist() == pytest.approx([0.01, 0.06], abs=2e-4)
+    assert dft["volley_detected"].all() and dft["epsp_detected"].all()
+
+
+def test_build_dfoutput(benchmark, scale, dffilter, dfmean, dft):
+    dfoutput = benchmark(analysis_v3.build_dfoutput, dffilter, dfmean[0], dft)
+    n_sweeps = synthetic_recordings.SCALES[scale].n_sweeps
+    assert len(dfoutput) == 2 * n_sweeps + 2  # sweep rows per stim, plus one stim-mode row per stim
+    assert dfoutput["EPSP_amp"].notna().all()
+
+
+def _build_group_mean(host, level):
+    host.dict_group_means = {}  # a fresh build every call, not the cached mean
+    return host.get_dfgroupmean("g", level=level)
+
+
+@pytest.mark.parametrize("level", ["recording", "subject"])
+def test_build_group_mean(benchmark, scale, group_host, level):
+    group_mean = benchmark(_build_group_mean, group_host, level)
+    assert len(group_mean) == synthetic_recordings.SCALES[scale].n_sweeps
+    assert group_mean["EPSP_amp_mean"].notna().all()
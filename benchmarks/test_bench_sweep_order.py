@@ -0,0 +1,57 @@
+"""Out-of-order sweeps: reordering cost in source2dfs (ABF-shaped data) and IBW folder import."""
+
+import numpy as np
+import pandas as pd
+import parse
+import pytest
+
+N_SWEEPS = 1200
+N_SAMPLES = 2000
+
+
+@pytest.fixture(scope="module")
+def abf_shaped_df():
+    # What parse_abfFolder returns for files whose names do not follow their timestamps.
+    rng = np.random.default_rng(0)
+    starts = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.permutation(N_SWEEPS) * 10, unit="s")
+    times = np.round(np.arange(N_SAMPLES) * 1e-4, 6)
+    return pd.DataFrame(
+        {
+            "time": np.tile(times, N_SWEEPS),
+            "voltage_raw": rng.normal(0, 1e-4, N_SWEEPS * N_SAMPLES).astype(np.float32),
+            "t0": 0.0,
+            "datetime": np.repeat(starts, N_SAMPLES) + pd.to_timedelta(np.tile(times, N_SWEEPS), unit="s"),
+            "channel": 0,
+        }
+    )
+
+
+@pytest.fixture(scope="module")
+def ibw_folder(tmp_path_factory):
+    from test_parse import _write_synthetic_ibw
+
+    folder = tmp_path_factory.mktemp("ibw_unsorted")
+    rng = np.random.default_rng(1)
+    for i, k in enumerate(rng.permutation(N_SWEEPS)):
+        _write_synthetic_ibw(folder / f"w{i:05d}.ibw", rng.normal(0, 1e-4, N_SAMPLES), creation_date=3_700_000_000 + 10 * int(k))
+    return folder
+
+
+def test_sort_sweeps_abf_shaped(benchmark, abf_shaped_df):
+    df = benchmark(parse.sort_sweeps_by_datetime, abf_shaped_df)
+    starts = df.loc[df["time"] == 0, "datetime"]
+    assert len(starts) == N_SWEEPS and starts.is_monotonic_increasing
+
+
+def test_source2dfs_abf_folder_out_of_order(benchmark, abf_shaped_df, monkeypatch, tmp_path):
+    monkeypatch.setattr(parse, "parse_abfFolder", lambda path, dev=False: abf_shaped_df.copy())
+    (tmp_path / "dummy.abf").touch()
+    df = benchmark(parse.source2dfs, str(tmp_path))[0]
+    assert df["sweep"].nunique() == N_SWEEPS
+    assert df.groupby("sweep")["datetime"].first().is_monotonic_increasing
+
+
+def test_source2dfs_ibw_folder_out_of_order(benchmark, ibw_folder):
+    df = benchmark(parse.source2dfs, str(ibw_folder))[0]
+    assert df["sweep"].nunique() == N_SWEEPS
+    assert df.groupby("sweep")["datetime"].first().is_monotonic_increasing
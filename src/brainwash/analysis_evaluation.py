@@ -21,20 +21,25 @@ push them through analysis modules, collect results and evaluate performance of
 """
 
 # %%
+import inspect
+import itertools
 import json
 import os
 import sys
+import time
 from pathlib import Path
 
+import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import seaborn as sns
+from joblib import Parallel, delayed
 from sklearn.linear_model import LinearRegression
 
 reporoot = Path(os.getcwd()).parent
 sys.path.append(str(reporoot / "src/brainwash/"))
 import analysis_v1
 import analysis_v2
+import analysis_v3  # noqa: E402
 
 # %% [markdown]
 # # loaders
@@ -59,7 +64,8 @@ def load_slice(path, sweep=1):
     return df
 
 
-df = pd.concat([load_slice(slice_filepath, sweep) for sweep, slice_filepath in enumerate(slice_filepaths)])
+if __name__ == "__main__":
+    df = pd.concat([load_slice(slice_filepath, sweep) for sweep, slice_filepath in enumerate(slice_filepaths)])
 # df.sort_index(inplace=True)
 # assert(df.isna().sum().max() < 2)
 # df = df.dropna()
@@ -79,9 +85,27 @@ def load_meta(path, sweep=1):
     return df
 
 
-meta = pd.concat([load_meta(meta_filepath, sweep) for sweep, meta_filepath in enumerate(meta_filepaths)])
+if __name__ == "__main__":
+    meta = pd.concat([load_meta(meta_filepath, sweep) for sweep, meta_filepath in enumerate(meta_filepaths)])
 # meta
 
+
+# %%
+def load_corpus(folder):
+    """
+    Labelled corpus in a talkback folder: (signals, meta).
+    signals is a list of slice DataFrames (time, voltage, ...); meta has one ground-truth row per signal, in the same order.
+    """
+    folder = Path(folder)
+    slice_paths = sorted(folder.glob("*slice*"))
+    meta_paths = sorted(folder.glob("*meta*"))
+    if len(slice_paths) != len(meta_paths):
+        raise ValueError(f"{folder}: {len(slice_paths)} slices but {len(meta_paths)} meta files")
+    signals = [load_slice(path, sweep) for sweep, path in enumerate(slice_paths)]
+    meta = pd.concat([load_meta(path, sweep) for sweep, path in enumerate(meta_paths)]).reset_index(drop=True)
+    return signals, meta
+
+
 # %% [markdown]
 # # evaluators
 
@@ -151,11 +175,10 @@ def compute_slope_metrics(dfresults, signals, meta):
 
 
 # %%
-def evaluate_and_report(dfresults, meta, signals, time_scale_factor=10000, offset_thresholds=None):
+def evaluation_metrics(dfresults, meta, signals, time_scale_factor=10000, offset_thresholds=None):
     """
-    Evaluate predictions and generate a formatted report with tables for multiple methods.
+    The metrics behind evaluate_and_report, without the report.
     Dynamically detects methods by splitting dfresults column names on "-", supporting 1 to 5 methods.
-    Combines true and estimated slopes into one column in the Slope Impact Metrics table.
 
     Args:
         dfresults (pd.DataFrame): DataFrame with prediction results (columns like 'method-t_EPSP_slope_start').
@@ -164,6 +187,10 @@ def evaluate_and_report(dfresults, meta, signals, time_scale_factor=10000, offse
         time_scale_factor (int): Factor to convert seconds to index points (default: 10000).
         offset_thresholds (list): List of index offset thresholds (e.g., [1, 2, 3]). Defaults to [1, 2, 3].
 
+    Returns:
+        dict: methods, offset_thresholds, method_metrics and slope_metrics (both {method: {metric: value}}),
+        avg_true_volley_slope and avg_true_epsp_slope.
+
     Raises:
         ValueError: If the number of detected methods is not between 1 and 5, or if required columns are missing.
     """
@@ -219,11 +246,6 @@ def evaluate_and_report(dfresults, meta, signals, time_scale_factor=10000, offse
         else:
             method_cols[method] = expected_cols
 
-    print(f"Detected methods: {methods}")
-    print(f"\n{'=' * 50}")
-    print(f"Evaluation Report")
-    print(f"{'=' * 50}\n")
-
     # Compute metrics for each method
     method_metrics = {}
     for method in methods:
@@ -320,6 +342,45 @@ def evaluate_and_report(dfresults, meta, signals, time_scale_factor=10000, offse
             "epsp_mape": np.mean(epsp_mape_list),
         }
 
+    return {
+        "methods": methods,
+        "offset_thresholds": offset_thresholds,
+        "method_metrics": method_metrics,
+        "slope_metrics": slope_metrics,
+        "avg_true_volley_slope": avg_true_volley_slope,
+        "avg_true_epsp_slope": avg_true_epsp_slope,
+    }
+
+
+def evaluate_and_report(dfresults, meta, signals, time_scale_factor=10000, offset_thresholds=None):
+    """
+    Evaluate predictions and generate a formatted report with tables for multiple methods.
+    Dynamically detects methods by splitting dfresults column names on "-", supporting 1 to 5 methods.
+    Combines true and estimated slopes into one column in the Slope Impact Metrics table.
+
+    Args:
+        dfresults (pd.DataFrame): DataFrame with prediction results (columns like 'method-t_EPSP_slope_start').
+        meta (pd.DataFrame): Ground truth data.
+        signals (list): List of signal DataFrames.
+        time_scale_factor (int): Factor to convert seconds to index points (default: 10000).
+        offset_thresholds (list): List of index offset thresholds (e.g., [1, 2, 3]). Defaults to [1, 2, 3].
+
+    Raises:
+        ValueError: If the number of detected methods is not between 1 and 5, or if required columns are missing.
+    """
+    metrics = evaluation_metrics(dfresults, meta, signals, time_scale_factor=time_scale_factor, offset_thresholds=offset_thresholds)
+    methods = metrics["methods"]
+    offset_thresholds = metrics["offset_thresholds"]
+    method_metrics = metrics["method_metrics"]
+    slope_metrics = metrics["slope_metrics"]
+    avg_true_volley_slope = metrics["avg_true_volley_slope"]
+    avg_true_epsp_slope = metrics["avg_true_epsp_slope"]
+
+    print(f"Detected methods: {methods}")
+    print(f"\n{'=' * 50}")
+    print(f"Evaluation Report")
+    print(f"{'=' * 50}\n")
+
     # Index Offset Metrics Table (Dynamic Columns, Stacked Rows)
     print("Index Offset Metrics (1 index = 0.0001 s)")
     print("-" * 50)
@@ -389,7 +450,161 @@ def evaluate_and_report(dfresults, meta, signals, time_scale_factor=10000, offse
     print(f"{'=' * 50}\n")
 
 
+# %% [markdown]
+# # parameter sweep
+# Tune the find_timepoints defaults on a labelled corpus: every combination of a parameter grid is run over every
+# signal, scored with evaluation_metrics and timed, so accuracy can be traded against runtime on a Pareto front.
+
+# %%
+FIND_TIMEPOINTS_GRID = {
+    "stim_amp": [0.0025, 0.005, 0.01],
+    "volley_slope_n_points": [3, 5],
+    "epsp_slope_n_points": [5, 7, 9],
+    "volley_slope_search_fraction": [0.25, 0.5, 0.75],
+    "epsp_slope_search_fraction": [0.15, 0.25, 0.5],
+}
+
+
+def param_combinations(grid):
+    """Every combination of a {parameter: [values]} grid, as a list of find_timepoints kwargs."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def find_timepoints_defaults(names):
+    """find_timepoints' current default for each parameter name."""
+    parameters = inspect.signature(analysis_v3.find_timepoints).parameters
+    return {name: parameters[name].default for name in names}
+
+
+def _sweep_combination(params, signals, meta, default_dict_t, filter, time_scale_factor, offset_thresholds):
+    # Worker: one parameter set over the whole corpus. Only find_timepoints is timed; a signal it fails on
+    # gets NaN predictions and is counted in "failed".
+    rows = []
+    runtime = 0.0
+    for signal in signals:
+        t0 = time.perf_counter()
+        try:
+            rows.append(analysis_v3.find_timepoints(signal, default_dict_t, filter=filter, **params))
+        except Exception:
+            rows.append({})
+        runtime += time.perf_counter() - t0
+    dftp = pd.DataFrame(rows).reindex(columns=["t_volley_slope_start", "t_EPSP_slope_start", "volley_detected", "epsp_detected"])
+    dfresults = pd.DataFrame(
+        {
+            "sweep-t_EPSP_slope_start": dftp["t_EPSP_slope_start"].astype(float),
+            "sweep-t_volley_slope_start": dftp["t_volley_slope_start"].astype(float),
+        }
+    )
+    metrics = evaluation_metrics(dfresults, meta, signals, time_scale_factor=time_scale_factor, offset_thresholds=offset_thresholds)
+    method_metrics, slope_metrics = metrics["method_metrics"]["sweep"], metrics["slope_metrics"]["sweep"]
+    row = dict(params)
+    for key in ["mae_volley", "mae_epsp", "rmse_volley", "rmse_epsp"]:
+        row[key] = method_metrics[key]
+    row["volley_mape"] = slope_metrics["volley_mape"]
+    row["epsp_mape"] = slope_metrics["epsp_mape"]
+    for threshold, volley, epsp in zip(metrics["offset_thresholds"], method_metrics["volley_offsets"], method_metrics["epsp_offsets"]):
+        row[f"volley_off_{threshold}"] = volley
+        row[f"epsp_off_{threshold}"] = epsp
+    row["volley_detected"] = dftp["volley_detected"].astype(float).mean()
+    row["epsp_detected"] = dftp["epsp_detected"].astype(float).mean()
+    row["failed"] = int(dftp["t_EPSP_slope_start"].isna().sum())
+    row["runtime_s"] = runtime
+    row["ms_per_signal"] = 1000 * runtime / len(signals)
+    return row
+
+
+def sweep_find_timepoints(
+    signals, meta, grid=None, default_dict_t=None, filter="voltage", n_jobs=-1, time_scale_factor=10000, offset_thresholds=None
+):
+    """
+    Run find_timepoints with every combination of grid over a labelled corpus (see load_corpus) and score each.
+
+    Args:
+        signals (list): Signal DataFrames with 'time' and <filter> columns.
+        meta (pd.DataFrame): Ground truth, one row per signal (t_volley_slope_start, t_EPSP_slope_start).
+        grid (dict): {find_timepoints parameter: [values]}. Defaults to FIND_TIMEPOINTS_GRID.
+        default_dict_t (dict): Slope widths passed to find_timepoints.
+        n_jobs (int): joblib workers; each runs whole combinations, so runtimes are per-process wall time.
+            Keep n_jobs at or below the number of physical cores, or runtimes are inflated by contention.
+
+    Returns:
+        pd.DataFrame: One row per combination: the parameters, evaluation_metrics (MAE/RMSE in index points,
+        slope MAPE in %, fraction of signals off by >= each offset threshold), the fraction of signals where the
+        volley / EPSP were detected, failures, runtime_s and ms_per_signal. is_default marks the combination equal
+        to find_timepoints' current defaults, if the grid contains it.
+    """
+    if grid is None:
+        grid = FIND_TIMEPOINTS_GRID
+    if default_dict_t is None:
+        default_dict_t = {"t_volley_slope_width": 0.0003, "t_EPSP_slope_width": 0.0007}
+    if len(signals) != len(meta):
+        raise ValueError(f"{len(signals)} signals but {len(meta)} ground-truth rows")
+    meta = meta.reset_index(drop=True)
+    combinations = param_combinations(grid)
+    print(f"sweep_find_timepoints: {len(combinations)} combinations x {len(signals)} signals")
+    rows = Parallel(n_jobs=n_jobs, batch_size=1)(
+        delayed(_sweep_combination)(params, signals, meta, default_dict_t, filter, time_scale_factor, offset_thresholds) for params in combinations
+    )
+    dfsweep = pd.DataFrame(rows)
+    defaults = find_timepoints_defaults(grid)
+    dfsweep["is_default"] = np.logical_and.reduce([dfsweep[name] == value for name, value in defaults.items()])
+    return dfsweep
+
+
+def pareto_front(dfsweep, error="mae_epsp", cost="ms_per_signal"):
+    """Boolean Series, True for combinations that no other combination matches or beats on both error and cost."""
+    err = dfsweep[error].to_numpy(dtype=float)
+    cost_ = dfsweep[cost].to_numpy(dtype=float)
+    no_worse = (err[None, :] <= err[:, None]) & (cost_[None, :] <= cost_[:, None])
+    better = (err[None, :] < err[:, None]) | (cost_[None, :] < cost_[:, None])
+    dominated = (no_worse & better).any(axis=1)
+    return pd.Series(~dominated & ~np.isnan(err) & ~np.isnan(cost_), index=dfsweep.index)
+
+
+def report_sweep(dfsweep, error="mae_epsp", cost="ms_per_signal"):
+    """Print the Pareto front of error vs cost and how the current defaults compare; returns the front, cheapest first."""
+    params = [col for col in dfsweep.columns if col in inspect.signature(analysis_v3.find_timepoints).parameters]
+    front = dfsweep[pareto_front(dfsweep, error=error, cost=cost)].sort_values(cost)
+    print(f"\n{'=' * 50}")
+    print(f"Parameter sweep: {error} vs {cost}, {len(dfsweep)} combinations")
+    print(f"{'=' * 50}\n")
+    print(f"Pareto front ({len(front)}):")
+    print(front[params + [error, cost]].to_string(index=False))
+    if "is_default" in dfsweep and dfsweep["is_default"].any():
+        default = dfsweep[dfsweep["is_default"]].iloc[0]
+        better = dfsweep[(dfsweep[error] < default[error]) & (dfsweep[cost] <= default[cost])]
+        print(f"\nCurrent defaults: {error}={default[error]:.3f}, {cost}={default[cost]:.3f}")
+        print(f"{len(better)} combinations are more accurate and no slower.")
+    else:
+        print("\nCurrent defaults are not in the grid.")
+    return front
+
+
+def plot_pareto(dfsweep, errors=("mae_volley", "mae_epsp"), cost="ms_per_signal"):
+    """Accuracy vs runtime, one panel per error column: the grid, its Pareto front and the current defaults."""
+    fig, axes = plt.subplots(1, len(errors), figsize=(6 * len(errors), 4.5), squeeze=False)
+    for ax, error in zip(axes[0], errors):
+        front = dfsweep[pareto_front(dfsweep, error=error, cost=cost)].sort_values(cost)
+        ax.scatter(dfsweep[cost], dfsweep[error], s=12, color="lightgray", label="grid")
+        ax.plot(front[cost], front[error], "o-", color="tab:blue", label="Pareto front")
+        if "is_default" in dfsweep and dfsweep["is_default"].any():
+            default = dfsweep[dfsweep["is_default"]]
+            ax.scatter(default[cost], default[error], marker="*", s=150, color="tab:red", zorder=3, label="current defaults")
+        ax.set_xlabel(cost)
+        ax.set_ylabel(error)
+        ax.legend()
+    fig.tight_layout()
+    return fig
+
+
 # %%
+if __name__ == "__main__":
+    signals_sweep, meta_sweep = load_corpus(folder_talkback)
+    dfsweep = sweep_find_timepoints(signals_sweep, meta_sweep)
+    report_sweep(dfsweep, error="mae_epsp")
+    report_sweep(dfsweep, error="mae_volley")
+    plot_pareto(dfsweep)
 
 # %% [markdown]
 # # estimation
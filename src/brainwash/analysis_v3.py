@@ -9,20 +9,32 @@
 #       * no amplitude measurements, no region tuples, no index outputs
 #       * all tuning knobs are explicit params with defaults (hookable later)
 #   - find_events()      thin loop: find_i_stims → find_timepoints per stim
+#   - find_sweep_timepoints() find_timepoints per sweep × stim (joblib blocks);
+#                        timepoint_drift() summarizes latency drift across sweeps
 #   - measure_waveform() pure single-waveform measurement → dict of values
 #   - build_dfoutput()   unified entry point: sweep-mode rows + stim-mode rows
-#   - measureslope_vec() vectorised slope for sweep-mode fast path (unchanged)
+#   - update_dfoutput()  re-measures only the columns/stims a dft edit affects
+#   - fit_slopes()       closed-form least-squares slopes (+ R², residual SE) for
+#                        every sweep × window in one matrix product
+#   - measureslope_vec() slope per sweep on a pivot; fallback for ragged data
+#   - SampleGrid paths   build_dfoutput / measure_waveform slice (sweep, sample)
+#                        arrays by integer index; the time-mask code remains the
+#                        fallback for ragged or unevenly sampled data
 #   - valid()            scalar guard (unchanged)
 #
 # No plotting, no __main__, no notebook cells — see analysis_evaluation.py.
 # ---------------------------------------------------------------------------
 
+import hashlib
 import time
+from collections import OrderedDict
 from typing import Optional
 
 import numpy as np
 import pandas as pd
-from scipy import stats
+import recording_matrix
+from joblib import Parallel, delayed, effective_n_jobs
+from recording_matrix import SampleGrid
 from scipy.signal import find_peaks, savgol_filter
 from scipy.stats import ttest_ind_from_stats
 
@@ -52,14 +64,110 @@ def measureslope_vec(df, t_start, t_end, name="EPSP", filter="voltage") -> pd.Da
     """
     df_filtered = df[(t_start <= df.time) & (df.time <= t_end)]
     dfpivot = df_filtered.pivot(index="sweep", columns="time", values=filter)
-    coefs = np.polyfit(dfpivot.columns, dfpivot.T, deg=1).T
     dfslopes = pd.DataFrame(index=dfpivot.index)
     dfslopes["type"] = name + "_slope"
     dfslopes["algorithm"] = "linear"
-    dfslopes["value"] = coefs[:, 0]
+    dfslopes["value"] = fit_slopes(dfpivot.to_numpy(dtype=np.float64), dfpivot.columns.to_numpy(dtype=np.float64), [slice(None)])["slope"][:, 0]
     return dfslopes
 
 
+def fit_slopes(values, x, windows, with_stats: bool = False) -> dict:
+    """
+    Least-squares slopes of every row of values (n_rows, n_samples) against x (n_samples,)
+    over each sample window (a slice of the sample axis), all in one matrix product.
+
+    With xc = x - mean(x) over a window, slope = sum(xc * y) / sum(xc**2): the x-moments
+    are computed once per window and stacked into a (n_samples, n_windows) weight
+    matrix, so the fit is values @ weights however many rows and windows there are.
+    NaNs are zeroed for the product and counted per window, as in _window_means, so a
+    NaN only affects the windows it falls in.
+
+    Returns {"slope": (n_rows, n_windows)}; with with_stats also "r2" and "residual_se"
+    (sqrt(SSE / (n - 2))). Windows with fewer than 2 samples, and rows with NaN
+    inside a window, give NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    n_rows, n_samples = values.shape
+    result = {"slope": np.full((n_rows, len(windows)), np.nan)}
+    if with_stats:
+        result["r2"] = np.full((n_rows, len(windows)), np.nan)
+        result["residual_se"] = np.full((n_rows, len(windows)), np.nan)
+    spans = [window.indices(n_samples)[:2] for window in windows]
+    fitted = [k for k, (start, stop) in enumerate(spans) if stop - start >= 2]
+    if not fitted:
+        return result
+    lo = min(spans[k][0] for k in fitted)
+    hi = max(spans[k][1] for k in fitted)
+    weights = np.zeros((hi - lo, len(fitted)))
+    in_window = np.zeros_like(weights)
+    sxx = np.empty(len(fitted))
+    for j, k in enumerate(fitted):
+        start, stop = spans[k]
+        xc = x[start:stop] - x[start:stop].mean()
+        sxx[j] = xc @ xc
+        weights[start - lo : stop - lo, j] = xc / sxx[j]
+        in_window[start - lo : stop - lo, j] = 1.0
+    block = values[:, lo:hi]
+    missing = np.isnan(block)
+    has_nan = missing.any()
+    if has_nan:
+        block = np.where(missing, 0.0, block)
+    slope = block @ weights
+    if with_stats:
+        n = in_window.sum(axis=0)
+        sum_y = block @ in_window
+        syy = (block * block) @ in_window - sum_y**2 / n
+        sse = np.maximum(syy - slope**2 * sxx, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r2 = np.where(syy > 0, 1 - sse / syy, np.nan)
+            residual_se = np.sqrt(sse / (n - 2))
+    if has_nan:
+        nan_in_window = (missing @ in_window) > 0
+        slope[nan_in_window] = np.nan
+        if with_stats:
+            r2[nan_in_window] = np.nan
+            residual_se[nan_in_window] = np.nan
+    result["slope"][:, fitted] = slope
+    if with_stats:
+        result["r2"][:, fitted] = r2
+        result["residual_se"][:, fitted] = residual_se
+    return result
+
+
+def sliding_fit(y, x, n_points: int) -> dict:
+    """
+    Least-squares slope and R² of y against x over every window of n_points consecutive samples.
+
+    The window sums of x, y, xy, x² and y² come from one cumulative sum each (x and y are
+    shifted by their first value / mean first, so the differences do not cancel), which gives
+    every window's fit in a few array operations instead of a polyfit per window.
+
+    Returns {"slope": (n_windows,), "r2": (n_windows,)}, n_windows = len(y) - n_points + 1
+    (window k starts at sample k); empty if y is shorter than n_points. R² is 0 for flat windows.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    n_windows = len(y) - n_points + 1
+    if n_windows < 1 or n_points < 2:
+        return {"slope": np.empty(0), "r2": np.empty(0)}
+    x = x - x[0]
+    y = y - y.mean()
+
+    def window_sums(v):
+        c = np.concatenate(([0.0], np.cumsum(v)))
+        return c[n_points:] - c[:n_windows]
+
+    sx, sy = window_sums(x), window_sums(y)
+    sxx = window_sums(x * x) - sx * sx / n_points
+    sxy = window_sums(x * y) - sx * sy / n_points
+    syy = window_sums(y * y) - sy * sy / n_points
+    slope = sxy / sxx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r2 = np.where(syy > 0, sxy * sxy / (sxx * syy), 0.0)
+    return {"slope": slope, "r2": np.clip(r2, 0.0, 1.0)}
+
+
 def ttest_df(d_group_ndf, norm=False, amp=False, slope=False) -> pd.DataFrame:
     """
     Paired t-test across two groups for amp/slope columns.
@@ -115,25 +223,59 @@ def ttest_df(d_group_ndf, norm=False, amp=False, slope=False) -> pd.DataFrame:
     return pd.DataFrame(out)
 
 
-def addFilterSavgol(df, window_length: int = 9, poly_order: int = 3) -> pd.Series:
+# Smoothed matrices from savgol_matrix, keyed on (content digest, shape, window_length, poly_order);
+# least recently used entries are dropped beyond SAVGOL_CACHE_BYTES.
+SAVGOL_CACHE_BYTES = 256 << 20
+_savgol_cache: OrderedDict = OrderedDict()
+
+
+def savgol_matrix(values, window_length: int = 9, poly_order: int = 3) -> np.ndarray:
     """
-    Compute a Savitzky-Golay smoothed column from df['voltage'] and return it.
+    Savitzky-Golay smoothing of every row of values (n_rows, n_samples) in one savgol_filter(axis=1) call.
+
+    As per sweep in addFilterSavgol: an even window_length is rounded up, the window is shortened to
+    fit the rows, and rows too short for poly_order are returned as-is. Results are memoized on the
+    data and the parameters, so switching filter parameters back and forth does not recompute.
     """
-    wl_target = window_length if window_length % 2 == 1 else window_length + 1
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    n = values.shape[1]
+    wl = window_length if window_length % 2 == 1 else window_length + 1
+    wl = min(wl, n if n % 2 == 1 else n - 1)
+    if n <= poly_order or wl <= poly_order:
+        return values.copy()
+    key = (hashlib.sha1(memoryview(values).cast("B"), usedforsecurity=False).digest(), values.shape, wl, poly_order)
+    if key in _savgol_cache:
+        _savgol_cache.move_to_end(key)
+        return _savgol_cache[key].copy()
+    smoothed = savgol_filter(values, window_length=wl, polyorder=poly_order, axis=1)
+    _savgol_cache[key] = smoothed
+    while sum(v.nbytes for v in _savgol_cache.values()) > SAVGOL_CACHE_BYTES and len(_savgol_cache) > 1:
+        _savgol_cache.popitem(last=False)
+    return smoothed.copy()
 
-    def _apply_savgol(x):
-        n = len(x)
-        if n <= poly_order:
-            return x
-        wl = min(wl_target, n if n % 2 == 1 else n - 1)
-        if wl <= poly_order:
-            return x
-        return savgol_filter(x, window_length=wl, polyorder=poly_order)
 
-    if "sweep" in df.columns:
-        df["savgol"] = df.groupby("sweep")["voltage"].transform(_apply_savgol)
+def addFilterSavgol(df, window_length: int = 9, poly_order: int = 3) -> pd.Series:
+    """
+    Compute a Savitzky-Golay smoothed column from df['voltage'] and return it.
+    Sweeps on a shared time grid are smoothed as one matrix (savgol_matrix); ragged sweeps one by one.
+    """
+    voltage = df["voltage"].to_numpy(dtype=np.float64)
+    if "sweep" not in df.columns:
+        smoothed = savgol_matrix(voltage[None, :], window_length, poly_order)[0]
     else:
-        df["savgol"] = _apply_savgol(df["voltage"])
+        layout = _grid_layout(df["sweep"].to_numpy(), df["time"].to_numpy(dtype=np.float64)) if "time" in df.columns else None
+        if layout is None:
+            smoothed = (
+                df.groupby("sweep")["voltage"].transform(lambda x: savgol_matrix(x.to_numpy()[None, :], window_length, poly_order)[0]).to_numpy()
+            )
+        else:
+            order, n_sweeps, n_samples = layout
+            if order is None:
+                smoothed = savgol_matrix(voltage.reshape(n_sweeps, n_samples), window_length, poly_order).ravel()
+            else:
+                smoothed = np.empty_like(voltage)
+                smoothed[order] = savgol_matrix(voltage[order].reshape(n_sweeps, n_samples), window_length, poly_order).ravel()
+    df["savgol"] = pd.Series(smoothed, index=df.index)
     return df["savgol"]
 
 
@@ -145,10 +287,7 @@ def _scalar_measureslope(df_snippet, t_start, t_end, filter="voltage") -> float:
     dftemp = df_snippet[(t_start <= df_snippet.time) & (df_snippet.time <= t_end)]
     if len(dftemp) < 2:
         return np.nan
-    x = dftemp.time.values
-    y = dftemp[filter].values
-    coefs = np.polyfit(x, y, 1)
-    return float(coefs[0])
+    return float(fit_slopes(dftemp[filter].to_numpy(dtype=np.float64)[None, :], dftemp.time.to_numpy(dtype=np.float64), [slice(None)])["slope"][0, 0])
 
 
 # ---------------------------------------------------------------------------
@@ -195,6 +334,18 @@ def find_i_stims(dfmean, threshold=0.1, min_time_difference=0.005, verbose=False
 # ---------------------------------------------------------------------------
 
 
+def _peak_prominences(x) -> tuple:
+    # (peaks, prominences) of every local maximum; find_peaks(x, prominence=p) is the subset with prominence >= p,
+    # so the detection loops that halve p re-filter these instead of searching x again
+    peaks, props = find_peaks(x, prominence=0)
+    return peaks, props["prominences"]
+
+
+def _prominent(peak_prominences: tuple, threshold: float) -> np.ndarray:
+    peaks, prominences = peak_prominences
+    return peaks[prominences >= threshold]
+
+
 def find_timepoints(
     df_snippet,
     default_dict_t: dict,
@@ -205,6 +356,7 @@ def find_timepoints(
     volley_slope_search_fraction: float = 0.5,
     epsp_slope_search_fraction: float = 0.25,
     verbose: bool = False,
+    profiles: bool = False,
 ) -> dict:
     """
     Detect measurement timepoints from a single-stim waveform snippet.
@@ -238,6 +390,8 @@ def find_timepoints(
                                       region to scan for the best-R² EPSP
                                       slope window start.
         verbose:                      Print detection progress if True.
+        profiles:                     Also return the slope window searches
+                                      (see Returns).
 
     Returns:
         Dict with keys:
@@ -249,6 +403,9 @@ def find_timepoints(
             amp_zero,
             volley_detected, epsp_detected.
         All values are scalars (float or bool); no arrays or index tuples.
+        With profiles, also volley_slope_profile and EPSP_slope_profile:
+        DataFrames (t_start, slope, r2) of every candidate window searched
+        (sliding_fit), for the aspects that were searched.
     """
     voltage = df_snippet[filter].values
     times = df_snippet["time"].values
@@ -259,6 +416,7 @@ def find_timepoints(
     en = epsp_slope_n_points
 
     log = []
+    profile = {}
 
     def _log(msg):
         if verbose:
@@ -268,11 +426,12 @@ def find_timepoints(
     # 1. Stim artefact
     # ------------------------------------------------------------------
     stim_prom = stim_amp
+    neg_all, pos_all = _peak_prominences(-voltage), _peak_prominences(voltage)
     neg_peaks = np.array([])
     pos_peaks = np.array([])
     while (len(pos_peaks) == 0 or len(neg_peaks) == 0) and stim_prom > 1e-6:
-        neg_peaks, _ = find_peaks(-voltage, prominence=stim_prom)
-        pos_peaks, _ = find_peaks(voltage, prominence=stim_prom)
+        neg_peaks = _prominent(neg_all, stim_prom)
+        pos_peaks = _prominent(pos_all, stim_prom)
         stim_prom /= 2
 
     stim_detected = False
@@ -320,11 +479,12 @@ def find_timepoints(
     volley_region = voltage[volley_start:volley_end]
 
     v_prom = 0.001
+    v_all = _peak_prominences(volley_region)
     v_peaks = np.array([])
     while len(v_peaks) < 2 and v_prom > 1e-6:
-        v_peaks, _ = find_peaks(volley_region, prominence=v_prom)
+        v_peaks = _prominent(v_all, v_prom)
         v_prom /= 2
-    v_troughs, _ = find_peaks(-volley_region, prominence=v_prom)
+    v_troughs = _prominent(_peak_prominences(-volley_region), v_prom)
 
     if len(v_peaks) >= 2 and len(v_troughs) >= 1:
         # Scan from the rightmost pair leftward to find M-shape
@@ -359,9 +519,10 @@ def find_timepoints(
 
     if len(epsp_region) > 0:
         e_prom = 0.01
+        e_all = _peak_prominences(-epsp_region)
         e_peaks = np.array([])
         while len(e_peaks) < 1 and e_prom > 1e-6:
-            e_peaks, _ = find_peaks(-epsp_region, prominence=e_prom)
+            e_peaks = _prominent(e_all, e_prom)
             e_prom /= 2
         if len(e_peaks):
             i_epsp_min = int(e_peaks[0]) + epsp_start
@@ -393,14 +554,12 @@ def find_timepoints(
                 dtype=float,
             )
             t_raw = np.asarray(times[left : trough + pad], dtype=float)
-            slopes = []
-            for i in range(min(search_len, len(smoothed) - vn + 1)):
-                x = t_raw[i : i + vn]
-                y = smoothed[i : i + vn]
-                coefs = np.polyfit(x, y, 1)
-                slopes.append((i, float(coefs[0])))
-            if slopes:
-                best_i, _ = min(slopes, key=lambda s: s[1])
+            fit = sliding_fit(smoothed, t_raw, vn)
+            fit = {key: v[:search_len] for key, v in fit.items()}
+            if profiles:
+                profile["volley_slope_profile"] = pd.DataFrame({"t_start": times[left : left + len(fit["slope"])], **fit})
+            if len(fit["slope"]):
+                best_i = int(np.argmin(fit["slope"]))  # steepest descent
                 t_volley_slope_start = float(times[best_i + left])
                 t_volley_slope_method = "auto detect"
                 _log(f"volley slope start: t={t_volley_slope_start:.5f}")
@@ -434,18 +593,12 @@ def find_timepoints(
                 dtype=float,
             )
             t_raw = np.asarray(times[right : epsp_min + pad], dtype=float)
-            r2_values = []
-            for i in range(min(search_len, len(smoothed) - en + 1)):
-                x = t_raw[i : i + en]
-                y = smoothed[i : i + en]
-                coefs = np.polyfit(x, y, 1)
-                y_pred = np.polyval(coefs, x)
-                ss_res = np.sum((y - y_pred) ** 2)
-                ss_tot = np.sum((y - np.mean(y)) ** 2)
-                r2 = 1.0 - ss_res / ss_tot if ss_tot != 0 else 0.0
-                r2_values.append((i, r2))
-            if r2_values:
-                best_i, _ = max(r2_values, key=lambda r: r[1])
+            fit = sliding_fit(smoothed, t_raw, en)
+            fit = {key: v[:search_len] for key, v in fit.items()}
+            if profiles:
+                profile["EPSP_slope_profile"] = pd.DataFrame({"t_start": times[right : right + len(fit["r2"])], **fit})
+            if len(fit["r2"]):
+                best_i = int(np.argmax(fit["r2"]))  # most linear window
                 t_EPSP_slope_start = float(times[best_i + right])
                 t_EPSP_slope_method = "auto detect"
                 _log(f"EPSP slope start: t={t_EPSP_slope_start:.5f}")
@@ -499,6 +652,7 @@ def find_timepoints(
         # detection flags (retained for callers that want to branch on them)
         "volley_detected": volley_detected,
         "epsp_detected": epsp_detected,
+        **profile,
     }
 
 
@@ -507,6 +661,27 @@ def find_timepoints(
 # ---------------------------------------------------------------------------
 
 
+_SNIPPET_MARGIN_BEFORE = 5  # samples before each stim
+_SNIPPET_MIN_INTERVAL = 200  # 20 ms at 10 kHz — avoids overlap in 50 Hz trains
+
+
+def _stim_snippet_bounds(i_stims: list) -> list:
+    """(start, stop) sample bounds of the detection snippet around each stim index; a snippet ends at the next stim."""
+    bounds = []
+    for k, i_stim in enumerate(i_stims):
+        stop = i_stim + _SNIPPET_MIN_INTERVAL
+        if k + 1 < len(i_stims):
+            stop = min(stop, i_stims[k + 1])
+        bounds.append((max(i_stim - _SNIPPET_MARGIN_BEFORE, 0), stop))
+    return bounds
+
+
+def _time_precision(time_values) -> int:
+    """Decimal places of the sampling interval (0.0001 -> 4), for rounding detected timepoints."""
+    raw_delta = str(float(time_values[1]) - float(time_values[0]))
+    return len(raw_delta.split(".")[1]) if "." in raw_delta else 6
+
+
 def find_events(
     dfmean,
     default_dict_t: dict,
@@ -557,23 +732,10 @@ def find_events(
         print("find_events: no stims found, returning empty DataFrame.")
         return pd.DataFrame()
 
-    time_values = dfmean["time"].values
-    if precision is None:
-        raw_delta = str(float(time_values[1]) - float(time_values[0]))
-        precision = len(raw_delta.split(".")[1]) if "." in raw_delta else 6
-    precision = int(precision)
-
-    margin_before = 5
-    min_interval_samples = 200  # 20 ms at 10 kHz — avoids overlap in 50 Hz trains
+    precision = _time_precision(dfmean["time"].values) if precision is None else int(precision)
 
     rows = []
-    for stim_nr, i_stim in enumerate(i_stims, start=1):
-        # Slice a window around this stim
-        start = max(i_stim - margin_before, 0)
-        if stim_nr < len(i_stims):
-            stop = min(i_stim + min_interval_samples, i_stims[stim_nr])
-        else:
-            stop = i_stim + min_interval_samples
+    for stim_nr, (start, stop) in enumerate(_stim_snippet_bounds(i_stims), start=1):
         df_snippet = dfmean.iloc[start:stop].reset_index(drop=True)
 
         tp = find_timepoints(
@@ -608,18 +770,249 @@ def find_events(
     return pd.DataFrame(rows)
 
 
+# ---------------------------------------------------------------------------
+# Per-sweep event discovery: drift QC
+# ---------------------------------------------------------------------------
+
+
+SWEEP_TIMEPOINT_COLUMNS = (
+    "t_stim",
+    "amp_zero",
+    "t_volley_amp",
+    "t_volley_slope_start",
+    "t_volley_slope_end",
+    "t_EPSP_amp",
+    "t_EPSP_slope_start",
+    "t_EPSP_slope_end",
+    "volley_detected",
+    "epsp_detected",
+)
+
+
+def _sweep_timepoints_block(values, time_grid, bounds, default_dict_t, filter, precision, detect_kwargs) -> list:
+    # One joblib task: find_timepoints for every row of values x snippet in bounds, as lists of SWEEP_TIMEPOINT_COLUMNS
+    rows = []
+    for row_values in values:
+        for start, stop in bounds:
+            df_snippet = pd.DataFrame({"time": time_grid[start:stop], filter: row_values[start:stop]})
+            tp = find_timepoints(df_snippet=df_snippet, default_dict_t=default_dict_t, filter=filter, **detect_kwargs)
+            rows.append([round(tp[key], precision) if key.startswith("t_") else tp[key] for key in SWEEP_TIMEPOINT_COLUMNS])
+    return rows
+
+
+def find_sweep_timepoints(
+    values,
+    time_grid,
+    dft: pd.DataFrame,
+    default_dict_t: dict,
+    sweeps=None,
+    i_stims: Optional[list] = None,
+    filter: str = "voltage",
+    precision: Optional[int] = None,
+    n_jobs: int = 1,
+    **detect_kwargs,
+) -> pd.DataFrame:
+    """
+    Run find_timepoints on every sweep (row of values, sampled on time_grid) for every stim in dft.
+
+    The snippets are cut around i_stims exactly as find_events cuts dfmean, so per-sweep timepoints
+    are directly comparable to the dft row (find_events on the mean). Without i_stims they are cut
+    around the dft t_stim samples, which can sit a few samples off the stim find_events cut around.
+    Sweeps are split into one block per joblib worker (n_jobs as in joblib; 1 runs in-process);
+    each worker only receives the sample span the snippets cover.
+
+    Args:
+        values:         (n_sweeps, n_samples) waveforms; sweeps or bins.
+        time_grid:      (n_samples,) within-sweep time.
+        dft:            Timepoints DataFrame (one row per stim).
+        default_dict_t: Width defaults, as for find_events.
+        sweeps:         Sweep labels of the rows of values; 0..n-1 if None.
+        i_stims:        Stim indices into time_grid find_events cut around (find_i_stims on dfmean), one per dft row.
+        filter:         Column name the snippets carry (find_timepoints reads it).
+        precision:      Decimal places for rounding; inferred from time_grid if None.
+        n_jobs:         joblib workers.
+        detect_kwargs:  Forwarded to find_timepoints (stim_amp, *_n_points, *_search_fraction).
+
+    Returns:
+        DataFrame with sweep, stim and SWEEP_TIMEPOINT_COLUMNS, one row per sweep × stim (sweep-major).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    time_grid = np.asarray(time_grid, dtype=np.float64)
+    sweeps = np.arange(len(values)) if sweeps is None else np.asarray(sweeps)
+    columns = ["sweep", "stim", *SWEEP_TIMEPOINT_COLUMNS]
+    if dft is None or dft.empty or not len(values):
+        return pd.DataFrame(columns=columns)
+    precision = _time_precision(time_grid) if precision is None else int(precision)
+    if i_stims is None:
+        i_stims = [int(np.abs(time_grid - t_stim).argmin()) for t_stim in dft["t_stim"]]
+    elif len(i_stims) != len(dft):
+        raise ValueError(f"find_sweep_timepoints: {len(i_stims)} i_stims for {len(dft)} stims in dft")
+    bounds = _stim_snippet_bounds([int(i) for i in i_stims])
+    lo, hi = bounds[0][0], min(max(stop for _, stop in bounds), len(time_grid))
+    bounds = [(start - lo, stop - lo) for start, stop in bounds]
+    values, time_grid = values[:, lo:hi], time_grid[lo:hi]
+
+    n_blocks = min(effective_n_jobs(n_jobs), len(values))
+    args = (time_grid, bounds, default_dict_t, filter, precision, detect_kwargs)
+    if n_blocks <= 1:
+        rows = _sweep_timepoints_block(values, *args)
+    else:
+        blocks = Parallel(n_jobs=n_blocks)(delayed(_sweep_timepoints_block)(block, *args) for block in np.array_split(values, n_blocks))
+        rows = [row for block in blocks for row in block]
+
+    dfsweept = pd.DataFrame(rows, columns=list(SWEEP_TIMEPOINT_COLUMNS))
+    dfsweept.insert(0, "stim", np.tile(dft["stim"].to_numpy(), len(values)))
+    dfsweept.insert(0, "sweep", np.repeat(sweeps, len(dft)))
+    return dfsweept
+
+
+_DRIFT_TIMEPOINTS = {
+    "t_stim": None,
+    "t_volley_amp": "volley_detected",
+    "t_volley_slope_start": "volley_detected",
+    "t_EPSP_amp": "epsp_detected",
+    "t_EPSP_slope_start": "epsp_detected",
+}
+
+
+def timepoint_drift(dfsweept: pd.DataFrame) -> pd.DataFrame:
+    """
+    Summarize per-sweep timepoints (find_sweep_timepoints) per stim and timepoint.
+
+    Returns one row per stim × timepoint with median, std, min, max (s), drift (the fitted
+    linear change from first to last sweep, s) and detected (fraction of sweeps where the
+    aspect was auto-detected rather than defaulted; NaN for t_stim).
+    """
+    rows = []
+    for stim, df in dfsweept.groupby("stim", sort=True):
+        sweeps = df["sweep"].to_numpy(dtype=np.float64)
+        timepoints = df[list(_DRIFT_TIMEPOINTS)].to_numpy(dtype=np.float64).T
+        if len(sweeps) >= 2 and np.ptp(sweeps) > 0:
+            drift = fit_slopes(timepoints, sweeps, [slice(None)])["slope"][:, 0] * np.ptp(sweeps)
+        else:
+            drift = np.full(len(timepoints), np.nan)
+        for k, (key, flag) in enumerate(_DRIFT_TIMEPOINTS.items()):
+            rows.append(
+                {
+                    "stim": stim,
+                    "timepoint": key,
+                    "median": np.median(timepoints[k]),
+                    "std": timepoints[k].std(),
+                    "min": timepoints[k].min(),
+                    "max": timepoints[k].max(),
+                    "drift": drift[k],
+                    "detected": df[flag].mean() if flag else np.nan,
+                }
+            )
+    return pd.DataFrame(rows, columns=["stim", "timepoint", "median", "std", "min", "max", "drift", "detected"])
+
+
 # ---------------------------------------------------------------------------
 # Single-waveform measurement
 # ---------------------------------------------------------------------------
 
 
+_ASPECTS = ("EPSP", "volley")
+
+
+def _window_means(values: np.ndarray, windows: list) -> np.ndarray:
+    """
+    NaN-skipping row means of values[:, window] for every window, (n_rows, n_windows), from one
+    cumulative sum over the span the windows cover. NaN for rows with no (non-NaN) samples in a window.
+    """
+    n_rows, n_samples = values.shape
+    means = np.full((n_rows, len(windows)), np.nan)
+    spans = [window.indices(n_samples)[:2] for window in windows]
+    spans = [(start, max(start, stop)) for start, stop in spans]
+    if not any(stop > start for start, stop in spans):
+        return means
+    lo = min(start for start, stop in spans if stop > start)
+    hi = max(stop for start, stop in spans if stop > start)
+    block = values[:, lo:hi]
+    finite = ~np.isnan(block)
+    csum = np.zeros((n_rows, hi - lo + 1))
+    np.cumsum(np.where(finite, block, 0.0), axis=1, out=csum[:, 1:])
+    ccount = np.zeros((n_rows, hi - lo + 1), dtype=np.int64)
+    np.cumsum(finite, axis=1, out=ccount[:, 1:])
+    for j, (start, stop) in enumerate(spans):
+        if stop > start:
+            a, b = start - lo, stop - lo
+            count = ccount[:, b] - ccount[:, a]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means[:, j] = np.where(count > 0, (csum[:, b] - csum[:, a]) / count, np.nan)
+    return means
+
+
+def _amps_on_grid(values: np.ndarray, grid: SampleGrid, dicts_t: list, quick: bool = False, aspects=_ASPECTS) -> list:
+    """
+    Raw values per row for every dict_t: "amp_zero" (mean before t_stim) and, per aspect, the value at
+    t_<name>_amp: the nearest sample, or the mean over t_<name>_amp_width. All windowed means come from
+    a single _window_means call. Returns [{"amp_zero": ..., "EPSP": ..., "volley": ...}, ...].
+    """
+    amps = [{} for _ in dicts_t]
+    keys, windows = [], []
+    for i, dict_t in enumerate(dicts_t):
+        keys.append((i, "amp_zero"))
+        windows.append(_amp_zero_window(grid, float(dict_t.get("t_stim", 0.0))))
+        for name in aspects:
+            t_amp = dict_t.get(f"t_{name}_amp", np.nan)
+            width = dict_t.get(f"t_{name}_amp_width", 2 * dict_t.get(f"t_{name}_amp_halfwidth", 0))
+            if not valid(t_amp):
+                amps[i][name] = np.full(len(values), np.nan)
+            elif width == 0 or quick:
+                amps[i][name] = values[:, grid.nearest(float(t_amp))]
+            else:
+                half = float(width) / 2
+                keys.append((i, name))
+                windows.append(grid.window(float(t_amp) - half, float(t_amp) + half))
+    means = _window_means(values, windows)
+    for j, (i, key) in enumerate(keys):
+        amps[i][key] = means[:, j]
+    return amps
+
+
+def _slope_window(grid: SampleGrid, dict_t: dict, name: str) -> slice | None:
+    """Sample window [t_<name>_slope_start, t_<name>_slope_end], or None if the timepoints are missing or reversed."""
+    t_s = dict_t.get(f"t_{name}_slope_start", np.nan)
+    t_e = dict_t.get(f"t_{name}_slope_end", np.nan)
+    if not (valid(t_s, t_e) and t_s < t_e):
+        return None
+    return grid.window(t_s, t_e)
+
+
+def _slopes_on_grid(values: np.ndarray, time_grid: np.ndarray, grid: SampleGrid, dicts_t: list, aspects=_ASPECTS) -> list:
+    """
+    -slope per row for the aspects of every dict_t, fitted in a single fit_slopes call.
+    Returns [{"EPSP": (n_rows,), "volley": (n_rows,)}, ...] in dicts_t order; NaN where a window is missing.
+    """
+    keys, windows = [], []
+    for i, dict_t in enumerate(dicts_t):
+        for name in aspects:
+            window = _slope_window(grid, dict_t, name)
+            if window is not None:
+                keys.append((i, name))
+                windows.append(window)
+    slopes = [{name: np.full(len(values), np.nan) for name in aspects} for _ in dicts_t]
+    if windows:
+        fitted = fit_slopes(values, time_grid, windows)["slope"]
+        for j, (i, name) in enumerate(keys):
+            slopes[i][name] = -fitted[:, j]
+    return slopes
+
+
+def _amp_zero_window(grid: SampleGrid, t_stim: float) -> slice:
+    # [t_stim - 0.002, t_stim - 0.001): same window as _compute_amp_zero_per_sweep
+    return grid.window(t_stim - _AMP_ZERO_WINDOW, t_stim - _AMP_ZERO_WINDOW / 2, include_end=False)
+
+
 def measure_waveform(df_snippet, dict_t: dict, filter: str = "voltage") -> dict:
     """
     Measure all output values from a single waveform snippet.
 
     No sweep or stim awareness — pure signal measurement at the timepoints
-    defined in dict_t.  Slope is computed with the scalar path (_scalar_measureslope)
-    since the snippet is a single waveform.
+    defined in dict_t, located as sample indices on the snippet's SampleGrid.
+    Snippets that are not evenly sampled fall back to time masks
+    (_measure_waveform_masks).
 
     Args:
         df_snippet: DataFrame with 'time' and <filter> columns (one waveform).
@@ -631,6 +1024,25 @@ def measure_waveform(df_snippet, dict_t: dict, filter: str = "voltage") -> dict:
         (and their _norm variants where a normalization range is available).
         Missing or invalid timepoints produce np.nan for that measurement.
     """
+    time_grid = df_snippet["time"].to_numpy(dtype=np.float64)
+    grid = SampleGrid.from_time(time_grid)
+    if grid is None:
+        return _measure_waveform_masks(df_snippet, dict_t, filter)
+    values = df_snippet[filter].to_numpy(dtype=np.float64)[None, :]
+    amps = _amps_on_grid(values, grid, [dict_t])[0]
+    amp_zero = amps["amp_zero"][0]
+    if pd.isna(amp_zero):
+        amp_zero = dict_t.get("amp_zero", 0.0)
+    slopes = _slopes_on_grid(values, time_grid, grid, [dict_t])[0]
+    result = {}
+    for name in _ASPECTS:
+        result[f"{name}_amp"] = float(-(amps[name][0] - amp_zero))
+        result[f"{name}_slope"] = float(slopes[name][0])
+    return result
+
+
+def _measure_waveform_masks(df_snippet, dict_t: dict, filter: str = "voltage") -> dict:
+    """measure_waveform on an unevenly sampled snippet: windows by time masks, slopes by _scalar_measureslope."""
     result = {}
 
     t_stim = dict_t.get("t_stim", 0.0)
@@ -698,6 +1110,98 @@ def measure_waveform(df_snippet, dict_t: dict, filter: str = "voltage") -> dict:
     return result
 
 
+def _stim_span(time_grid: np.ndarray, dict_t: dict) -> slice:
+    # The snippet stim-mode rows and bins are measured on: [t_stim - 2 ms, t_EPSP_amp + amp width],
+    # cut by the same float comparisons as the snippet masks
+    t_stim = dict_t.get("t_stim", np.nan)
+    t_win_end = dict_t.get("t_EPSP_amp", t_stim + 0.01) + dict_t.get("t_EPSP_amp_width", 2 * dict_t.get("t_EPSP_amp_halfwidth", 0.001))
+    if not valid(t_stim, t_win_end):
+        return slice(0, 0)
+    start = int(np.searchsorted(time_grid, t_stim - 0.002, side="left"))
+    return slice(start, max(start, int(np.searchsorted(time_grid, t_win_end, side="right"))))
+
+
+def _clip(window: slice, span: slice) -> slice:
+    start = max(window.start, span.start)
+    return slice(start, max(start, min(window.stop, span.stop)))
+
+
+def measure_waveforms(values, time_grid, dft: pd.DataFrame, filter: str = "voltage") -> pd.DataFrame | None:
+    """
+    measure_waveform for every waveform (row of values, sampled on time_grid) × stim (dft row) in one pass.
+
+    Each stim is measured on its snippet, [t_stim - 2 ms, t_EPSP_amp + amp width], as the stim-mode rows
+    of build_dfoutput and build_dfbinstimoutput do: windows are located once per stim on the SampleGrid,
+    clipped to the snippet, and all amplitude windows of all stims reduced by one _window_means call and
+    all slopes fitted by one fit_slopes call, instead of copying a snippet per (waveform, stim).
+
+    Returns a DataFrame with columns waveform (row of values), stim, EPSP_amp, EPSP_slope, volley_amp,
+    volley_slope, waveform-major; None if time_grid is not evenly sampled.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    time_grid = np.asarray(time_grid, dtype=np.float64)
+    grid = SampleGrid.from_time(time_grid)
+    if grid is None:
+        return None
+    n_rows = len(values)
+    dicts_t = [t_row.to_dict() for _, t_row in dft.iterrows()]
+    measured = [{} for _ in dicts_t]
+    mean_keys, mean_windows, slope_keys, slope_windows = [], [], [], []
+    for i, dict_t in enumerate(dicts_t):
+        span = _stim_span(time_grid, dict_t)
+        if span.stop - span.start < 2:  # measure_waveform falls back to time masks on such snippets
+            for row in range(n_rows):
+                snippet = pd.DataFrame({"time": time_grid[span], filter: values[row, span]})
+                for col, value in _measure_waveform_masks(snippet, dict_t, filter).items():
+                    measured[i].setdefault(col, np.full(n_rows, np.nan))[row] = value
+            continue
+        mean_keys.append((i, "amp_zero"))
+        mean_windows.append(_clip(_amp_zero_window(grid, float(dict_t.get("t_stim", 0.0))), span))
+        for name in _ASPECTS:
+            t_amp = dict_t.get(f"t_{name}_amp", np.nan)
+            width = dict_t.get(f"t_{name}_amp_width", 2 * dict_t.get(f"t_{name}_amp_halfwidth", 0))
+            if not valid(t_amp):
+                measured[i][name] = np.full(n_rows, np.nan)
+            elif width == 0:
+                measured[i][name] = values[:, min(max(grid.nearest(float(t_amp)), span.start), span.stop - 1)]
+            else:
+                half = float(width) / 2
+                mean_keys.append((i, name))
+                mean_windows.append(_clip(grid.window(float(t_amp) - half, float(t_amp) + half), span))
+            window = _slope_window(grid, dict_t, name)
+            if window is None:
+                measured[i][f"{name}_slope"] = np.full(n_rows, np.nan)
+            else:
+                slope_keys.append((i, f"{name}_slope"))
+                slope_windows.append(_clip(window, span))
+    means = _window_means(values, mean_windows)
+    for j, (i, key) in enumerate(mean_keys):
+        measured[i][key] = means[:, j]
+    slopes = fit_slopes(values, time_grid, slope_windows)["slope"] if slope_windows else None
+    for j, (i, key) in enumerate(slope_keys):
+        measured[i][key] = -slopes[:, j]
+
+    columns = ("EPSP_amp", "EPSP_slope", "volley_amp", "volley_slope")
+    per_stim = np.full((len(dicts_t), len(columns), n_rows), np.nan)
+    for i, (dict_t, m) in enumerate(zip(dicts_t, measured)):
+        if "amp_zero" not in m:  # measured by _measure_waveform_masks
+            for k, col in enumerate(columns):
+                per_stim[i, k] = m.get(col, np.nan)
+            continue
+        amp_zero = np.where(np.isnan(m["amp_zero"]), dict_t.get("amp_zero", 0.0), m["amp_zero"])
+        for k, col in enumerate(columns):
+            per_stim[i, k] = -(m[col.split("_")[0]] - amp_zero) if col.endswith("_amp") else m[col]
+    result = pd.DataFrame(
+        {
+            "waveform": np.repeat(np.arange(n_rows), len(dicts_t)),
+            "stim": np.tile([dict_t["stim"] for dict_t in dicts_t], n_rows),
+        }
+    )
+    for k, col in enumerate(columns):
+        result[col] = per_stim[:, k, :].T.ravel()
+    return result
+
+
 def _normalize_column(series: pd.Series, norm_from, norm_to) -> pd.Series:
     """
     Normalize a Series to percentage of the mean of rows norm_from..norm_to
@@ -714,6 +1218,24 @@ def _normalize_column(series: pd.Series, norm_from, norm_to) -> pd.Series:
     return series / (norm_mean / 100)
 
 
+def normalize_output(dfoutput: pd.DataFrame, norm_from, norm_to) -> pd.DataFrame:
+    """
+    dfoutput with EPSP_amp_norm and EPSP_slope_norm recomputed for the norm_from..norm_to
+    sweep-row range of each stim (as build_dfoutput does); stim-mode rows stay NaN.
+    Needs only the raw EPSP_amp / EPSP_slope columns, so it is cheap enough to apply on read.
+    """
+    dfoutput = dfoutput.copy()
+    sweep_rows = dfoutput["sweep"].notna()
+    for col in ("EPSP_amp", "EPSP_slope"):
+        dfoutput[f"{col}_norm"] = np.nan
+    for stim_nr in dfoutput.loc[sweep_rows, "stim"].unique():
+        mask = sweep_rows & (dfoutput["stim"] == stim_nr)
+        for col in ("EPSP_amp", "EPSP_slope"):
+            series = pd.Series(dfoutput.loc[mask, col].to_numpy(), dtype=float)
+            dfoutput.loc[mask, f"{col}_norm"] = _normalize_column(series, norm_from, norm_to).to_numpy()
+    return dfoutput
+
+
 # ---------------------------------------------------------------------------
 # Unified output computation
 # ---------------------------------------------------------------------------
@@ -766,6 +1288,141 @@ def _compute_amp_zero_per_sweep(dffilter, t_stim: float, filter: str) -> pd.Seri
     return result
 
 
+# Last grid_layout result, keyed by the memory of the sweep and time columns it was computed
+# from (the arrays are held, so their addresses cannot be reused). Repeated measurements of
+# one dffilter, such as update_dfoutput after each drag, skip the O(rows) layout check.
+_layout_memo: dict = {}
+
+
+def _grid_layout(sweep: np.ndarray, time_col: np.ndarray):
+    """recording_matrix.grid_layout, or None for ragged data; memoized for the last pair of columns."""
+    key = (sweep.__array_interface__["data"][0], time_col.__array_interface__["data"][0], sweep.strides, time_col.strides, len(sweep))
+    if _layout_memo.get("key") != key:
+        try:
+            layout = recording_matrix.grid_layout(sweep, time_col)
+        except ValueError:
+            layout = None
+        _layout_memo.clear()
+        _layout_memo.update(key=key, layout=layout, columns=(sweep, time_col))
+    return _layout_memo["layout"]
+
+
+def _sweep_arrays(dffilter, filter: str):
+    """
+    (sweeps, time_grid, values_2d, grid) for a long-format dffilter whose sweeps share one
+    evenly sampled time grid (sweeps in label order), or None if they do not.
+    """
+    sweep = dffilter["sweep"].to_numpy()
+    time_col = dffilter["time"].to_numpy(dtype=np.float64)
+    layout = _grid_layout(sweep, time_col)
+    if layout is None:
+        return None
+    order, n_sweeps, n_samples = layout
+    values = dffilter[filter].to_numpy(dtype=np.float64)
+    if order is not None:
+        sweep, time_col, values = sweep[order], time_col[order], values[order]
+    time_grid = time_col[:n_samples]
+    grid = SampleGrid.from_time(time_grid)
+    if grid is None:
+        return None
+    return sweep[::n_samples], time_grid, values.reshape(n_sweeps, n_samples), grid
+
+
+def _measure_sweeps_on_grid(sweeps, amps: dict, slopes: dict) -> pd.DataFrame:
+    """Sweep-mode measurements for one stim (one row per sweep) from its _amps_on_grid and _slopes_on_grid entries."""
+    amp_zero = np.where(np.isnan(amps["amp_zero"]), 0.0, amps["amp_zero"])  # as _compute_amp_zero_per_sweep
+    dfblock = pd.DataFrame({"sweep": sweeps})
+    for name in _ASPECTS:
+        dfblock[f"{name}_amp"] = -(amps[name] - amp_zero)
+        dfblock[f"{name}_slope"] = slopes[name]
+    return dfblock
+
+
+def _window_means_by_sweep(dffilter, sweeps, t_start: float, t_end: float, amp_zero_per_sweep: pd.Series, filter: str) -> np.ndarray:
+    """-(mean of dffilter[filter] over [t_start, t_end] - amp_zero) per sweep, in sweeps order; one masked groupby for all sweeps."""
+    in_window = (dffilter["time"] >= t_start) & (dffilter["time"] <= t_end)
+    means = dffilter.loc[in_window, filter].groupby(dffilter.loc[in_window, "sweep"]).mean().reindex(sweeps)
+    return -(means.to_numpy(dtype=np.float64) - amp_zero_per_sweep.reindex(sweeps, fill_value=0.0).to_numpy(dtype=np.float64))
+
+
+def _measure_sweeps_masks(dffilter, dict_t: dict, filter: str, quick: bool = False) -> pd.DataFrame:
+    """Sweep-mode measurements for one stim by time masks; for dffilters that are not on a regular grid."""
+    t_stim = float(dict_t.get("t_stim", 0.0))
+    sweeps = dffilter["sweep"].unique()
+    dfblock = pd.DataFrame({"sweep": sweeps})
+
+    # Per-sweep amp_zero: mean of dffilter[filter] in the [-0.002, -0.001] window before t_stim.
+    # Indexed by sweep value in the same order as dfblock["sweep"].
+    amp_zero_per_sweep = _compute_amp_zero_per_sweep(dffilter, t_stim, filter)
+
+    # EPSP_amp
+    t_EPSP_amp = dict_t.get("t_EPSP_amp", np.nan)
+    t_EPSP_w = dict_t.get("t_EPSP_amp_width", 2 * dict_t.get("t_EPSP_amp_halfwidth", 0))
+    if valid(t_EPSP_amp):
+        t_EPSP_amp_f = float(t_EPSP_amp)
+        if t_EPSP_w == 0 or quick:
+            dfblock["EPSP_amp"] = _measure_amp_at_time_per_sweep(dffilter, t_EPSP_amp_f, amp_zero_per_sweep, filter).values
+        else:
+            half = float(t_EPSP_w) / 2
+            dfblock["EPSP_amp"] = _window_means_by_sweep(dffilter, sweeps, t_EPSP_amp_f - half, t_EPSP_amp_f + half, amp_zero_per_sweep, filter)
+    else:
+        dfblock["EPSP_amp"] = np.nan
+
+    # EPSP_slope (vectorised fast path)
+    t_EPSP_s = dict_t.get("t_EPSP_slope_start", np.nan)
+    t_EPSP_e = dict_t.get("t_EPSP_slope_end", np.nan)
+    if valid(t_EPSP_s, t_EPSP_e) and t_EPSP_s < t_EPSP_e:
+        df_slopes = measureslope_vec(dffilter, t_EPSP_s, t_EPSP_e, filter=filter)
+        dfblock["EPSP_slope"] = -df_slopes["value"].values  # type: ignore[operator]
+    else:
+        dfblock["EPSP_slope"] = np.nan
+
+    # Volley_amp
+    t_volley_amp = dict_t.get("t_volley_amp", np.nan)
+    t_volley_w = dict_t.get("t_volley_amp_width", 2 * dict_t.get("t_volley_amp_halfwidth", 0))
+    if valid(t_volley_amp):
+        t_volley_amp_f = float(t_volley_amp)
+        if t_volley_w == 0 or quick:
+            dfblock["volley_amp"] = _measure_amp_at_time_per_sweep(dffilter, t_volley_amp_f, amp_zero_per_sweep, filter).values
+        else:
+            half = float(t_volley_w) / 2
+            dfblock["volley_amp"] = _window_means_by_sweep(dffilter, sweeps, t_volley_amp_f - half, t_volley_amp_f + half, amp_zero_per_sweep, filter)
+    else:
+        dfblock["volley_amp"] = np.nan
+
+    # Volley_slope (vectorised fast path)
+    t_volley_s = dict_t.get("t_volley_slope_start", np.nan)
+    t_volley_e = dict_t.get("t_volley_slope_end", np.nan)
+    if valid(t_volley_s, t_volley_e) and t_volley_s < t_volley_e:
+        df_slopes = measureslope_vec(dffilter, t_volley_s, t_volley_e, filter=filter)
+        dfblock["volley_slope"] = -df_slopes["value"].values  # type: ignore[operator]
+    else:
+        dfblock["volley_slope"] = np.nan
+    return dfblock
+
+
+def _stim_mode_rows(dfmean, dft: pd.DataFrame, filter: str) -> pd.DataFrame:
+    """One stim-mode row (sweep=NaN) per dft row, measured on dfmean around each stim (measure_waveforms)."""
+    measured = measure_waveforms(dfmean[filter].to_numpy(dtype=np.float64)[None, :], dfmean["time"].to_numpy(dtype=np.float64), dft, filter=filter)
+    if measured is not None:
+        stim_rows = measured.drop(columns="waveform")
+        stim_rows.insert(1, "sweep", np.nan)
+    else:  # unevenly sampled dfmean: one snippet per stim
+        rows = []
+        for _, t_row in dft.iterrows():
+            dict_t = t_row.to_dict()
+            t_stim = dict_t.get("t_stim", np.nan)
+            t_win_start = t_stim - 0.002
+            t_win_end = dict_t.get("t_EPSP_amp", t_stim + 0.01) + dict_t.get("t_EPSP_amp_width", 2 * dict_t.get("t_EPSP_amp_halfwidth", 0.001))
+            snippet = dfmean[(dfmean["time"] >= t_win_start) & (dfmean["time"] <= t_win_end)].copy().reset_index(drop=True)
+            rows.append({"stim": dict_t["stim"], "sweep": np.nan, **measure_waveform(snippet, dict_t, filter=filter)})
+        stim_rows = pd.DataFrame(rows)
+    # _norm variants are not meaningful for single stim-mean rows
+    stim_rows["EPSP_amp_norm"] = np.nan
+    stim_rows["EPSP_slope_norm"] = np.nan
+    return stim_rows
+
+
 def build_dfoutput(
     dffilter,
     dfmean,
@@ -807,91 +1464,27 @@ def build_dfoutput(
     all_rows = []
 
     # ------------------------------------------------------------------
-    # Sweep-mode rows: iterate stims, then use measureslope_vec fast path
+    # Sweep-mode rows: one (n_sweeps, n_samples) array, windows located once
+    # per stim on its SampleGrid; time masks only for ragged/uneven data
     # ------------------------------------------------------------------
-    for _, t_row in dft.iterrows():
-        dict_t = t_row.to_dict()
+    dicts_t = [t_row.to_dict() for _, t_row in dft.iterrows()]
+    arrays = _sweep_arrays(dffilter, filter)
+    if arrays is not None:
+        sweeps, time_grid, values, grid = arrays
+        amps = _amps_on_grid(values, grid, dicts_t, quick=quick)  # all stims and aspects in one pass
+        slopes = _slopes_on_grid(values, time_grid, grid, dicts_t)
+    elif verbose:
+        print("build_dfoutput: dffilter is not on a regular sample grid, using time masks")
+    for i, dict_t in enumerate(dicts_t):
         stim_nr = dict_t["stim"]
-        t_stim = float(dict_t.get("t_stim", 0.0))
-        norm_from = dict_t.get("norm_output_from")  # noqa: F841 — used in _normalize_column calls below
-        norm_to = dict_t.get("norm_output_to")  # noqa: F841 — used in _normalize_column calls below
-
-        sweeps = dffilter["sweep"].unique()
-        dfblock = pd.DataFrame({"sweep": sweeps, "stim": stim_nr})
-
-        # Per-sweep amp_zero: mean of dffilter[filter] in the [-0.002, -0.001] window before t_stim.
-        # Indexed by sweep value in the same order as dfblock["sweep"].
-        amp_zero_per_sweep = _compute_amp_zero_per_sweep(dffilter, t_stim, filter)
-
-        # EPSP_amp
-        t_EPSP_amp = dict_t.get("t_EPSP_amp", np.nan)
-        t_EPSP_w = dict_t.get("t_EPSP_amp_width", 2 * dict_t.get("t_EPSP_amp_halfwidth", 0))
-        if valid(t_EPSP_amp):
-            t_EPSP_amp_f = float(t_EPSP_amp)
-            if t_EPSP_w == 0 or quick:
-                dfblock["EPSP_amp"] = _measure_amp_at_time_per_sweep(dffilter, t_EPSP_amp_f, amp_zero_per_sweep, filter).values
-            else:
-                half = float(t_EPSP_w) / 2
-                amp_by_sweep = dffilter.groupby("sweep").apply(
-                    lambda s: (
-                        -(
-                            s.loc[
-                                (s["time"] >= t_EPSP_amp_f - half) & (s["time"] <= t_EPSP_amp_f + half),
-                                filter,
-                            ].mean()
-                            - amp_zero_per_sweep.get(s.name, 0.0)
-                        )
-                    )
-                )
-                dfblock["EPSP_amp"] = pd.Series(amp_by_sweep.values, index=dfblock.index)
-            dfblock["EPSP_amp_norm"] = _normalize_column(pd.Series(dfblock["EPSP_amp"].values, dtype=float), norm_from, norm_to).values
+        if arrays is not None:
+            dfblock = _measure_sweeps_on_grid(sweeps, amps[i], slopes[i])
         else:
-            dfblock["EPSP_amp"] = np.nan
-            dfblock["EPSP_amp_norm"] = np.nan
-
-        # EPSP_slope (vectorised fast path)
-        t_EPSP_s = dict_t.get("t_EPSP_slope_start", np.nan)
-        t_EPSP_e = dict_t.get("t_EPSP_slope_end", np.nan)
-        if valid(t_EPSP_s, t_EPSP_e) and t_EPSP_s < t_EPSP_e:
-            df_slopes = measureslope_vec(dffilter, t_EPSP_s, t_EPSP_e, filter=filter)
-            dfblock["EPSP_slope"] = -df_slopes["value"].values  # type: ignore[operator]
-            dfblock["EPSP_slope_norm"] = _normalize_column(pd.Series(dfblock["EPSP_slope"].values, dtype=float), norm_from, norm_to).values
-        else:
-            dfblock["EPSP_slope"] = np.nan
-            dfblock["EPSP_slope_norm"] = np.nan
-
-        # Volley_amp
-        t_volley_amp = dict_t.get("t_volley_amp", np.nan)
-        t_volley_w = dict_t.get("t_volley_amp_width", 2 * dict_t.get("t_volley_amp_halfwidth", 0))
-        if valid(t_volley_amp):
-            t_volley_amp_f = float(t_volley_amp)
-            if t_volley_w == 0 or quick:
-                dfblock["volley_amp"] = _measure_amp_at_time_per_sweep(dffilter, t_volley_amp_f, amp_zero_per_sweep, filter).values
-            else:
-                half = float(t_volley_w) / 2
-                volley_by_sweep = dffilter.groupby("sweep").apply(
-                    lambda s: (
-                        -(
-                            s.loc[
-                                (s["time"] >= t_volley_amp_f - half) & (s["time"] <= t_volley_amp_f + half),
-                                filter,
-                            ].mean()
-                            - amp_zero_per_sweep.get(s.name, 0.0)
-                        )
-                    )
-                )
-                dfblock["volley_amp"] = pd.Series(volley_by_sweep.values, index=dfblock.index)
-        else:
-            dfblock["volley_amp"] = np.nan
-
-        # Volley_slope (vectorised fast path)
-        t_volley_s = dict_t.get("t_volley_slope_start", np.nan)
-        t_volley_e = dict_t.get("t_volley_slope_end", np.nan)
-        if valid(t_volley_s, t_volley_e) and t_volley_s < t_volley_e:
-            df_slopes = measureslope_vec(dffilter, t_volley_s, t_volley_e, filter=filter)
-            dfblock["volley_slope"] = -df_slopes["value"].values  # type: ignore[operator]
-        else:
-            dfblock["volley_slope"] = np.nan
+            dfblock = _measure_sweeps_masks(dffilter, dict_t, filter, quick=quick)
+        dfblock.insert(1, "stim", stim_nr)
+        for col in ("EPSP_amp", "EPSP_slope"):
+            values = pd.Series(dfblock[col].values, dtype=float)
+            dfblock[f"{col}_norm"] = _normalize_column(values, dict_t.get("norm_output_from"), dict_t.get("norm_output_to")).values
 
         all_rows.append(dfblock)
         if verbose:
@@ -902,27 +1495,7 @@ def build_dfoutput(
     # (only when there are multiple stims)
     # ------------------------------------------------------------------
     if len(dft) > 1:
-        stim_rows = []
-        for _, t_row in dft.iterrows():
-            dict_t = t_row.to_dict()
-            stim_nr = dict_t["stim"]
-            t_stim = dict_t.get("t_stim", np.nan)
-
-            # Window: from just before stim to just after EPSP region
-            # Use t_EPSP_slope_end as a reasonable right boundary, with fallback
-            t_win_start = t_stim - 0.002
-            t_win_end = dict_t.get("t_EPSP_amp", t_stim + 0.01) + dict_t.get("t_EPSP_amp_width", 2 * dict_t.get("t_EPSP_amp_halfwidth", 0.001))
-            snippet = dfmean[(dfmean["time"] >= t_win_start) & (dfmean["time"] <= t_win_end)].copy().reset_index(drop=True)
-
-            measured = measure_waveform(snippet, dict_t, filter=filter)
-            stim_row = {"stim": stim_nr, "sweep": np.nan}
-            stim_row.update(measured)
-            # _norm variants are not meaningful for single stim-mean rows
-            stim_row["EPSP_amp_norm"] = np.nan
-            stim_row["EPSP_slope_norm"] = np.nan
-            stim_rows.append(stim_row)
-
-        all_rows.append(pd.DataFrame(stim_rows))
+        all_rows.append(_stim_mode_rows(dfmean, dft, filter))
         if verbose:
             print(f"build_dfoutput: stim-mode rows done ({round((time.time() - t0) * 1000)}ms)")
 
@@ -950,6 +1523,131 @@ def build_dfoutput(
     return dfoutput
 
 
+def append_dfoutput(
+    dfoutput,
+    dffilter_new,
+    dfmean,
+    dft: pd.DataFrame,
+    filter: str = "voltage",
+    quick: bool = False,
+) -> pd.DataFrame:
+    """
+    Extend dfoutput with the sweeps in dffilter_new, without re-measuring earlier sweeps.
+
+    Sweep-mode measurements are per-sweep, so only the new sweeps are measured;
+    the _norm columns (which depend on the norm_output_from..to sweep range) are
+    recomputed over the whole series, and stim-mode rows are re-measured from
+    the current dfmean. Equal to build_dfoutput on all sweeps at once.
+    """
+    dfnew = build_dfoutput(dffilter_new, dfmean, dft, filter=filter, quick=quick)
+    if dfoutput is None or dfoutput.empty or dft is None or len(dft) == 0:
+        return dfnew
+    blocks = []
+    for _, t_row in dft.iterrows():
+        dict_t = t_row.to_dict()
+        stim_nr = dict_t["stim"]
+        old = dfoutput[(dfoutput["stim"] == stim_nr) & dfoutput["sweep"].notna()]
+        new = dfnew[(dfnew["stim"] == stim_nr) & dfnew["sweep"].notna()]
+        block = pd.concat([old, new], ignore_index=True)
+        for col in ("EPSP_amp", "EPSP_slope"):
+            series = pd.Series(block[col].values, dtype=float)
+            block[f"{col}_norm"] = _normalize_column(series, dict_t.get("norm_output_from"), dict_t.get("norm_output_to")).values
+        blocks.append(block)
+    stim_rows = dfnew[dfnew["sweep"].isna()]
+    if not stim_rows.empty:
+        blocks.append(stim_rows)
+    return pd.concat(blocks, ignore_index=True)[dfnew.columns]  # type: ignore[return-value]
+
+
+# dft fields → the sweep-mode output columns measured from them. Stim-mode rows (one
+# measure_waveform per stim) are always re-measured in full; fields not listed here
+# (e.g. amp_zero, t_*_method) affect nothing else, unknown fields re-measure everything.
+_OUTPUT_COLUMNS_BY_FIELD = {
+    "t_stim": ("EPSP_amp", "volley_amp"),  # amp_zero window
+    "t_EPSP_amp": ("EPSP_amp",),
+    "t_EPSP_amp_width": ("EPSP_amp",),
+    "t_EPSP_amp_halfwidth": ("EPSP_amp",),
+    "t_EPSP_slope_start": ("EPSP_slope",),
+    "t_EPSP_slope_end": ("EPSP_slope",),
+    "t_volley_amp": ("volley_amp",),
+    "t_volley_amp_width": ("volley_amp",),
+    "t_volley_amp_halfwidth": ("volley_amp",),
+    "t_volley_slope_start": ("volley_slope",),
+    "t_volley_slope_end": ("volley_slope",),
+    "norm_output_from": (),
+    "norm_output_to": (),
+    "amp_zero": (),
+}
+_MEASURED_COLUMNS = ("EPSP_amp", "EPSP_slope", "volley_amp", "volley_slope")
+
+
+def output_columns_for_fields(fields) -> list:
+    """Sweep-mode measurement columns (of _MEASURED_COLUMNS) that depend on any of the dft fields."""
+    columns = set()
+    for field in fields:
+        if field.endswith("_method") or field.endswith("_mean"):
+            continue
+        columns.update(_OUTPUT_COLUMNS_BY_FIELD.get(field, _MEASURED_COLUMNS))
+    return [col for col in _MEASURED_COLUMNS if col in columns]
+
+
+def update_dfoutput(
+    dfoutput,
+    dffilter,
+    dfmean,
+    dft: pd.DataFrame,
+    fields,
+    filter: str = "voltage",
+    quick: bool = False,
+) -> pd.DataFrame:
+    """
+    Patch dfoutput after the dft fields listed in fields changed for the stims in dft.
+
+    Only the sweep-mode columns that depend on those fields (output_columns_for_fields)
+    are re-measured, and only for the stims in dft; the _norm columns of those stims are
+    recomputed, and their stim-mode rows (if dfoutput has stim-mode rows) re-measured
+    from dfmean. Equal to the corresponding rows of build_dfoutput on the updated dft.
+    """
+    columns = output_columns_for_fields(fields)
+    dfoutput = dfoutput.copy()
+    arrays = _sweep_arrays(dffilter, filter) if columns else None
+    dicts_t = [t_row.to_dict() for _, t_row in dft.iterrows()]
+    if arrays is not None:
+        sweeps, time_grid, values, grid = arrays
+        amp_aspects = [name for name in _ASPECTS if f"{name}_amp" in columns]
+        slope_aspects = [name for name in _ASPECTS if f"{name}_slope" in columns]
+        amps = _amps_on_grid(values, grid, dicts_t, quick=quick, aspects=amp_aspects)
+        slopes = _slopes_on_grid(values, time_grid, grid, dicts_t, aspects=slope_aspects) if slope_aspects else [{} for _ in dicts_t]
+    has_stim_rows = bool(dfoutput["sweep"].isna().any())
+    for i, dict_t in enumerate(dicts_t):
+        stim_nr = dict_t["stim"]
+        sweep_mask = (dfoutput["stim"] == stim_nr) & dfoutput["sweep"].notna()
+        if columns:
+            if arrays is not None:
+                amp_zero = np.where(np.isnan(amps[i]["amp_zero"]), 0.0, amps[i]["amp_zero"])
+                measured = {f"{name}_amp": -(amps[i][name] - amp_zero) for name in amp_aspects}
+                measured.update({f"{name}_slope": slopes[i][name] for name in slope_aspects})
+                dfblock = pd.DataFrame({"sweep": sweeps, **measured})
+            else:
+                dfblock = _measure_sweeps_masks(dffilter, dict_t, filter, quick=quick)
+            dfblock = dfblock.set_index("sweep").reindex(dfoutput.loc[sweep_mask, "sweep"].to_numpy())
+            for col in columns:
+                dfoutput.loc[sweep_mask, col] = dfblock[col].to_numpy()
+        for col in ("EPSP_amp", "EPSP_slope"):
+            series = pd.Series(dfoutput.loc[sweep_mask, col].to_numpy(), dtype=float)
+            normalized = _normalize_column(series, dict_t.get("norm_output_from"), dict_t.get("norm_output_to"))
+            dfoutput.loc[sweep_mask, f"{col}_norm"] = normalized.to_numpy()
+    if has_stim_rows:
+        for _, stim_row in _stim_mode_rows(dfmean, dft, filter).iterrows():
+            stim_mask = (dfoutput["stim"] == stim_row["stim"]) & dfoutput["sweep"].isna()
+            if stim_mask.any():
+                for col in _MEASURED_COLUMNS:
+                    dfoutput.loc[stim_mask, col] = stim_row[col]
+            else:
+                dfoutput = pd.concat([dfoutput, stim_row.to_frame().T[dfoutput.columns]], ignore_index=True)
+    return dfoutput
+
+
 # ---------------------------------------------------------------------------
 # Binned-train output
 # ---------------------------------------------------------------------------
@@ -963,9 +1661,10 @@ def build_dfbinstimoutput(
     """
     Compute output for a binned multi-stim recording.
 
-    Outer loop: bins (dfbin.groupby("sweep"), where each group is one bin's
-    mean waveform).  Inner loop: stims (dft rows).  For each (bin, stim) pair
-    the bin waveform is sliced around t_stim and passed to measure_waveform.
+    Each bin (dfbin "sweep") is one mean waveform; every (bin, stim) pair is
+    measured on the bin waveform around t_stim, as measure_waveform would. Bins
+    on a shared time grid are measured together by measure_waveforms; ragged
+    bins one snippet at a time.
 
     Args:
         dfbin:  Binned DataFrame with 'sweep' (bin index), 'time', <filter>.
@@ -977,7 +1676,13 @@ def build_dfbinstimoutput(
         volley_amp, volley_slope (one row per bin × stim).
         _norm variants are not included here; callers may add them.
     """
-    rows = []
+    arrays = _sweep_arrays(dfbin, filter)
+    measured = measure_waveforms(arrays[2], arrays[1], dft, filter=filter) if arrays is not None and len(dft) else None
+    if measured is not None:
+        measured.insert(0, "bin", arrays[0][measured.pop("waveform").to_numpy()])
+        return measured
+
+    rows = []  # ragged or unevenly sampled bins: one snippet per (bin, stim)
     for bin_nr, bin_df in dfbin.groupby("sweep"):
         bin_df = bin_df.reset_index(drop=True)
         for _, t_row in dft.iterrows():
@@ -0,0 +1,480 @@
+"""Headless batch processing of one project folder, e.g. nightly reprocessing on a compute server.
+
+run_project() takes a project through the pipeline the GUI runs on demand:
+import pending sources → detect events → outputs → group means → statistics → CSV exports.
+It reads and writes the same files as the GUI (project.brainwash, cfg.pkl, groups.pkl,
+test_sets.pkl, data/, timepoints/ and "cache <version>/"), through the same DataFrameMixin,
+so a project processed here opens in the GUI as if it had been processed there.
+Imports, event detection and outputs fan out across recordings in joblib process pools.
+Neither PyQt5 nor a matplotlib backend is imported: no display is needed.
+
+Run:  python src/brainwash/batch.py <project folder> [--redetect] [--n-jobs N] [--export FOLDER]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import pickle
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import parse
+import toml
+from joblib import Parallel, delayed
+
+from brainwash_stats.dispatcher import compute_statistical_comparison
+from brainwash_ui import (
+    applicability,
+    data_parquet,
+    event_detection,
+    export_tables,
+    recording_cache,
+    recording_import,
+    recording_pipeline,
+    source_fingerprint,
+    view_state,
+)
+from project_schema import df_projectTemplate, normalize_df_project, read_df_project
+from ui_data_frames import DataFrameMixin
+from ui_state_classes import UIstate
+
+# Formal tests ui_stat_test._apply_non_io_test runs; IO projects run ANCOVA only.
+_FORMAL_TESTS = ("t-test", "ANOVA", "Wilcoxon", "Friedman", "Cluster perm.")
+
+
+def bw_version() -> str:
+    """Program version from pyproject.toml, found as ui_widgets.Config finds it; it names the cache folder."""
+    here = Path(__file__).resolve().parent
+    anchors = [Path(sys.executable).parent] if getattr(sys, "frozen", False) else []
+    for anchor in anchors + [here, here.parent, here.parent.parent]:
+        for rel in ("pyproject.toml", "lib/pyproject.toml"):
+            if (anchor / rel).is_file():
+                return toml.load(anchor / rel)["project"]["version"]
+    raise FileNotFoundError("pyproject.toml not found next to batch.py or in its parent folders.")
+
+
+def _read_pickle(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    with open(path, "rb") as f:
+        return pickle.load(f) or {}
+
+
+class BatchProject(DataFrameMixin):
+    """DataFrameHost over one project folder, without widgets.
+
+    DataFrameMixin builds, caches and persists recordings exactly as in the GUI. df_project
+    changes stay in memory until save_df_project(), so worker processes can open the same
+    project side by side; cfg.pkl, groups.pkl and test_sets.pkl are only read.
+    """
+
+    def __init__(self, project_folder, *, version: str | None = None):
+        path_project = Path(project_folder)
+        self.projectname = path_project.name
+        self.projects_folder = path_project.parent
+        self.config = SimpleNamespace(version=version or bw_version(), transient=False, verbose=False)
+        self.uiplot = None
+        self.dict_folders = {  # ProjectMixin.build_dict_folders layout
+            "project": path_project,
+            "data": path_project / "data",
+            "timepoints": path_project / "timepoints",
+            "stim_intensity": path_project / "stim_intensity",
+            "cache": self.projects_folder / f"cache {self.config.version}" / self.projectname,
+        }
+        self.resetCacheDicts()
+        self.df_project = read_df_project(path_project)
+        self.uistate = UIstate()
+        state = _read_pickle(path_project / "cfg.pkl")
+        if state:  # unlike UIstate.load_cfg, a missing cfg.pkl is not written: defaults are used
+            self.uistate.set_state(state)
+        self.dd_groups = _read_pickle(path_project / "groups.pkl")
+        self.dd_testsets = _read_pickle(path_project / "test_sets.pkl")
+
+    def resetCacheDicts(self):
+        # The DataFrameMixin caches of UIsub.resetCacheDicts
+        self.dict_datas = {}
+        self.dict_filters = {}
+        self.dict_bins = {}
+        self.dict_means = {}
+        self.dict_ts = {}
+        self.dict_sweepts = {}
+        self.dict_outputs = {}
+        self.dict_output_norms = {}
+        self.dict_group_means = {}
+        self.dict_global_units = {}
+        self.dd_group_samples = {}
+        self.dict_diffs = {}
+
+    # ------------------------------------------------------------------
+    # DataFrameHost: what ProjectMixin provides in the GUI
+    # ------------------------------------------------------------------
+
+    def df2file(self, df, filename=None, key=None, rec=None):
+        filepath = Path(recording_cache.df_parquet_path(self.dict_folders, filename or rec, key))
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        if key == "data":
+            data_parquet.write_df(filepath, df)
+        else:
+            df.to_parquet(filepath, index=False)
+        print(f"saved {filepath}")
+
+    def get_df_project(self):
+        return self.df_project
+
+    def set_df_project(self, df=None):
+        self.df_project = df_projectTemplate() if df is None else normalize_df_project(df)
+
+    def save_df_project(self):
+        self.df_project.to_csv(str(self.dict_folders["project"] / "project.brainwash"), index=False)
+
+    def tableUpdate(self, restore_selection=True):
+        pass
+
+    def set_rec_status(self, rec_name=None):
+        df_p = self.get_df_project()
+        recs = df_p["recording_name"].tolist() if rec_name is None else [rec_name]
+        for rec in recs:
+            dft = self.get_dft(self.row(rec))
+            if dft is not None:
+                df_p.loc[df_p["recording_name"] == rec, "status"] = recording_pipeline.timepoints_status(dft)
+
+    def row(self, rec) -> pd.Series:
+        df_p = self.get_df_project()
+        return df_p[df_p["recording_name"] == rec].iloc[0]
+
+    def has_timepoints(self, rec) -> bool:
+        return Path(recording_cache.timepoints_parquet_path(self.dict_folders["timepoints"], rec)).exists()
+
+
+# ----------------------------------------------------------------------
+# Pipeline steps
+# ----------------------------------------------------------------------
+
+
+def import_pending(project: BatchProject, *, n_jobs=None) -> list[str]:
+    """Import every unparsed source (sweeps "...") as ParseDataThread does; returns error messages.
+
+    Sources that fail stay pending in df_project, to be retried by the next run.
+    """
+    df_p = project.get_df_project()
+    pending = df_p[df_p["sweeps"].astype(str) == "..."]
+    if pending.empty:
+        return []
+    folders = project.dict_folders
+    lineEdit, checkBox = project.uistate.project.lineEdit, project.uistate.project.checkBox
+    options = {
+        "data_folder": folders["data"],
+        "cache_folder": folders["cache"],
+        "gain": lineEdit["import_gain"],
+        "split_odd_even": checkBox.get("splitOddEven", False),
+        "split_at_time": lineEdit.get("split_at_time", 0) or None,
+        "memory_budget": recording_import.memory_budget(project.uistate.project.settings),
+    }
+    proj_rows = [df_proj_row for _, df_proj_row in pending.iterrows()]
+    jobs = [(df_proj_row["path"], df_proj_row["recording_name"]) for df_proj_row in proj_rows]
+    results_by_job, fingerprints, errors = {}, {}, []
+    index = source_fingerprint.load_index(folders["project"])
+    fp_options = {k: options[k] for k in ("gain", "split_odd_even", "split_at_time")}
+    for i, (source_path, recording_name) in enumerate(jobs):
+        try:
+            fingerprints[i] = source_fingerprint.source_fingerprint(source_path, **fp_options)
+        except OSError as e:
+            print(f"import_pending: no fingerprint for {source_path}: {e}")
+            continue
+        entry = source_fingerprint.lookup(index, fingerprints[i], options["data_folder"])
+        if entry is not None:
+            print(f"import_pending: {source_path} unchanged, reusing {entry['recording_name']}")
+            results_by_job[i] = recording_import.reuse_source(entry, recording_name, data_folder=folders["data"], cache_folder=folders["cache"])
+    todo = [i for i in range(len(jobs)) if i not in results_by_job]
+    for j, results, error in recording_import.import_sources([jobs[i] for i in todo], n_jobs=n_jobs, **options):
+        i = todo[j]
+        if error is not None:
+            errors.append(f"{jobs[i][0]}: {error}")
+        results_by_job[i] = results
+    if fingerprints:
+        for i, fp in fingerprints.items():
+            source_fingerprint.record(index, fp, jobs[i][1], results_by_job.get(i))
+        source_fingerprint.save_index(folders["project"], index)
+    imported = [i for i in range(len(jobs)) if results_by_job.get(i)]
+    if not imported:
+        return errors
+    # Rows are added in df_project order, regardless of completion order.
+    rows = [
+        recording_import.recording_row(proj_rows[i], rec, dict_meta, gain=options["gain"]) for i in imported for rec, dict_meta in results_by_job[i]
+    ]
+    rows2add = pd.concat(rows, axis=1).transpose()
+    df_p = pd.concat([df_p.drop(index=[pending.index[i] for i in imported]), rows2add]).reset_index(drop=True)
+    project.set_df_project(df_p)
+    print(f"import_pending: {len(rows)} recording(s) from {len(imported)} source(s), {len(jobs) - len(imported)} failed")
+    return errors
+
+
+def detect_events(project: BatchProject, *, redetect=False, n_jobs=None) -> tuple[list[str], list[str]]:
+    """find_events for parsed recordings without timepoints (every parsed recording if redetect), as ui.detectEvents does.
+
+    Returns (names of the recordings given new timepoints, error messages).
+    """
+    df_p = project.get_df_project()
+    recs, jobs = [], []
+    for _, p_row in df_p.iterrows():
+        rec = p_row["recording_name"]
+        if not recording_pipeline.is_recording_parsed(p_row) or (project.has_timepoints(rec) and not redetect):
+            continue
+        path_mean = Path(recording_cache.mean_parquet_path(project.dict_folders["cache"], rec))
+        # the GUI adds the savgol column to the mean on first read; workers only get a path when nothing is missing
+        dfmean = path_mean if path_mean.exists() and p_row["filter"] != "savgol" else project.get_dfmean(p_row)
+        recs.append(rec)
+        jobs.append((dfmean, p_row["filter"]))
+    if not jobs:
+        return [], []
+    project_state = project.uistate.project
+    detect_kwargs = {
+        "default_dict_t": project_state.default_dict_t.copy(),
+        "norm_output_from": project_state.lineEdit["norm_EPSP_from"],
+        "norm_output_to": project_state.lineEdit["norm_EPSP_to"],
+    }
+    dfts, errors = {}, []
+    for i, dft, error in event_detection.detect_recordings(jobs, n_jobs=n_jobs, **detect_kwargs):
+        if error is not None:
+            errors.append(f"{recs[i]}: {error}")
+        elif dft is None:
+            print(f"detect_events: no stims found for {recs[i]}, timepoints kept.")
+        else:
+            dfts[recs[i]] = dft
+    for rec in [rec for rec in recs if rec in dfts]:  # df_project order
+        dft = dfts[rec]
+        for cache in (project.dict_outputs, project.dict_output_norms, project.dict_sweepts):
+            cache.pop(rec, None)
+        project.dict_ts[rec] = dft
+        if not project_state.checkBox["timepoints_per_stim"] and len(dft) > 1:
+            dfoutput = project.get_dfoutput(project.row(rec), reset=True, dft=dft)
+            recording_pipeline.apply_uniform_timepoints(dft, dfoutput, precision=project_state.settings["precision"])
+            recording_pipeline.normalize_dft_dtypes(dft)
+        df_p.loc[df_p["recording_name"] == rec, "stims"] = len(dft)
+    if dfts:
+        event_detection.write_timepoints(project.dict_folders["timepoints"], dfts)
+        project.set_df_project(df_p)
+        for rec in dfts:
+            project.set_rec_status(rec)
+    print(f"detect_events: {len(dfts)} updated, {len(jobs) - len(dfts) - len(errors)} without stims, {len(errors)} failed")
+    return list(dfts), errors
+
+
+def _output_job(i, project_folder, version, rec):
+    # Worker entry point: opens the project itself, so only names go out; exceptions are returned rather than raised.
+    try:
+        project = BatchProject(project_folder, version=version)
+        project.get_dfoutput(project.row(rec), reset=True)
+        return i, None
+    except Exception as e:
+        return i, f"{type(e).__name__}: {e}"
+
+
+def build_outputs(project: BatchProject, recs, *, n_jobs=None) -> list[str]:
+    """Rebuild and persist the output parquets of recs in parallel; returns error messages.
+
+    Workers read df_project from disk: save_df_project() first.
+    """
+    if n_jobs is None:
+        n_jobs = parse.N_JOBS
+    jobs = [(i, str(project.dict_folders["project"]), project.config.version, rec) for i, rec in enumerate(recs)]
+    if n_jobs == 1 or len(jobs) < 2:
+        done = (_output_job(*job) for job in jobs)
+    else:
+        done = Parallel(n_jobs=n_jobs, return_as="generator_unordered", batch_size=1)(delayed(_output_job)(*job) for job in jobs)
+    errors = [f"{recs[i]}: {error}" for i, error in done if error is not None]
+    # workers also re-persisted each dft (volley means backfilled): drop what this process holds
+    for rec in recs:
+        for cache in (project.dict_ts, project.dict_outputs, project.dict_output_norms, project.dict_filters, project.dict_bins):
+            cache.pop(rec, None)
+    print(f"build_outputs: {len(recs) - len(errors)} built, {len(errors)} failed")
+    return errors
+
+
+def build_group_means(project: BatchProject) -> tuple[dict, list[str]]:
+    """Rebuild the recording-level mean of every group with recordings; returns ({group_ID: mean}, error messages).
+
+    Stored slice/subject-level means are removed too, for the GUI to rebuild from the new outputs.
+    """
+    group_means, errors = {}, []
+    project.dict_group_means = {}
+    for group_ID, group in project.dd_groups.items():
+        for level in project.VALID_LEVELS:
+            level_suffix = "" if level == project.LEVEL_RECORDING else f"_{level}"
+            Path(recording_cache.group_mean_parquet_path(project.dict_folders["cache"], group_ID, level_suffix=level_suffix)).unlink(missing_ok=True)
+        if not group.get("rec_IDs"):
+            continue
+        try:
+            group_means[group_ID] = project.get_dfgroupmean(group_ID)
+        except Exception as e:
+            errors.append(f"group {group.get('group_name', group_ID)}: {type(e).__name__}: {e}")
+    return group_means, errors
+
+
+def run_statistics(project: BatchProject) -> list[dict] | None:
+    """The formal test configured in cfg.pkl on the shown groups and test sets, as ui_stat_test applies it.
+
+    Returns the results (each with its "config"), or None if no test is configured or it does not apply.
+    """
+    stat_test, checkBox = project.uistate.stat_test, project.uistate.project.checkBox
+    test_type = stat_test.test_type
+    experiment_type = project.uistate.experiment.experiment_type
+    dd_groups, dd_testsets = project.dd_groups, project.dd_testsets
+    common = {
+        "groups": view_state.groups_with_recordings(dd_groups, view_state.visible_group_ids(dd_groups)),
+        "dd_groups": dd_groups,
+        "dd_testsets": dd_testsets,
+        "get_group_testset_means_fn": project.get_group_testset_means,
+        "norm": bool(checkBox.get("norm_EPSP", False)),
+        "amp": bool(checkBox.get("EPSP_amp", True)),
+        "slope": bool(checkBox.get("EPSP_slope", True)),
+        "n_unit": stat_test.buttonGroup_test_n,
+        "experiment_type": experiment_type,
+        "test_sw": bool(stat_test.test_sw),
+        "test_levene": bool(stat_test.test_levene),
+    }
+    if experiment_type == "io":
+        if test_type != "ANCOVA":
+            print(f"run_statistics: IO projects run ANCOVA only, {test_type} configured.")
+            return None
+        force0 = bool(checkBox.get("io_force0", False))
+        comp = compute_statistical_comparison(
+            test_type="ANCOVA",
+            variant="unpaired",
+            tails="two-sided",
+            fdr=False,
+            ref=0.0,
+            uistate=project.uistate,
+            force_through_zero=force0,
+            **common,
+        )
+    elif test_type in _FORMAL_TESTS:
+        warning = applicability.warning_for_test_type(
+            test_type,
+            dd_groups=dd_groups,
+            dd_testsets=dd_testsets,
+            ttest_variant=stat_test.test_t_variant,
+            wilcox_variant=stat_test.test_wilcox_variant,
+            experiment_type=experiment_type,
+        )
+        if warning:
+            print(f"run_statistics: {test_type} not applicable: {warning}")
+            return None
+        if test_type == "Wilcoxon":
+            variant, tails = stat_test.test_wilcox_variant, stat_test.test_wilcox_tails
+            ref = stat_test.label_test_wilcox_one_sample_value
+        elif test_type == "t-test":
+            variant, tails = stat_test.test_t_variant, stat_test.test_t_tails
+            ref = stat_test.label_test_t_one_sample_value
+        else:  # ANOVA / Friedman / Cluster: the t-test variant does not redirect the engine
+            variant, tails = "unpaired", stat_test.test_t_tails
+            ref = stat_test.label_test_t_one_sample_value
+        if experiment_type == "PP" and variant == "one-sample":
+            try:  # PP one-sample: facilitation vs 1 is the natural null when the setting still holds 0
+                ref = 1.0 if float(ref) == 0.0 else ref
+            except (TypeError, ValueError):
+                ref = 1.0
+        comp = compute_statistical_comparison(test_type=test_type, variant=variant, tails=tails, fdr=bool(stat_test.test_fdr), ref=ref, **common)
+    else:
+        print(f"run_statistics: no formal test configured ({test_type}).")
+        return None
+    config = dict(comp.get("config") or {"type": test_type})
+    if comp.get("error") or comp.get("not_implemented"):
+        config["error"] = comp.get("error") or comp.get("not_implemented")
+        return [{"config": config, "error": config["error"]}]
+    results = [r for r in comp.get("results", []) if isinstance(r, dict)] or [{}]
+    for r in results:
+        r.setdefault("config", config)
+    return results
+
+
+def _json_default(o):
+    return o.item() if isinstance(o, np.generic) else str(o)
+
+
+def write_exports(project: BatchProject, export_folder, group_means: dict, statistics: list[dict] | None = None) -> None:
+    """The GUI's output and group-mean CSV exports (mV), for every recording and for group_means, plus the statistics as JSON."""
+    export_folder = Path(export_folder)
+    export_folder.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for _, p_row in project.get_df_project().iterrows():
+        rec = p_row["recording_name"]
+        if not recording_pipeline.is_recording_parsed(p_row) or not project.has_timepoints(rec):
+            continue
+        df_out = project.V2mV(project.get_dfoutput(p_row))
+        if df_out is not None and not df_out.empty:
+            export_tables.output_table(df_out).to_csv(export_folder / f"{rec}_output.csv", index=False)
+            count += 1
+    named_means = [(project.dd_groups[group_ID].get("group_name", str(group_ID)), project.V2mV(df_mean)) for group_ID, df_mean in group_means.items()]
+    df_all = export_tables.group_means_table(named_means)
+    if df_all is not None:
+        df_all.to_csv(export_folder / f"{project.projectname}_group_means.csv", index=False)
+    if statistics is not None:
+        with open(export_folder / f"{project.projectname}_statistics.json", "w") as f:
+            json.dump(statistics, f, indent=2, default=_json_default)
+    print(f"write_exports: output for {count} recording(s), group means and statistics in {export_folder}")
+
+
+def run_project(project_folder, *, version=None, redetect=False, export_folder=None, n_jobs=None) -> list[str]:
+    """Run every pipeline step on the project at project_folder; returns the error messages of all steps.
+
+    Exports go to export_folder, by default the GUI's "Export" folder next to the project.
+    """
+    t0 = time.perf_counter()
+    project = BatchProject(project_folder, version=version)
+    print(f"run_project: {project.projectname}, {len(project.get_df_project())} recording(s), cache {project.dict_folders['cache']}")
+    errors = import_pending(project, n_jobs=n_jobs)
+    project.save_df_project()
+    print(f"run_project: import done in {time.perf_counter() - t0:.1f} s")
+    detected, detect_errors = detect_events(project, redetect=redetect, n_jobs=n_jobs)
+    errors += detect_errors
+    project.save_df_project()
+    print(f"run_project: detection done in {time.perf_counter() - t0:.1f} s")
+    stale = []
+    for _, p_row in project.get_df_project().iterrows():
+        rec = p_row["recording_name"]
+        if not recording_pipeline.is_recording_parsed(p_row) or not project.has_timepoints(rec):
+            continue
+        path_output = recording_cache.output_parquet_path(project.dict_folders["cache"], rec, bin_active=pd.notna(p_row["bin_size"]))
+        if rec in detected or not Path(path_output).exists():
+            stale.append(rec)
+    errors += build_outputs(project, stale, n_jobs=n_jobs)
+    print(f"run_project: outputs done in {time.perf_counter() - t0:.1f} s")
+    group_means, group_errors = build_group_means(project)
+    errors += group_errors
+    try:
+        statistics = run_statistics(project)
+    except Exception as e:
+        errors.append(f"statistics: {type(e).__name__}: {e}")
+        statistics = None
+    write_exports(project, export_folder or project.projects_folder / "Export", group_means, statistics)
+    print(f"run_project: {project.projectname} done in {time.perf_counter() - t0:.1f} s, {len(errors)} error(s)")
+    for error in errors:
+        print(f"  {error}")
+    return errors
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Process a brainwash project without the GUI: import, detect, outputs, group means, statistics, exports."
+    )
+    parser.add_argument("project", help="project folder (the one holding project.brainwash)")
+    parser.add_argument("--redetect", action="store_true", help="detect events again for every recording, not only those without timepoints")
+    parser.add_argument("--n-jobs", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--export", default=None, help="export folder (default: Export/ next to the project)")
+    parser.add_argument("--cache-version", default=None, help="version naming the cache folder (default: from pyproject.toml)")
+    args = parser.parse_args(argv)
+    errors = run_project(args.project, version=args.cache_version, redetect=args.redetect, export_folder=args.export, n_jobs=args.n_jobs)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    # Run as the module "batch", not __main__, so joblib workers can import _output_job by name.
+    import batch
+
+    sys.exit(batch.main())
@@ -3,14 +3,18 @@
 from . import (
     app_context,
     applicability,
+    data_parquet,
+    live_import,
     plot_drag,
     plot_model,
     plot_series,
     plot_stim,
     plot_testsets,
     recording_cache,
+    recording_import,
     recording_pipeline,
     refresh_bus,
+    source_fingerprint,
     statusbar,
     view_state,
 )
@@ -18,14 +22,18 @@ from . import (
 __all__ = [
     "app_context",
     "applicability",
+    "data_parquet",
+    "live_import",
     "plot_drag",
     "plot_model",
     "plot_series",
     "plot_stim",
     "plot_testsets",
     "recording_cache",
+    "recording_import",
     "recording_pipeline",
     "refresh_bus",
+    "source_fingerprint",
     "statusbar",
     "view_state",
 ]
\ No newline at end of file
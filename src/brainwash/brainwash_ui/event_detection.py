@@ -0,0 +1,84 @@
+"""Pure batch event-detection worker + scheduler for DetectEventsThread (no Qt).
+
+detect_recording() runs find_events (recording_pipeline.build_dft) on one
+recording's mean. Workers read the mean parquet themselves, so only its
+path goes out and only the (small) dft comes back.
+detect_recordings() fans recordings across a joblib process pool and yields
+dfts as they complete. write_timepoints() persists a finished batch: every
+parquet is written to a temporary file first and only renamed into place
+once all of them have been written.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pandas as pd
+import parse
+from joblib import Parallel, delayed
+
+from brainwash_ui import recording_cache, recording_pipeline
+
+
+def detect_recording(
+    dfmean,
+    *,
+    default_dict_t: dict,
+    filter: str,
+    norm_output_from: float,
+    norm_output_to: float,
+) -> pd.DataFrame | None:
+    """build_dft on one recording; dfmean is the mean DataFrame or the path of its parquet. None if no stims were found."""
+    if not isinstance(dfmean, pd.DataFrame):
+        dfmean = pd.read_parquet(dfmean)
+    return recording_pipeline.build_dft(
+        dfmean,
+        default_dict_t=default_dict_t,
+        filter=filter,
+        norm_output_from=norm_output_from,
+        norm_output_to=norm_output_to,
+    )
+
+
+def _detect_job(i, dfmean, filter, kwargs):
+    # Worker entry point; exceptions are returned rather than raised so one bad recording does not abort the batch.
+    try:
+        return i, detect_recording(dfmean, filter=filter, **kwargs), None
+    except Exception as e:
+        return i, None, f"{type(e).__name__}: {e}"
+
+
+def detect_recordings(jobs: list[tuple], *, n_jobs=None, **kwargs):
+    """Detect events for many (dfmean or mean parquet path, filter) jobs in parallel.
+
+    Yields (job_index, dft or None, error) as each job finishes, in completion order.
+    error is None on success, else a message string. kwargs are forwarded to
+    detect_recording (default_dict_t, norm_output_from, norm_output_to).
+    """
+    if n_jobs is None:
+        n_jobs = parse.N_JOBS
+    if n_jobs == 1 or len(jobs) < 2:
+        for i, (dfmean, filter) in enumerate(jobs):
+            yield _detect_job(i, dfmean, filter, kwargs)
+        return
+    yield from Parallel(n_jobs=n_jobs, return_as="generator_unordered", batch_size=1)(
+        delayed(_detect_job)(i, dfmean, filter, kwargs) for i, (dfmean, filter) in enumerate(jobs)
+    )
+
+
+def write_timepoints(timepoints_folder, dfts: dict) -> None:
+    """Persist {rec: dft} as timepoints parquets, all or nothing: nothing is replaced unless every file could be written."""
+    Path(timepoints_folder).mkdir(parents=True, exist_ok=True)
+    staged = []
+    try:
+        for rec, dft in dfts.items():
+            path = recording_cache.timepoints_parquet_path(str(timepoints_folder), rec)
+            staged.append(path)  # before the write, so a partial .tmp is cleaned up too
+            dft.to_parquet(f"{path}.tmp", index=False)
+    except Exception:
+        for path in staged:
+            Path(f"{path}.tmp").unlink(missing_ok=True)
+        raise
+    for path in staged:
+        os.replace(f"{path}.tmp", path)
@@ -0,0 +1,30 @@
+"""CSV export tables shared by ExportMixin and batch (no Qt).
+
+Both take frames already converted to display units (DataFrameMixin.V2mV).
+"""
+
+from __future__ import annotations
+
+import pandas as pd
+
+OUTPUT_COLUMNS = ["stim", "sweep", "EPSP_slope", "EPSP_slope_norm", "EPSP_amp", "EPSP_amp_norm", "volley_amp", "volley_slope"]
+
+
+def output_table(df_out: pd.DataFrame) -> pd.DataFrame:
+    """The OUTPUT_COLUMNS of one recording's output that it has; all columns if it has none of them."""
+    cols_to_export = [c for c in OUTPUT_COLUMNS if c in df_out.columns]
+    return df_out[cols_to_export].copy() if cols_to_export else df_out.copy()
+
+
+def group_means_table(group_means: list[tuple[str, pd.DataFrame]]) -> pd.DataFrame | None:
+    """(group_name, group mean df) pairs as one table with a leading group_name column; None if every df is empty."""
+    dfs = []
+    for group_name, df_mean in group_means:
+        if df_mean is None or df_mean.empty:
+            continue
+        df_mean = df_mean.copy()
+        df_mean.insert(0, "group_name", group_name)
+        dfs.append(df_mean)
+    if not dfs:
+        return None
+    return pd.concat(dfs, ignore_index=True)
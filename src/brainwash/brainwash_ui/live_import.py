@@ -0,0 +1,203 @@
+"""Follow an acquisition folder and append new sweeps to one recording (no Qt).
+
+LiveRecording polls a folder for newly written .ibw/.abf files and appends
+them as sweeps. Raw and zeroed sweeps are stored as parquet datasets: a
+directory at the usual data/<rec>.parquet and cache/<rec>_filter.parquet
+path, holding one part file per appended batch, so nothing already on disk
+is rewritten. Raw parts use the compact layout (data_parquet reads the
+directory as one recording); filter parts are long format, which
+pd.read_parquet reads like a single file. In memory, dffilter is kept as
+the list of appended batches and concatenated only when it is read.
+The mean waveform is a running sum over sweeps, and dfoutput is extended
+for the new sweeps only (analysis_v3.append_dfoutput).
+
+i_stim (the zeroing baseline) is fixed by the first batch, so sweeps that
+are already zeroed stay valid as more arrive.
+"""
+
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+import analysis_v3 as analysis
+import numpy as np
+import pandas as pd
+import parse
+import recording_matrix
+from recording_matrix import RecordingMatrix
+
+from brainwash_ui import data_parquet, recording_cache, recording_pipeline
+
+LIVE_SUFFIXES = (".ibw", ".abf")
+POLL_INTERVAL_MS = 2000
+SETTLE_SECONDS = 2.0  # a file untouched for this long is assumed to be completely written
+FILTER_COLUMNS = ["sweep", "time", "t0", "datetime", "voltage"]  # parse.zeroSweeps column order
+
+
+def append_part(dataset_path, data) -> Path:
+    """
+    Write data as the next part file of the parquet dataset (directory) at dataset_path:
+    a RecordingMatrix in the compact layout, a DataFrame as-is.
+    """
+    folder = Path(dataset_path)
+    if folder.is_file():
+        raise ValueError(f"append_part: {folder} is a single parquet file, not an appendable dataset")
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / f"part-{len(data_parquet.part_paths(folder)):05d}.parquet"
+    if isinstance(data, RecordingMatrix):
+        data_parquet.write_matrix(path, data)
+    else:
+        data.to_parquet(path, index=False)
+    return path
+
+
+class LiveRecording:
+    """Incrementally imported recording, fed from an acquisition folder.
+
+    update() reads files that appeared since the previous call and appends
+    them; dfmean, dffilter and (given a dft) dfoutput then cover all sweeps.
+    """
+
+    def __init__(
+        self,
+        folder,
+        recording_name: str,
+        *,
+        data_folder,
+        cache_folder,
+        gain: float = 1.0,
+        channel: int = 0,
+        filter_val="voltage",
+        filter_params: dict | None = None,
+        persist: bool = True,
+    ):
+        self.folder = Path(folder)
+        self.recording_name = recording_name
+        self.data_folder = data_folder
+        self.cache_folder = cache_folder
+        self.gain = gain
+        self.channel = channel
+        self.filter_val = filter_val
+        self.filter_params = filter_params or {}
+        self.persist = persist
+        self.seen: set[Path] = set()
+        self._sizes: dict[Path, int] = {}  # size at the previous poll, for files not yet read
+        self.time = None  # shared time grid, set by the first batch
+        self.i_stim = None
+        self.n_sweeps = 0
+        self._voltage_sum = None  # per-sample sum and count of non-NaN values over all sweeps
+        self._voltage_count = None
+        self._sweep_datetimes = []
+        self.dfmean = None
+        self._dffilter_parts = []  # dffilter rows of each appended batch; see dffilter
+        self.dfoutput = None
+
+    @property
+    def dffilter(self) -> pd.DataFrame | None:
+        """Zeroed sweeps of every batch so far; batches appended since the last read are concatenated here."""
+        if len(self._dffilter_parts) > 1:
+            self._dffilter_parts = [pd.concat(self._dffilter_parts, ignore_index=True)]
+        return self._dffilter_parts[0] if self._dffilter_parts else None
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def poll(self) -> list[Path]:
+        """New files ready to read: unchanged in size since the previous poll, or untouched for SETTLE_SECONDS."""
+        ready = []
+        sizes = {}
+        now = time.time()
+        for f in sorted(self.folder.iterdir()):
+            if f in self.seen or not f.is_file() or f.suffix.lower() not in LIVE_SUFFIXES:
+                continue
+            st = f.stat()
+            if st.st_size == 0:
+                continue
+            if self._sizes.get(f) == st.st_size or now - st.st_mtime >= SETTLE_SECONDS:
+                ready.append(f)
+            else:
+                sizes[f] = st.st_size
+        self._sizes = sizes
+        return ready
+
+    def read(self, files) -> RecordingMatrix:
+        """Sweeps of files (this recording's channel), in acquisition order."""
+        matrices = [parse.source2matrices(str(f), gain=self.gain)[self.channel] for f in files]
+        matrix = recording_matrix.concat(matrices)
+        if not np.isnat(matrix.datetime).any():
+            order = np.argsort(matrix.datetime, kind="stable")
+            matrix = RecordingMatrix.from_arrays(matrix.voltage[order], matrix.time, t0=matrix.t0[order], datetime=matrix.datetime[order])
+        return matrix
+
+    # ------------------------------------------------------------------
+    # Appending
+    # ------------------------------------------------------------------
+
+    def append(self, matrix: RecordingMatrix) -> pd.DataFrame:
+        """Append matrix as the next sweeps; returns the dffilter rows of the new sweeps."""
+        if self.time is not None and not np.array_equal(matrix.time, self.time):
+            raise ValueError(f"Inconsistent sweep lengths detected: {matrix.n_samples} samples, expected {len(self.time)}")
+        voltage = matrix.voltage.astype(np.float64)
+        voltage_sum = np.nansum(voltage, axis=0)
+        voltage_count = np.count_nonzero(~np.isnan(voltage), axis=0)
+        if self._voltage_sum is not None:
+            voltage_sum += self._voltage_sum
+            voltage_count += self._voltage_count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = voltage_sum / voltage_count
+        dfmean, i_stim = parse.finish_dfmean(pd.DataFrame({"time": matrix.time, "voltage": mean}), i_stim=self.i_stim)
+        # Nothing is committed until the mean (and i_stim) is known to be valid.
+        sweeps = np.arange(self.n_sweeps, self.n_sweeps + matrix.n_sweeps)
+        matrix = RecordingMatrix.from_arrays(matrix.voltage, matrix.time, t0=matrix.t0, datetime=matrix.datetime, sweeps=sweeps)
+        dffilter_new = matrix.zeroed(i_stim).to_long("voltage")[FILTER_COLUMNS]
+        if self.filter_val == "savgol":
+            dfmean["savgol"] = analysis.addFilterSavgol(dfmean, **self.filter_params)
+            dffilter_new["savgol"] = analysis.addFilterSavgol(dffilter_new, **self.filter_params)
+
+        self.time, self.i_stim = matrix.time, i_stim
+        self._voltage_sum, self._voltage_count = voltage_sum, voltage_count
+        self.n_sweeps += matrix.n_sweeps
+        self._sweep_datetimes.extend(matrix.datetime)
+        self.dfmean = dfmean
+        self._dffilter_parts.append(dffilter_new)
+        if self.persist:
+            append_part(recording_cache.data_parquet_path(self.data_folder, self.recording_name), matrix)
+            append_part(recording_cache.filter_parquet_path(self.cache_folder, self.recording_name), dffilter_new)
+            Path(self.cache_folder).mkdir(parents=True, exist_ok=True)
+            dfmean.to_parquet(recording_cache.mean_parquet_path(self.cache_folder, self.recording_name), index=False)
+        return dffilter_new
+
+    def update(self, dft=None, dfoutput=None) -> int:
+        """
+        Read and append files that appeared since the previous call; returns the number of new sweeps.
+
+        With a dft, self.dfoutput is extended from dfoutput (the caller's current output, which
+        must cover all earlier sweeps) for the new sweeps only, or rebuilt if it does not.
+        """
+        files = self.poll()
+        if not files:
+            return 0
+        n_before = self.n_sweeps
+        dffilter_new = self.append(self.read(files))
+        self.seen.update(files)
+        print(f"LiveRecording.update: {self.recording_name}: {len(files)} new file(s), {self.n_sweeps - n_before} new sweep(s)")
+        if dft is not None and not dft.empty:
+            covered = dfoutput is not None and not dfoutput.empty and dfoutput["sweep"].max() == n_before - 1
+            if covered:
+                self.dfoutput = recording_pipeline.append_dfoutput_from_inputs(dfoutput, dffilter_new, self.dfmean, dft, filter_val=self.filter_val)
+            else:
+                self.dfoutput = recording_pipeline.build_dfoutput_from_inputs(self.dffilter, self.dfmean, dft, filter_val=self.filter_val)
+        return self.n_sweeps - n_before
+
+    def metadata(self) -> dict:
+        """Same keys as parse.metadata, without scanning dffilter."""
+        matrix = RecordingMatrix.from_arrays(np.empty((0, len(self.time))), self.time)
+        df_sweeps = pd.DataFrame({"sweep": np.arange(self.n_sweeps), "datetime": pd.to_datetime(self._sweep_datetimes)})
+        return {
+            "nsweeps": self.n_sweeps,
+            "sweep_duration": matrix.sweep_duration,
+            "sampling_rate": matrix.sampling_rate,
+            "sweep_hz": parse.compute_sweep_hz(df_sweeps),
+        }
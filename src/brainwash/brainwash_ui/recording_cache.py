@@ -29,6 +29,10 @@ def timepoints_parquet_path(timepoints_folder: str, recording_name: str) -> str:
     return f"{timepoints_folder}/{recording_name}.parquet"
 
 
+def sweep_timepoints_parquet_path(cache_folder: str, recording_name: str) -> str:
+    return f"{cache_folder}/{recording_name}_timepoints_sweep.parquet"
+
+
 def stim_intensity_csv_path(stim_intensity_folder: str, recording_name: str) -> str:
     """Per-recording user-owned stim strength CSV (µA).
 
@@ -47,4 +51,15 @@ def data_parquet_path(data_folder: str, recording_name: str) -> str:
 
 
 def group_mean_parquet_path(cache_folder: str, group_id, *, level_suffix: str = "") -> str:
-    return f"{cache_folder}/group_{group_id}{level_suffix}_mean.parquet"
\ No newline at end of file
+    return f"{cache_folder}/group_{group_id}{level_suffix}_mean.parquet"
+
+
+def df_parquet_path(dict_folders: dict, filename: str, key: str | None = None) -> str:
+    """Where df2file stores filename under key: timepoints and data in their project subfolders, anything else in the cache."""
+    if key is None:
+        return f"{dict_folders['cache']}/{filename}.parquet"
+    if key == TIMEPOINTS_CACHE_KEY:
+        return f"{dict_folders['timepoints']}/{filename}.parquet"
+    if key == "data":
+        return f"{dict_folders['data']}/{filename}.parquet"
+    return f"{dict_folders['cache']}/{filename}_{key}.parquet"
@@ -0,0 +1,280 @@
+"""Pure recording import worker + scheduler for ParseDataThread (no Qt).
+
+import_source() parses one df_project source into RecordingMatrix sweeps
+(parse.source2matrices; long format only for ragged sources), writes its
+data/mean/filter parquets and returns only names and metadata, so it can run
+in a worker process without shipping DataFrames back to the UI process.
+import_sources() fans pending sources across a joblib process pool and
+yields results as they complete.
+"""
+
+from __future__ import annotations
+
+import shutil
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import parse
+import pyabf
+import pyarrow as pa
+import pyarrow.parquet as pq
+from joblib import Parallel, delayed, effective_n_jobs
+
+from recording_matrix import RecordingMatrix
+
+from brainwash_ui import data_parquet, recording_cache, source_fingerprint
+
+# ABF files whose in-memory import would peak above this (bytes) are streamed in blocks instead.
+# The budget is for the whole import: import_sources divides it between its workers.
+MEMORY_BUDGET = 1 << 30
+
+_FILTER_COLUMNS = ["sweep", "time", "t0", "datetime", "voltage"]  # parse.zeroSweeps column order
+
+
+def memory_budget(project_settings: dict) -> int:
+    """The import memory budget (bytes) set in a project's settings as import_memory_mb."""
+    return int(float(project_settings.get("import_memory_mb", MEMORY_BUDGET >> 20)) * (1 << 20))
+
+
+def recording_names(recording_name: str, dict_dfs_raw: dict) -> dict:
+    """Map source2matrices / source2dfs keys to recording names.
+
+    Keys are either plain channel ints {ch: df} or split tuples {(ch, label): df};
+    _ch<N> is appended only for multi-channel sources, _<label> for splits.
+    Returns {rec: key}.
+    """
+    if not dict_dfs_raw:
+        return {}
+    split_keys = isinstance(next(iter(dict_dfs_raw)), tuple)
+    n_channels = len({k[0] for k in dict_dfs_raw} if split_keys else dict_dfs_raw)
+    names = {}
+    for key in dict_dfs_raw:
+        channel, label = key if split_keys else (key, None)
+        ch_suffix = f"_ch{channel}" if n_channels > 1 else ""
+        label_suffix = f"_{label}" if split_keys else ""
+        names[f"{recording_name}{ch_suffix}{label_suffix}"] = key
+    return names
+
+
+def build_recording(df_raw):
+    """Raw sweeps (RecordingMatrix or long DataFrame) -> (dfmean, dffilter, dict_meta), as persisted at import."""
+    dfmean, i_stim = parse.build_dfmean(df_raw)
+    dffilter = parse.zeroSweeps(df_raw, i_stim=i_stim)
+    if isinstance(dffilter, RecordingMatrix):
+        dffilter = dffilter.to_long(value_col="voltage")[_FILTER_COLUMNS]
+    dict_meta = parse.metadata(dffilter)
+    return dfmean, dffilter, dict_meta
+
+
+def recording_row(df_proj_row, new_name: str, dict_meta: dict, *, gain):
+    """The df_project row of one imported recording: a copy of its source row (df_proj_row) with a new ID and dict_meta filled in."""
+    df_proj_new_row = df_proj_row.astype(object)  # a copy that takes the mixed-type values below, whatever dtype iterrows gave the row
+    df_proj_new_row["ID"] = str(uuid.uuid4())
+    df_proj_new_row["recording_name"] = new_name
+    df_proj_new_row["gain"] = gain
+    df_proj_new_row["sweeps"] = dict_meta.get("nsweeps", None)
+    df_proj_new_row["channel"] = ""  # dict_meta.get('channel', None)
+    df_proj_new_row["sweep_duration"] = dict_meta.get("sweep_duration", None)
+    df_proj_new_row["sampling_rate"] = dict_meta.get("sampling_rate", None)
+    df_proj_new_row["resets"] = ""  # dict_meta.get('resets', None)
+    # sweep_hz: inter-sweep rate derived from t0 timestamps; NaN if unavailable
+    sweep_hz = dict_meta.get("sweep_hz", None)
+    df_proj_new_row["sweep_hz"] = sweep_hz if sweep_hz is not None else float("nan")
+    # Build pipe-delimited status flags; append "default Hz" when sweep_hz is absent
+    status_flags = ["Read"]
+    if sweep_hz is None:
+        status_flags.append("default Hz")
+    df_proj_new_row["status"] = "|".join(status_flags)
+    return df_proj_new_row
+
+
+def write_recording(rec: str, df_raw, dfmean, dffilter, *, data_folder, cache_folder, fingerprint=None) -> None:
+    Path(data_folder).mkdir(parents=True, exist_ok=True)
+    Path(cache_folder).mkdir(parents=True, exist_ok=True)
+    if isinstance(df_raw, RecordingMatrix):
+        data_parquet.write_matrix(recording_cache.data_parquet_path(data_folder, rec), df_raw, fingerprint=fingerprint)
+    else:
+        data_parquet.write_df(recording_cache.data_parquet_path(data_folder, rec), df_raw, fingerprint=fingerprint)
+    dfmean.to_parquet(recording_cache.mean_parquet_path(cache_folder, rec), index=False)
+    dffilter.to_parquet(recording_cache.filter_parquet_path(cache_folder, rec), index=False)
+
+
+def import_source(
+    source_path,
+    recording_name: str,
+    *,
+    data_folder,
+    cache_folder,
+    gain: float = 1.0,
+    split_odd_even: bool = False,
+    split_at_time=None,
+    persist: bool = True,
+    progress_callback=None,
+    status_callback=None,
+    memory_budget: int = MEMORY_BUDGET,
+) -> list[tuple[str, dict]]:
+    """Parse one source and write every resulting recording.
+
+    Sources whose sweeps share one time grid are parsed straight into RecordingMatrix sweeps
+    (parse.source2matrices); ragged ones fall back to source2dfs long format. An ABF file too
+    large for memory_budget is streamed in blocks (see import_abf_chunked). Persisted data
+    parquets are stamped with the source's fingerprint (see source_fingerprint.lookup).
+    Returns [(rec, dict_meta), ...] in source key order; empty if nothing could be read.
+    """
+    fingerprint = None
+    if persist:
+        fingerprint = source_fingerprint.source_fingerprint(source_path, gain=gain, split_odd_even=split_odd_even, split_at_time=split_at_time)
+    if persist and not split_odd_even and not split_at_time and Path(source_path).suffix.lower() == ".abf":
+        abf = pyabf.ABF(str(source_path), loadData=False)
+        if abf.dataPointCount * parse.ABF_BYTES_PER_SAMPLE > memory_budget:
+            return import_abf_chunked(
+                abf,
+                recording_name,
+                data_folder=data_folder,
+                cache_folder=cache_folder,
+                memory_budget=memory_budget,
+                status_callback=status_callback,
+                fingerprint=fingerprint,
+            )
+    parse_kwargs = {"gain": gain, "split_odd_even": split_odd_even, "split_at_time": split_at_time, "progress_callback": progress_callback}
+    try:
+        dict_dfs_raw = parse.source2matrices(source_path, **parse_kwargs)
+    except ValueError as e:  # ragged or duplicated sweeps: no shared time grid
+        print(f"import_source: {e}; parsing {source_path} in long format.")
+        dict_dfs_raw = parse.source2dfs(source=source_path, **parse_kwargs)
+    results = []
+    for rec, key in recording_names(recording_name, dict_dfs_raw).items():
+        print(f"import_source: {rec}")
+        if status_callback:
+            status_callback("building dataframe...")
+        df_raw = dict_dfs_raw[key]
+        dfmean, dffilter, dict_meta = build_recording(df_raw)
+        if persist:
+            if status_callback:
+                status_callback("writing to disk...")
+            write_recording(rec, df_raw, dfmean, dffilter, data_folder=data_folder, cache_folder=cache_folder, fingerprint=fingerprint)
+        results.append((rec, dict_meta))
+    return results
+
+
+def import_abf_chunked(
+    abf, recording_name: str, *, data_folder, cache_folder, memory_budget: int = MEMORY_BUDGET, status_callback=None, fingerprint=None
+):
+    """Import an ABF (pyabf.ABF opened with loadData=False) without ever holding a whole channel in memory.
+
+    Each channel is read twice through parse.abf_blocks: once for the running-sum mean (and i_stim),
+    once to append its raw samples (compact layout, see data_parquet) and zeroed rows to the data/filter
+    parquets as row groups. The result
+    matches import_source's in-memory path; only the mean (one sweep long) is held in full.
+    Returns [(rec, dict_meta), ...] like import_source.
+    """
+    max_samples = max(1, memory_budget // parse.ABF_BYTES_PER_SAMPLE)
+    n_points = abf.sweepPointCount
+    time = np.arange(n_points) / abf.sampleRate
+    sweep_starts = (np.asarray(abf.sweepTimesSec, dtype=np.float64) * 1_000_000_000).astype("datetime64[ns]")
+    sweep_datetimes = sweep_starts + (abf.abfDateTime - pd.to_datetime(0))
+    Path(data_folder).mkdir(parents=True, exist_ok=True)
+    Path(cache_folder).mkdir(parents=True, exist_ok=True)
+    results = []
+    for rec, channel in recording_names(recording_name, dict.fromkeys(abf.channelList)).items():
+        print(f"import_abf_chunked: {rec}, {abf.sweepCount} sweeps x {n_points} samples, blocks of <= {max_samples} samples")
+        if status_callback:
+            status_callback("building mean...")
+        voltage_sum = np.zeros(n_points)
+        for _, first_sample, voltage in parse.abf_blocks(abf, channel, max_samples):
+            voltage_sum[first_sample : first_sample + voltage.shape[1]] += voltage.sum(axis=0, dtype=np.float64)
+        dfmean, i_stim = parse.finish_dfmean(pd.DataFrame({"time": time, "voltage": voltage_sum / abf.sweepCount}))
+        # Per-sweep baselines over the same (Python-slice) window as RecordingMatrix.zeroed
+        window = range(n_points)[i_stim - 20 : i_stim - 10]
+        if len(window):
+            baseline = np.concatenate([np.nanmean(v, axis=1) for _, _, v in parse.abf_blocks(abf, channel, max_samples, samples=window)])
+        else:
+            baseline = np.full(abf.sweepCount, np.nan, dtype=np.float32)
+        if status_callback:
+            status_callback("writing to disk...")
+        data_writer = filter_writer = None
+        try:
+            data_schema = data_parquet.compact_schema(
+                time, np.arange(abf.sweepCount), abf.sweepTimesSec, sweep_datetimes, dtype=np.float32, fingerprint=fingerprint
+            )
+            data_writer = pq.ParquetWriter(recording_cache.data_parquet_path(data_folder, rec), data_schema)
+            for first_sweep, first_sample, voltage in parse.abf_blocks(abf, channel, max_samples):
+                data_writer.write_table(pa.table({"voltage_raw": voltage.ravel()}, schema=data_schema))
+                df_filter = parse.abf_block_to_long(abf, first_sweep, first_sample, voltage).drop(columns=["voltage_raw"])
+                df_filter["voltage"] = (voltage - baseline[first_sweep : first_sweep + voltage.shape[0], None]).ravel()
+                table_filter = pa.Table.from_pandas(df_filter[_FILTER_COLUMNS], preserve_index=False)
+                del df_filter
+                if filter_writer is None:
+                    filter_writer = pq.ParquetWriter(recording_cache.filter_parquet_path(cache_folder, rec), table_filter.schema)
+                filter_writer.write_table(table_filter)
+        finally:
+            for writer in (data_writer, filter_writer):
+                if writer is not None:
+                    writer.close()
+        dfmean.to_parquet(recording_cache.mean_parquet_path(cache_folder, rec), index=False)
+        dict_meta = {
+            "nsweeps": abf.sweepCount,
+            "sweep_duration": round(float(time[-1]) + 1 / abf.sampleRate, 6),
+            "sampling_rate": int(round(abf.sampleRate)),
+            "sweep_hz": parse.compute_sweep_hz(pd.DataFrame({"sweep": np.arange(abf.sweepCount), "datetime": sweep_datetimes})),
+        }
+        results.append((rec, dict_meta))
+    return results
+
+
+def reuse_source(entry: dict, recording_name: str, *, data_folder, cache_folder) -> list[tuple[str, dict]]:
+    """Import a source by copying the parquets of an earlier import with the same fingerprint.
+
+    entry is a source_fingerprint index entry; mean/filter are rebuilt from the copied
+    data parquet if their cache files are gone. Returns [(rec, dict_meta), ...] like import_source.
+    """
+    results = []
+    Path(cache_folder).mkdir(parents=True, exist_ok=True)
+    for old_rec, rec, dict_meta in source_fingerprint.renamed_recordings(entry, recording_name):
+        print(f"reuse_source: {old_rec} -> {rec}")
+        copies = [
+            (recording_cache.data_parquet_path(data_folder, old_rec), recording_cache.data_parquet_path(data_folder, rec)),
+            (recording_cache.mean_parquet_path(cache_folder, old_rec), recording_cache.mean_parquet_path(cache_folder, rec)),
+            (recording_cache.filter_parquet_path(cache_folder, old_rec), recording_cache.filter_parquet_path(cache_folder, rec)),
+        ]
+        if old_rec != rec:
+            for src, dst in copies:
+                if Path(src).is_file():
+                    shutil.copyfile(src, dst)
+        if not all(Path(dst).exists() for _, dst in copies[1:]):
+            dfmean, dffilter, _ = build_recording(data_parquet.read_df(copies[0][1]))
+            dfmean.to_parquet(copies[1][1], index=False)
+            dffilter.to_parquet(copies[2][1], index=False)
+        results.append((rec, dict_meta))
+    return results
+
+
+def _import_job(i, source_path, recording_name, kwargs):
+    # Worker entry point; exceptions are returned rather than raised so one bad source does not abort the batch.
+    try:
+        return i, import_source(source_path, recording_name, **kwargs), None
+    except Exception as e:
+        return i, [], f"{type(e).__name__}: {e}"
+
+
+def import_sources(jobs: list[tuple], *, n_jobs=None, memory_budget: int = MEMORY_BUDGET, **kwargs):
+    """Import many (source_path, recording_name) jobs in parallel.
+
+    Yields (job_index, [(rec, dict_meta), ...], error) as each job finishes,
+    in completion order. error is None on success, else a message string.
+    memory_budget bounds all workers together: each import_source gets an equal share.
+    kwargs are forwarded to import_source (folders, gain, split options, persist).
+    """
+    if n_jobs is None:
+        n_jobs = parse.N_JOBS
+    n_workers = 1 if len(jobs) < 2 else min(effective_n_jobs(n_jobs), len(jobs))
+    kwargs["memory_budget"] = max(1, memory_budget // n_workers)
+    if n_workers == 1:
+        for i, (source_path, recording_name) in enumerate(jobs):
+            yield _import_job(i, source_path, recording_name, kwargs)
+        return
+    yield from Parallel(n_jobs=n_jobs, return_as="generator_unordered", batch_size=1)(
+        delayed(_import_job)(i, source_path, recording_name, kwargs) for i, (source_path, recording_name) in enumerate(jobs)
+    )
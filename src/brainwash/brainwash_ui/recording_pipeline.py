@@ -3,7 +3,9 @@
 from __future__ import annotations
 
 import analysis_v3 as analysis
+import numpy as np
 import pandas as pd
+import recording_matrix
 
 _DFT_LEGACY_NORM_COLUMNS = {
     "norm_EPSP_from": "norm_output_from",
@@ -35,6 +37,17 @@ def migrate_dft_column_names(dft: pd.DataFrame) -> bool:
     return True
 
 
+def timepoints_status(dft: pd.DataFrame) -> str:
+    """
+    df_project "status" from a recording's dft: "manual" if any timepoint was set by hand,
+    else "default" if any fell back to the defaults, else "auto".
+    """
+    for marker in ("manual", "default"):  # in order of priority
+        if marker in dft.values:
+            return marker
+    return "auto"
+
+
 def build_dft(
     dfmean: pd.DataFrame,
     *,
@@ -56,6 +69,40 @@ def build_dft(
     return normalize_dft_dtypes(dft)
 
 
+_UNIFORM_TIMEPOINTS = ["t_volley_amp", "t_volley_slope_start", "t_volley_slope_end", "t_EPSP_amp", "t_EPSP_slope_start", "t_EPSP_slope_end"]
+_UNIFORM_LINKED = ["t_volley_amp", "t_volley_slope", "t_EPSP_amp", "t_EPSP_slope"]
+
+
+def apply_uniform_timepoints(dft: pd.DataFrame, dfoutput: pd.DataFrame, *, precision: int, column: str = "EPSP_slope") -> pd.DataFrame | None:
+    """
+    Give every stim of dft the timepoints (relative to its t_stim) of the stim with the highest dfoutput[column],
+    marking methods and params as "=stim_<n>"; stims are renumbered from 1. dft is changed in place and returned,
+    or None (unchanged) if dfoutput has no column.
+    """
+    if column not in dfoutput.columns:
+        return None
+    print(f"dfoutput:\n{dfoutput}")
+    idx_max_EPSP = dfoutput[column].idxmax()
+    print(f"idx_max_EPSP: {idx_max_EPSP}")
+    stim_max = dfoutput.loc[idx_max_EPSP, "stim"]
+    print(f"stim_max: {stim_max}")
+    t_template_row = dft[dft["stim"] == stim_max].copy()
+    print(f"t_template_row: {t_template_row}")
+    t_stim = round(t_template_row["t_stim"].values[0], precision)
+    for var in _UNIFORM_TIMEPOINTS:
+        t_template_row[var] = round(t_template_row[var].values[0] - t_stim, precision)
+    if "stim" not in dft.columns:
+        dft["stim"] = None
+    for i, row_t in dft.iterrows():
+        dft.at[i, "stim"] = i + 1  # stims numbered from 1
+        for var in _UNIFORM_TIMEPOINTS:
+            dft.at[i, var] = round(t_template_row[var].values[0] + row_t["t_stim"], precision)
+        for suffix in ("_method", "_params"):
+            for name in _UNIFORM_LINKED:
+                dft.at[i, f"{name}{suffix}"] = f"=stim_{stim_max}"
+    return dft
+
+
 def backfill_volley_means_into_dft(dft: pd.DataFrame, dfoutput: pd.DataFrame) -> None:
     for i, t_row in dft.iterrows():
         stim_nr = t_row["stim"]
@@ -84,10 +131,153 @@ def build_dfoutput_from_inputs(
     return dfoutput
 
 
+def append_dfoutput_from_inputs(
+    dfoutput: pd.DataFrame | None,
+    dffilter_new: pd.DataFrame,
+    dfmean: pd.DataFrame,
+    dft: pd.DataFrame | None,
+    *,
+    filter_val,
+) -> pd.DataFrame:
+    """build_dfoutput_from_inputs for sweeps appended to a recording: measures dffilter_new only."""
+    filter_col = resolve_output_filter_col(filter_val)
+    dfoutput = analysis.append_dfoutput(
+        dfoutput,
+        dffilter_new,
+        dfmean,
+        dft,
+        filter=filter_col,
+    )
+    if dft is not None and not dft.empty:
+        backfill_volley_means_into_dft(dft, dfoutput)
+    dfoutput.reset_index(drop=True, inplace=True)
+    return dfoutput
+
+
+def update_dfoutput_from_inputs(
+    dfoutput: pd.DataFrame,
+    dffilter: pd.DataFrame,
+    dfmean: pd.DataFrame,
+    dft: pd.DataFrame,
+    fields,
+    *,
+    filter_val,
+) -> pd.DataFrame:
+    """Patch dfoutput after the dft fields in fields changed for the stims in dft (analysis.update_dfoutput)."""
+    filter_col = resolve_output_filter_col(filter_val)
+    dfoutput = analysis.update_dfoutput(
+        dfoutput,
+        dffilter,
+        dfmean,
+        dft,
+        fields,
+        filter=filter_col,
+    )
+    backfill_volley_means_into_dft(dft, dfoutput)
+    return dfoutput
+
+
+def build_dfsweept(
+    dffilter: pd.DataFrame,
+    dfmean: pd.DataFrame,
+    dft: pd.DataFrame,
+    *,
+    default_dict_t: dict,
+    filter_val,
+    n_jobs: int = 1,
+) -> pd.DataFrame:
+    """
+    Per-sweep timepoints (analysis.find_sweep_timepoints) of dffilter, or of a dfbin for per-bin
+    detection, around the stims of dft. Snippets are cut around the stims find_events found in
+    dfmean (find_i_stims), unless stims were added or removed since; then around the dft t_stims.
+    Sweeps on a shared time grid go through as one matrix; ragged recordings one sweep at a time.
+    """
+    filter_col = resolve_output_filter_col(filter_val)
+    if dffilter.empty:
+        return analysis.find_sweep_timepoints(np.empty((0, 0)), [], dft, default_dict_t)
+    i_mean = analysis.find_i_stims(dfmean=dfmean)
+    t_cuts = dfmean["time"].to_numpy(dtype=np.float64)[i_mean] if len(i_mean) == len(dft) else None
+
+    def i_stims_on(time_grid):
+        return None if t_cuts is None else [int(np.abs(time_grid - t).argmin()) for t in t_cuts]
+
+    sweep = dffilter["sweep"].to_numpy()
+    time = dffilter["time"].to_numpy(dtype=np.float64)
+    try:
+        order, n_sweeps, n_samples = recording_matrix.grid_layout(sweep, time)
+    except ValueError:
+        parts = []
+        for s, df in dffilter.sort_values(["sweep", "time"]).groupby("sweep"):
+            time_grid = df["time"].to_numpy(dtype=np.float64)
+            values = df[filter_col].to_numpy()[None, :]
+            parts.append(
+                analysis.find_sweep_timepoints(values, time_grid, dft, default_dict_t, sweeps=[s], i_stims=i_stims_on(time_grid), filter=filter_col)
+            )
+        return pd.concat(parts, ignore_index=True)
+    if order is None:
+        order = slice(None)
+    values = dffilter[filter_col].to_numpy(dtype=np.float64)[order].reshape(n_sweeps, n_samples)
+    time_grid = time[order][:n_samples]
+    return analysis.find_sweep_timepoints(
+        values, time_grid, dft, default_dict_t, sweeps=sweep[order][::n_samples], i_stims=i_stims_on(time_grid), filter=filter_col, n_jobs=n_jobs
+    )
+
+
+def build_dfbin(dffilter: pd.DataFrame, bin_size: int, reducer: str = "mean") -> pd.DataFrame:
+    """
+    Bin consecutive sweeps of dffilter (sweep // bin_size) into one waveform per bin: every column but
+    sweep and time is reduced per time point (recording_matrix.bin_rows; datetime via int64 ns), and
+    sweep holds the bin number. Sweeps on a shared time grid are reduced as one (bins, bin_size, samples)
+    reshape; ragged recordings are grouped per (bin, time) instead.
+    """
+    value_cols = [col for col in dffilter.columns if col not in ("sweep", "time")]
+    columns = value_cols + ["time", "sweep"]
+    sweep = dffilter["sweep"].to_numpy()
+    time = dffilter["time"].to_numpy(dtype=np.float64)
+    try:
+        order, n_sweeps, n_samples = recording_matrix.grid_layout(sweep, time)
+    except ValueError:
+        return _build_dfbin_grouped(dffilter, bin_size, reducer)[columns]
+    if order is None:
+        order = slice(None)
+    bin_ids = sweep[order][::n_samples] // bin_size
+    stacked, datetime_refs = [], {}
+    for col in value_cols:
+        values = dffilter[col].to_numpy()[order]
+        if np.issubdtype(values.dtype, np.datetime64):
+            ns = values.astype("datetime64[ns]").astype(np.int64)
+            valid = ~np.isnat(values)
+            datetime_refs[col] = int(ns[valid].min()) if valid.any() else 0  # offsets stay exact in float64
+            values = np.where(valid, ns - datetime_refs[col], np.nan)
+        stacked.append(values.astype(np.float64).reshape(n_sweeps, n_samples))
+    bins, reduced = recording_matrix.bin_rows(np.stack(stacked, axis=-1), bin_ids, reducer=reducer)
+    dfbin = pd.DataFrame({col: reduced[:, :, j].ravel() for j, col in enumerate(value_cols)})
+    for col in value_cols:
+        if col in datetime_refs:
+            dfbin[col] = pd.to_datetime(pd.array(np.round(dfbin[col]), dtype="Int64") + datetime_refs[col], unit="ns")
+        elif np.issubdtype(dffilter[col].dtype, np.floating):
+            dfbin[col] = dfbin[col].astype(dffilter[col].dtype)
+    dfbin["time"] = np.tile(time[order][:n_samples], len(bins))
+    dfbin["sweep"] = np.repeat(bins, n_samples)
+    return dfbin[columns]
+
+
+def _build_dfbin_grouped(dffilter: pd.DataFrame, bin_size: int, reducer: str) -> pd.DataFrame:
+    if reducer == "trimmed_mean":
+        from scipy.stats import trim_mean
+
+        func = lambda x: trim_mean(x.dropna(), 0.1)  # noqa: E731
+    else:
+        func = reducer
+    value_cols = [col for col in dffilter.columns if col not in ("sweep", "time")]
+    keys = [(dffilter["sweep"] // bin_size).rename("sweep"), dffilter["time"]]
+    return dffilter[value_cols].groupby(keys).agg(func).reset_index()
+
+
 def clean_dfoutput_from_parquet(dfoutput: pd.DataFrame) -> tuple[pd.DataFrame, bool]:
     needs_repersist = False
     if "index" in dfoutput.columns:
         dfoutput.drop(columns=["index"], inplace=True)
         needs_repersist = True
     dfoutput.reset_index(drop=True, inplace=True)
-    return dfoutput, needs_repersist
\ No newline at end of file
+    return dfoutput, needs_repersist
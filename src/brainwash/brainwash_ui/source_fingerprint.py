@@ -0,0 +1,116 @@
+"""Source fingerprints: skip re-parsing unchanged sources (no Qt).
+
+A fingerprint covers every readable file of a source (name, size, mtime and
+a hash of its first/last bytes) plus the import options that change the
+parsed result (gain, split_odd_even, split_at_time). The project keeps an
+index {fingerprint: {"recording_name", "recordings": [[rec, dict_meta], ...]}}
+in <project>/fingerprints.json; a source whose fingerprint is indexed, and whose
+data parquets still exist and carry that same fingerprint in their metadata
+(see data_parquet.FINGERPRINT_KEY), is imported by copying those parquets
+instead. Entries naming a recording are dropped when it is renamed or purged.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from brainwash_ui import data_parquet, recording_cache
+
+INDEX_FILENAME = "fingerprints.json"
+SOURCE_SUFFIXES = (".abf", ".ibw", ".atf", ".csv")
+PARTIAL_HASH_BYTES = 16 * 1024  # hashed from both ends of every file
+
+
+def source_files(source) -> list[Path]:
+    """The file itself, or the supported files directly inside a source folder (sorted)."""
+    path = Path(source)
+    if path.is_dir():
+        return sorted(f for f in path.iterdir() if f.is_file() and f.suffix.lower() in SOURCE_SUFFIXES)
+    return [path]
+
+
+def _partial_hash(path: Path, size: int) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        h.update(fh.read(PARTIAL_HASH_BYTES))
+        if size > 2 * PARTIAL_HASH_BYTES:
+            fh.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+            h.update(fh.read(PARTIAL_HASH_BYTES))
+    return h.hexdigest()
+
+
+def source_fingerprint(source, *, gain=1.0, split_odd_even=False, split_at_time=None) -> str:
+    """Hex digest identifying a source's files and the import options applied to them."""
+    entries = []
+    for f in source_files(source):
+        st = f.stat()
+        entries.append([f.name, st.st_size, st.st_mtime_ns, _partial_hash(f, st.st_size)])
+    options = {"gain": float(gain), "split_odd_even": bool(split_odd_even), "split_at_time": split_at_time or None}
+    payload = json.dumps({"files": entries, "options": options}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def index_path(project_folder) -> Path:
+    return Path(project_folder) / INDEX_FILENAME
+
+
+def load_index(project_folder) -> dict:
+    path = index_path(project_folder)
+    if not path.is_file():
+        return {}
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        print(f"source_fingerprint.load_index: ignoring unreadable {path}: {e}")
+        return {}
+
+
+def save_index(project_folder, index: dict) -> None:
+    path = index_path(project_folder)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(index, indent=1, default=float))
+    os.replace(tmp, path)
+
+
+def record(index: dict, fingerprint: str, recording_name: str, results: list) -> None:
+    """Remember the recordings [(rec, dict_meta), ...] that a source was imported as."""
+    if results:
+        index[fingerprint] = {"recording_name": recording_name, "recordings": [[rec, meta] for rec, meta in results]}
+
+
+def forget(index: dict, recs) -> bool:
+    """Drop every entry naming any of recs (renamed or purged recordings). Returns True if index changed."""
+    recs = set(recs)
+    stale = [fp for fp, entry in index.items() if any(rec in recs for rec, _ in entry["recordings"])]
+    for fp in stale:
+        del index[fp]
+    return bool(stale)
+
+
+def forget_recordings(project_folder, recs) -> None:
+    """forget() on the project's saved index; the file is only rewritten if an entry was dropped."""
+    index = load_index(project_folder)
+    if forget(index, recs):
+        save_index(project_folder, index)
+
+
+def lookup(index: dict, fingerprint: str, data_folder) -> dict | None:
+    """Index entry for fingerprint, or None if absent or any of its data parquets is gone or stamped with another fingerprint."""
+    entry = index.get(fingerprint)
+    if not entry:
+        return None
+    for rec, _ in entry["recordings"]:
+        path = recording_cache.data_parquet_path(data_folder, rec)
+        if not Path(path).is_file() or data_parquet.read_fingerprint(path) != fingerprint:
+            return None
+    return entry
+
+
+def renamed_recordings(entry: dict, recording_name: str) -> list[tuple[str, str, dict]]:
+    """[(old_rec, new_rec, dict_meta), ...]: channel/split suffixes carried over to the new recording_name."""
+    old_base = entry["recording_name"]
+    return [(rec, recording_name + rec[len(old_base) :], meta) for rec, meta in entry["recordings"]]
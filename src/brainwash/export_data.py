@@ -18,6 +18,8 @@ import export_image
 import pandas as pd
 from PyQt5 import QtCore, QtWidgets
 
+from brainwash_ui import export_tables
+
 # ---------------------------------------------------------------------------
 # Uses self.uistate / self.config / self.uiplot on UIsub (see ui.py).
 
@@ -116,22 +118,7 @@ class ExportMixin:
             df_out = self.V2mV(self.get_dfoutput(p_row))
             if df_out is not None and not df_out.empty:
                 out_path = export_dir / f"{rec_name}_output.csv"
-                cols_to_export = [
-                    c
-                    for c in [
-                        "stim",
-                        "sweep",
-                        "EPSP_slope",
-                        "EPSP_slope_norm",
-                        "EPSP_amp",
-                        "EPSP_amp_norm",
-                        "volley_amp",
-                        "volley_slope",
-                    ]
-                    if c in df_out.columns
-                ]
-                df_export = df_out[cols_to_export].copy() if cols_to_export else df_out.copy()
-                df_export.to_csv(out_path, index=False)
+                export_tables.output_table(df_out).to_csv(out_path, index=False)
                 count += 1
 
         self._export_status(f"Exported output for {count} recording(s) to {export_dir}")
@@ -157,22 +144,16 @@ class ExportMixin:
 
         out_path = export_dir / f"{self.projectname}_group_means.csv"
 
-        dfs = []
+        group_means = []
         for gid, ginfo in dd_groups.items():
             group_name = ginfo.get("group_name", str(gid))
             uist = self.uistate
             level = getattr(uist, "buttonGroup_test_n", "recording") if uist else "recording"
-            df_mean = self.get_dfgroupmean(gid, level=level)
-            if df_mean is not None and not df_mean.empty:
-                df_mean = self.V2mV(df_mean.copy())
-                # Extra scaling for _mean/_SEM columns (V2mV only handles base amp cols; backend is SI units)
-                for col in list(df_mean.columns):
-                    if ("EPSP_amp" in col or "volley_amp" in col) and "norm" not in col and any(s in col for s in ["_mean", "_SEM", "SEM"]):
-                        df_mean[col] *= 1000.0
-                df_mean.insert(0, "group_name", group_name)
-                dfs.append(df_mean)
-
-        if not dfs:
+            # V2mV already scales the amp _mean/_SEM columns to mV (backend is SI units)
+            group_means.append((group_name, self.V2mV(self.get_dfgroupmean(gid, level=level))))
+        df_all = export_tables.group_means_table(group_means)
+
+        if df_all is None:
             QtWidgets.QMessageBox.warning(
                 None,
                 "Export Error",
@@ -180,10 +161,9 @@ class ExportMixin:
             )
             return
 
-        df_all = pd.concat(dfs, ignore_index=True)
         df_all.to_csv(out_path, index=False)
 
-        self._export_status(f"Exported group means for {len(dfs)} group(s) to {out_path}")
+        self._export_status(f"Exported group means for {df_all['group_name'].nunique()} group(s) to {out_path}")
 
     # ------------------------------------------------------------------
     # Image export triggers
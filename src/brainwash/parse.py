@@ -1,5 +1,9 @@
+import contextlib
+import functools
 import math
+import mmap
 import os
+import struct
 import sys
 import time
 from pathlib import Path
@@ -8,16 +12,30 @@ import igor2 as igor
 import numpy as np
 import pandas as pd
 import pyabf
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from joblib import Parallel, delayed
 from tqdm import tqdm
 
+import recording_matrix
+from recording_matrix import RecordingMatrix
+
 # joblib spawns worker processes via multiprocessing, which breaks in frozen
 # cx_Freeze builds because the frozen executable can't re-import itself as a
 # worker. Force single-process execution when running frozen.
-_N_JOBS = 1 if getattr(sys, "frozen", False) else -1
+# Public: the default n_jobs of every joblib pool in the app reads this.
+N_JOBS = 1 if getattr(sys, "frozen", False) else -1
 
 verbose = True
 
+
+def _parallel_map(func, items):
+    """[func(item) for item in items], fanned out over joblib workers when there is more than one item. Order is preserved."""
+    if len(items) < 2 or N_JOBS == 1:
+        return [func(item) for item in items]
+    return Parallel(n_jobs=N_JOBS)(delayed(func)(item) for item in items)
+
+
 # ---------------------------------------------------------------------------
 # BW CSV schema
 # ---------------------------------------------------------------------------
@@ -37,15 +55,39 @@ def detect_bw_csv_type(df) -> str | None:
 
 
 def build_dfmean(dfdata, rollingwidth=3):
+    """
+    Mean waveform of a recording, with rolling derivatives prim/bis, baseline-zeroed before the first stim.
+    dfdata is a long-format DataFrame (sweep, time, voltage_raw) or a RecordingMatrix.
+    Returns (dfmean[time, voltage, prim, bis], i_stim).
+    """
     print("build_dfmean")
-    if dfdata is None or len(dfdata) == 0:
-        print("build_dfmean: no dfdata provided")
-        return pd.DataFrame(columns=["sweep", "voltage", "prim", "bis"]), 0
-    dfmean = pd.pivot_table(dfdata, values="voltage_raw", index="sweep", columns="time", aggfunc="mean").mean().to_frame(name="voltage")
+    if isinstance(dfdata, RecordingMatrix):
+        dfmean = pd.DataFrame({"time": dfdata.time, "voltage": dfdata.mean_waveform()})
+    else:
+        if dfdata is None or len(dfdata) == 0:
+            print("build_dfmean: no dfdata provided")
+            return pd.DataFrame(columns=["sweep", "voltage", "prim", "bis"]), 0
+        grid = _sweep_grid(dfdata, "voltage_raw")
+        if grid is not None:
+            voltage_2d, time_grid, _ = grid
+            mean = np.nanmean(voltage_2d, axis=0) if np.isnan(voltage_2d).any() else voltage_2d.mean(axis=0)
+            dfmean = pd.DataFrame({"time": time_grid, "voltage": mean})
+        else:  # ragged or duplicated sweeps
+            dfmean = pd.pivot_table(dfdata, values="voltage_raw", index="sweep", columns="time", aggfunc="mean").mean().to_frame(name="voltage")
+            dfmean.reset_index(inplace=True)
+    return finish_dfmean(dfmean, rollingwidth=rollingwidth)
+
+
+def finish_dfmean(dfmean, rollingwidth=3, i_stim=None):
+    """
+    Add prim/bis to a raw mean waveform dfmean[time, voltage] and zero it to the baseline before i_stim
+    (detected from prim if not given). Shared by build_dfmean and incremental (running-mean) imports.
+    Returns (dfmean, i_stim).
+    """
     dfmean["prim"] = dfmean.voltage.rolling(rollingwidth, center=True).mean().diff()
     dfmean["bis"] = dfmean.prim.rolling(rollingwidth, center=True).mean().diff()
-    dfmean.reset_index(inplace=True)
-    i_stim = first_stim_index(dfmean)
+    if i_stim is None:
+        i_stim = first_stim_index(dfmean)
     baseline_mean = dfmean.iloc[i_stim - 20 : i_stim - 10]["voltage"].mean()  # Adjusted for potential NaNs
     dfmean["voltage"] = dfmean["voltage"] - baseline_mean
     return dfmean, i_stim
@@ -53,13 +95,34 @@ def build_dfmean(dfdata, rollingwidth=3):
 
 def zeroSweeps(dfdata, i_stim=None, dfmean=None):
     # returns dfdata with sweeps zeroed to the mean of the 20th to 10th column before i_stim
+    # A RecordingMatrix in gives a RecordingMatrix out (zeroed samples in .voltage).
     if i_stim is None:
         if dfmean is None:
             print("zeroSweeps: calling dfmean to get i_stim.")
             _, i_stim = build_dfmean(dfdata)
         else:
             i_stim = first_stim_index(dfmean)
+    if isinstance(dfdata, RecordingMatrix):
+        print(f"i_stim: {i_stim}, matrix: {dfdata.n_sweeps} sweeps x {dfdata.n_samples} samples")
+        return dfdata.zeroed(i_stim)
     print(f"i_stim: {i_stim}, df_data: {dfdata}")
+    grid = _sweep_grid(dfdata, "voltage_raw")
+    if grid is not None:
+        # Regular grid: subtract per-sweep baselines on the reshaped array and write the
+        # result straight back in row order - no pivot/stack/merge round-trip.
+        voltage_2d, time_grid, order = grid
+        zeroed = RecordingMatrix.from_arrays(voltage_2d, time_grid).zeroed(i_stim).voltage.ravel()
+        df_zeroed = dfdata.drop(columns=["voltage_raw"]).reset_index(drop=True)
+        if order is None:
+            df_zeroed["voltage"] = zeroed
+        else:
+            voltage = np.empty_like(zeroed)
+            voltage[order] = zeroed
+            df_zeroed["voltage"] = voltage
+        print(f"zeroSweeps: {df_zeroed}")
+        return df_zeroed
+
+    # Ragged or duplicated sweeps: pivot on (sweep, time)
     df_zeroed = dfdata.copy()  # Copy dfdata to avoid modifying the original DataFrame
     # Check for duplicates based on 'sweep' and 'time'
     duplicates = df_zeroed.duplicated(subset=["sweep", "time"], keep=False)
@@ -88,6 +151,75 @@ def zeroSweeps(dfdata, i_stim=None, dfmean=None):
     return df_zeroed
 
 
+def _sweep_grid(dfdata, value_col, fallback="pivot"):
+    """
+    Reshape dfdata[value_col] to (n_sweeps, n_samples) on the shared time grid.
+    Returns (values_2d, time_grid, order), where order is the row permutation that
+    made dfdata sweep-major (None if it already was), or None if the sweeps are
+    ragged, duplicated or on different time grids.
+    """
+    time = dfdata["time"].to_numpy(dtype=np.float64)
+    try:
+        order, n_sweeps, n_samples = recording_matrix.grid_layout(dfdata["sweep"].to_numpy(), time)
+    except ValueError as e:
+        print(f" - - {e}; falling back to {fallback}.")
+        return None
+    values = dfdata[value_col].to_numpy()  # keep the parser's dtype (ABF voltage_raw is float32)
+    if order is not None:
+        values, time = values[order], time[order]
+    return values.reshape(n_sweeps, n_samples), time[:n_samples], order
+
+
+def _sweep_matrix(dfdata):
+    """
+    dfdata on its sweep grid, for splitting: returns (matrix, datetime), where matrix is a
+    RecordingMatrix with its own copy of voltage_raw and datetime is the (n_sweeps, n_samples)
+    datetime column (None if dfdata has none); neither refers to dfdata, so it can be released.
+    Returns None if the sweeps are ragged, duplicated or on different time grids, or dfdata
+    has columns RecordingMatrix.to_long does not rebuild.
+    """
+    if not set(dfdata.columns) <= {"sweep", "time", "voltage_raw", "t0", "datetime"}:
+        return None
+    grid = _sweep_grid(dfdata, "voltage_raw", fallback="per-sweep selection")
+    if grid is None:
+        return None
+    voltage, time_grid, order = grid
+    n_sweeps, n_samples = voltage.shape
+    firsts = np.arange(n_sweeps) * n_samples
+    if order is None:
+        voltage = voltage.copy()  # a view of dfdata's block otherwise
+    else:
+        firsts = order[firsts]
+    t0 = dfdata["t0"].to_numpy(dtype=np.float64)[firsts] if "t0" in dfdata.columns else None
+    datetime = None
+    if "datetime" in dfdata.columns:
+        datetime = dfdata["datetime"].to_numpy(dtype="datetime64[ns]")
+        datetime = (datetime.copy() if order is None else datetime[order]).reshape(n_sweeps, n_samples)
+    matrix = RecordingMatrix.from_arrays(
+        voltage, time_grid.copy(), t0=t0, datetime=None if datetime is None else datetime[:, 0], sweeps=dfdata["sweep"].to_numpy()[firsts]
+    )
+    return matrix, datetime
+
+
+def _split_to_long(split, matrix, datetime, columns):
+    """
+    Apply a recording_matrix split function to matrix and expand the parts (views) to long
+    format with the source's columns, one part at a time. datetime is split the same way and
+    sliced into the parts rather than rebuilt from sweep starts (RecordingMatrix.to_long),
+    so they keep the source's exact values.
+    """
+    parts = split(matrix)
+    # A matrix whose "voltage" is the datetime grid is cut exactly like the voltage.
+    datetime_parts = split(matrix.with_voltage(datetime)) if datetime is not None else {}
+    result = {}
+    for label in list(parts):
+        part_df = parts.pop(label).to_long()
+        if label in datetime_parts:
+            part_df["datetime"] = datetime_parts.pop(label).voltage.ravel()
+        result[label] = part_df[columns]
+    return result
+
+
 def first_stim_index(dfmean, threshold_factor=0.75, min_time_difference=0.005):
     # returns the index of the first peak in the prim column of dfmean
     y_max_stim = dfmean.prim.max()
@@ -166,20 +298,35 @@ def _ibw_results_to_df(results, gain=1.0):
     return df
 
 
-def parse_ibwFolder(folder, dev=False, gain=1.0, progress_callback=None):  # igor2, para
+def _ibw_results_to_matrix(results, gain=1.0):
+    """
+    Matrix counterpart of _ibw_results_to_df: one row per .ibw file, same time
+    grid, gain and timestamp conversion, without expanding to one row per sample.
+    """
+    voltage_raw = np.vstack([r["array"] for r in results]) * gain
+    seconds = (pd.to_datetime("1970-01-01") - pd.to_datetime("1900-01-01")).total_seconds()
+    unix_timestamps = np.array([r["timestamp"] for r in results]) - seconds
+    timestep = results[0]["meta_sfA"][0]
+    time_grid = np.round(np.arange(voltage_raw.shape[1]) * timestep, math.ceil(-np.log10(timestep)))
+    datetime = pd.to_datetime(unix_timestamps, unit="s").round("us")
+    return RecordingMatrix.from_arrays(voltage_raw, time_grid, t0=np.zeros(len(results)), datetime=datetime)
+
+
+def _read_ibwFolder(folder, dev=False, progress_callback=None):
+    """Read every .ibw in folder (in parallel), sorted by creation timestamp; raises on inconsistent sweep shapes."""
     files = list(folder.glob("*.ibw"))
     if dev:
         files = files[:100]
 
     total = len(files)
     if progress_callback is not None:
-        gen = Parallel(n_jobs=_N_JOBS, return_as="generator", batch_size=1)(delayed(ibw_read)(file) for file in files)
+        gen = Parallel(n_jobs=N_JOBS, return_as="generator", batch_size=1)(delayed(ibw_read)(file) for file in files)
         results = []
         for idx, result in enumerate(gen):
             results.append(result)
             progress_callback(idx, total)
     else:
-        results = Parallel(n_jobs=_N_JOBS)(delayed(ibw_read)(file) for file in tqdm(files))
+        results = Parallel(n_jobs=N_JOBS)(delayed(ibw_read)(file) for file in tqdm(files))
     t0 = time.perf_counter()
     print(f" - - sorting {len(files)} .ibw files in folder {folder} by timestamp...")
     results.sort(key=lambda r: r["timestamp"])
@@ -190,8 +337,11 @@ def parse_ibwFolder(folder, dev=False, gain=1.0, progress_callback=None):  # igo
     unique_shapes = set(sweep_shapes)
     if len(unique_shapes) != 1:
         raise ValueError(f"Inconsistent sweep shapes detected: {unique_shapes}")
+    return results
 
-    return _ibw_results_to_df(results, gain=gain)
+
+def parse_ibwFolder(folder, dev=False, gain=1.0, progress_callback=None):  # igor2, para
+    return _ibw_results_to_df(_read_ibwFolder(folder, dev=dev, progress_callback=progress_callback), gain=gain)
 
 
 def parse_ibw(filepath, dev=False, gain=1.0):
@@ -206,6 +356,62 @@ def parse_ibw(filepath, dev=False, gain=1.0):
     return _ibw_results_to_df(results, gain=gain)
 
 
+# Explicit Arrow types for the Brainwash sweep CSV columns; any other column is type-inferred.
+_BW_CSV_ARROW_TYPES = {
+    "sweep": pa.int64(),
+    "time": pa.float64(),
+    "voltage_raw": pa.float64(),
+    "t0": pa.float64(),
+    "datetime": pa.timestamp("ns"),
+}
+
+
+def _csv_layout_error(caller, source_path, columns):
+    return ValueError(
+        f"{caller}: unrecognised CSV layout in '{source_path}'.\n"
+        f"Required columns: {sorted(_BW_CSV_SWEEP_COLS)}.\n"
+        f"Found columns: {sorted(columns)}."
+    )
+
+
+def _pad_csv_table(table):
+    # t0 / datetime are optional in the CSV; pad with NaN / NaT so downstream code does not crash.
+    if "t0" not in table.column_names:
+        table = table.append_column("t0", pa.array(np.full(table.num_rows, np.nan)))
+    if "datetime" not in table.column_names:
+        table = table.append_column("datetime", pa.nulls(table.num_rows, pa.timestamp("ns")))
+    return table
+
+
+def read_csv_table(source_path, caller="read_csv_table"):
+    """
+    Read a Brainwash raw sweep CSV into a pyarrow Table with the multithreaded Arrow CSV reader.
+
+    sweep/time/voltage_raw/t0/datetime get explicit types (datetime as timestamp[ns], empty/NaT → null);
+    t0 and datetime are padded if absent. Files Arrow cannot convert with that schema (e.g. free-form
+    datetimes) fall back to pandas.read_csv with pd.to_datetime(errors="coerce").
+    Raises ValueError for unrecognised column layouts.
+    """
+    convert_options = pa_csv.ConvertOptions(
+        column_types=_BW_CSV_ARROW_TYPES,
+        null_values=list(pa_csv.ConvertOptions().null_values) + ["NaT"],
+        strings_can_be_null=True,
+    )
+    try:
+        table = pa_csv.read_csv(source_path, read_options=pa_csv.ReadOptions(use_threads=True), convert_options=convert_options)
+    except pa.ArrowInvalid as e:
+        print(f" - - {caller}: Arrow could not convert '{source_path}' ({e}); reading with pandas.")
+        df = pd.read_csv(source_path)
+        if detect_bw_csv_type(df) != "sweep":
+            raise _csv_layout_error(caller, source_path, df.columns.tolist())
+        if "datetime" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["datetime"]):  # object or str dtype, depending on pandas version
+            df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    if not _BW_CSV_SWEEP_COLS.issubset(table.column_names):
+        raise _csv_layout_error(caller, source_path, table.column_names)
+    return _pad_csv_table(table)
+
+
 def parse_csv(source_path):
     """
     Read a Brainwash raw sweep CSV and return a {0: df} dict compatible with
@@ -217,22 +423,7 @@ def parse_csv(source_path):
 
     Raises ValueError for unrecognised column layouts.
     """
-    df = pd.read_csv(source_path)
-    csv_type = detect_bw_csv_type(df)
-    if csv_type == "sweep":
-        if "t0" not in df.columns:
-            df["t0"] = float("nan")
-        if "datetime" not in df.columns:
-            df["datetime"] = pd.NaT
-        elif df["datetime"].dtype == object:
-            df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
-        return {0: df}
-    else:
-        raise ValueError(
-            f"parse_csv: unrecognised CSV layout in '{source_path}'.\n"
-            f"Required columns: {sorted(_BW_CSV_SWEEP_COLS)}.\n"
-            f"Found columns: {sorted(df.columns.tolist())}."
-        )
+    return {0: read_csv_table(source_path, caller="parse_csv").to_pandas()}
 
 
 def parse_csvFolder(folder_path):
@@ -241,7 +432,8 @@ def parse_csvFolder(folder_path):
 
     Each file is treated as one recording.  All files must pass
     detect_bw_csv_type as "sweep"; a clear ValueError is raised for any
-    file that does not.
+    file that does not. Files are read concurrently (threads; the Arrow
+    reader releases the GIL).
 
     Returns a dict {stem: df} where stem is the filename without extension.
     """
@@ -250,62 +442,227 @@ def parse_csvFolder(folder_path):
     if not csv_files:
         raise ValueError(f"parse_csvFolder: no .csv files found in '{folder_path}'.")
 
-    result = {}
-    for f in csv_files:
-        df = pd.read_csv(f)
-        csv_type = detect_bw_csv_type(df)
-        if csv_type != "sweep":
-            raise ValueError(
-                f"parse_csvFolder: '{f.name}' is not a recognised Brainwash sweep CSV.\n"
-                f"Required columns: {sorted(_BW_CSV_SWEEP_COLS)}.\n"
-                f"Found columns: {sorted(df.columns.tolist())}."
-            )
-        if "t0" not in df.columns:
-            df["t0"] = float("nan")
-        if "datetime" not in df.columns:
-            df["datetime"] = pd.NaT
-        elif df["datetime"].dtype == object:
-            df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
-        result[f.stem] = df
+    def _read(f):
+        return read_csv_table(f, caller="parse_csvFolder").to_pandas()
+
+    if len(csv_files) < 2:
+        dfs = [_read(f) for f in csv_files]
+    else:
+        dfs = Parallel(n_jobs=min(len(csv_files), 8), prefer="threads")(delayed(_read)(f) for f in csv_files)
+    result = {f.stem: df for f, df in zip(csv_files, dfs)}
 
     print(f" - - parse_csvFolder: loaded {len(result)} CSV file(s) from '{folder_path}'.")
     return result
 
 
+# ---------------------------------------------------------------------------
+# Header-only probing: metadata without reading sample data
+# ---------------------------------------------------------------------------
+
+_PROBE_KEYS = ("channel_count", "sweep_count", "sample_rate", "sweep_duration", "start_time")
+
+# Mac HFS+ epoch (1904-01-01) offset to Unix epoch, as applied in _ibw_results_to_df.
+_IGOR_EPOCH_OFFSET = (pd.to_datetime("1970-01-01") - pd.to_datetime("1900-01-01")).total_seconds()
+
+
+def _probe_dict(channel_count, sweep_count, sample_rate, sweep_duration, start_time=None):
+    return dict(zip(_PROBE_KEYS, (channel_count, sweep_count, sample_rate, sweep_duration, start_time)))
+
+
+def probe_abf(filepath):
+    """Header-only metadata of an .abf (pyabf loadData=False: no sample data is read)."""
+    abf = pyabf.ABF(filepath, loadData=False)
+    return _probe_dict(
+        channel_count=abf.channelCount,
+        sweep_count=abf.sweepCount,
+        sample_rate=int(abf.sampleRate),
+        sweep_duration=round(abf.sweepPointCount / abf.sampleRate, 6),
+        start_time=pd.Timestamp(abf.abfDateTime),
+    )
+
+
+def ibw_read_header(file):
+    """
+    Read the binary + wave header of an .ibw without loading wData.
+    Returns {"timestamp", "meta_sfA", "npnts"} like ibw_read (minus the array).
+    Supports Igor binary wave versions 1, 2, 3 and 5, either byte order.
+    """
+    with open(file, "rb") as fh:
+        head = fh.read(64 + 116)  # BinHeader5 + WaveHeader5 up to sfA; longer than any v1-3 header prefix
+    byte_order = "<" if struct.unpack("<h", head[:2])[0] in (1, 2, 3, 5) else ">"
+    version = struct.unpack(byte_order + "h", head[:2])[0]
+    if version == 5:
+        # WaveHeader5: next, creationDate, modDate, npnts, type, dLock, whpad1, whVersion, bname, whpad2, dFolder, nDim[4], sfA[4]
+        fields = struct.unpack(byte_order + "IIIihh6sh32siI4i4d", head[64 : 64 + 116])
+        creation_date, npnts, n_dim, sfA = fields[1], fields[3], fields[11:15], fields[15:19]
+        npnts = n_dim[0] or npnts
+    elif version in (1, 2, 3):
+        # WaveHeader2 after BinHeader1/2/3: type, next, bname, whVersion, srcFldr, fileName, dataUnits, xUnits,
+        # npnts, aModified, hsA, hsB, wModified, swModified, fsValid, topFullScale, botFullScale, useBits, kindBits, formula, depID, creationDate
+        offset = {1: 8, 2: 16, 3: 20}[version]
+        fields = struct.unpack(byte_order + "hI20shhI4s4sihddhhhddccIiI", head[offset : offset + 100])
+        creation_date, npnts, sfA = fields[21], fields[8], (fields[10], 0.0, 0.0, 0.0)
+    else:
+        raise ValueError(f"ibw_read_header: unsupported Igor binary wave version {version} in '{file}'")
+    return {"timestamp": creation_date, "meta_sfA": np.array(sfA), "npnts": npnts}
+
+
+def probe_ibw(path):
+    """Header-only metadata of a single .ibw, or of a folder of .ibw files (one sweep per file)."""
+    path = Path(path)
+    files = sorted(path.glob("*.ibw")) if path.is_dir() else [path]
+    if not files:
+        raise ValueError(f"probe_ibw: no .ibw files found in '{path}'.")
+    headers = [ibw_read_header(f) for f in files]
+    first = min(headers, key=lambda h: h["timestamp"])
+    timestep = first["meta_sfA"][0]
+    return _probe_dict(
+        channel_count=1,
+        sweep_count=len(headers),
+        sample_rate=int(round(1 / timestep)),
+        sweep_duration=round(float(first["npnts"] * timestep), 6),
+        start_time=pd.to_datetime(first["timestamp"] - _IGOR_EPOCH_OFFSET, unit="s"),
+    )
+
+
+def _last_line(filepath, step=4096):
+    # The last non-empty line of a text file, read backwards from its end in steps.
+    with open(filepath, "rb") as fh:
+        fh.seek(0, os.SEEK_END)
+        pos = fh.tell()
+        tail = b""
+        while pos > 0 and tail.strip().count(b"\n") < 1:
+            size = min(step, pos)
+            pos -= size
+            fh.seek(pos)
+            tail = fh.read(size) + tail
+    return tail.strip().split(b"\n")[-1].decode()
+
+
+def probe_atf(filepath):
+    """
+    Header-only metadata of an .atf: channel and sweep counts from the header, sample rate
+    from the first two data rows, sweep length from the time of the last row (read from
+    the end of the file, so the data section is never scanned).
+    ATF files embed no absolute timestamp, so start_time is None.
+    """
+    atf = pyabf.ATF(filepath, loadData=False)
+    with open(filepath, "r") as fh:
+        fh.readline()  # "ATF <version>"
+        n_header_lines = 3 + int(fh.readline().split()[0])  # signature, counts, header items, column names
+        for _ in range(n_header_lines - 2):
+            fh.readline()
+        t_first, t_second = (float(fh.readline().split("\t")[0]) for _ in range(2))
+    dt = t_second - t_first
+    sample_rate = int(round(1 / dt))
+    n_points = int(round((float(_last_line(filepath).split("\t")[0]) - t_first) / dt)) + 1
+    return _probe_dict(
+        channel_count=atf.channelCount,
+        sweep_count=atf.sweepCount,
+        sample_rate=sample_rate,
+        sweep_duration=round(n_points / sample_rate, 6),
+    )
+
+
+def probe_csv(filepath, chunksize=10_000):
+    """
+    Metadata of a Brainwash raw sweep CSV from its first sweep and its last line
+    (sweeps are assumed contiguous and numbered in order, as written by Brainwash).
+    """
+    first_sweep_id = None
+    pieces = []
+    for chunk in pd.read_csv(filepath, chunksize=chunksize):
+        if first_sweep_id is None:
+            if detect_bw_csv_type(chunk) != "sweep":
+                raise ValueError(f"probe_csv: '{filepath}' is not a recognised Brainwash sweep CSV.")
+            first_sweep_id = chunk["sweep"].iloc[0]
+        in_first = chunk["sweep"] == first_sweep_id
+        pieces.append(chunk[in_first])
+        if not in_first.all():
+            break
+    df_first = pd.concat(pieces)
+    columns = list(df_first.columns)
+    last_row = _last_line(filepath).split(",")
+    last_sweep = int(float(last_row[columns.index("sweep")]))
+    dt = df_first["time"].diff().dropna().mode().iloc[0]
+    start_time = pd.to_datetime(df_first["datetime"].iloc[0], errors="coerce") if "datetime" in columns else None
+    return _probe_dict(
+        channel_count=1,
+        sweep_count=int(last_sweep - df_first["sweep"].iloc[0] + 1),
+        sample_rate=int(round(1 / dt)),
+        sweep_duration=round(float(df_first["time"].max() + dt), 6),
+        start_time=None if pd.isna(start_time) else start_time,
+    )
+
+
+def probe_source(source):
+    """
+    Header-only metadata for any supported source (file or folder), without reading sample data.
+    Returns {channel_count, sweep_count, sample_rate, sweep_duration, start_time}; start_time is a
+    pd.Timestamp or None. Folders are summarised like source2dfs reads them (one file type per folder).
+    """
+    path = Path(source)
+    if not path.exists():
+        raise FileNotFoundError(f"probe_source: No such file or folder: '{source}'")
+    if not path.is_dir():
+        filetype = path.suffix.lstrip(".").lower()
+        probes = {"abf": probe_abf, "ibw": probe_ibw, "atf": probe_atf, "csv": probe_csv}
+        if filetype not in probes:
+            raise ValueError(f"Unsupported file type: {filetype}")
+        return probes[filetype](path)
+    files = [f for f in path.iterdir() if f.is_file()]
+    by_type = {ext: sorted(f for f in files if f.suffix.lstrip(".").lower() == ext) for ext in ("csv", "abf", "ibw", "atf")}
+    if by_type["csv"]:
+        metas = [probe_csv(f) for f in by_type["csv"]]
+    elif by_type["abf"]:
+        metas = [probe_abf(f) for f in by_type["abf"]]
+    elif by_type["ibw"]:
+        return probe_ibw(path)
+    elif by_type["atf"]:
+        metas = [probe_atf(f) for f in by_type["atf"]]
+    else:
+        raise ValueError(f"probe_source: no supported files in '{path}'.")
+    start_times = [m["start_time"] for m in metas if m["start_time"] is not None]
+    return _probe_dict(
+        channel_count=metas[0]["channel_count"],
+        sweep_count=sum(m["sweep_count"] for m in metas),
+        sample_rate=metas[0]["sample_rate"],
+        sweep_duration=metas[0]["sweep_duration"],
+        start_time=min(start_times) if start_times else None,
+    )
+
+
+def probe_sources(sources):
+    """probe_source for many paths (threaded: probing is I/O-bound). Returns a list aligned with sources; None where probing failed."""
+
+    def _probe_or_none(source):
+        try:
+            return probe_source(source)
+        except Exception as e:
+            print(f"probe_source: {source}: {e}")
+            return None
+
+    if len(sources) < 2:
+        return [_probe_or_none(source) for source in sources]
+    return Parallel(n_jobs=min(len(sources), 16), prefer="threads")(delayed(_probe_or_none)(source) for source in sources)
+
+
 def sample_atf(filepath):
     """
     Extracts channelCount, sweepCount and sweep duration from an .atf file.
-    ATF files are ASCII text, so a full load is inexpensive. dataRate and
-    sweepLengthSec are only populated after the data array is parsed, so
-    loadData=True (the default) is required.
+    Header-only: see probe_atf.
     """
-    atf = pyabf.ATF(filepath)
-    dict_metadata = {
-        "channel_count": atf.channelCount,
-        "sweep_count": atf.sweepCount,
-        "sample_rate": atf.dataRate,
-        "sweep_duration": atf.sweepLengthSec,
-    }
-    return dict_metadata
+    meta = probe_atf(filepath)
+    return {key: meta[key] for key in ("channel_count", "sweep_count", "sample_rate", "sweep_duration")}
 
 
 def sample_abf(filepath):
     """
-    Extracts channelCount, sweepCount and sweep duration from an .abf file
+    Extracts channelCount, sweepCount and sweep duration from an .abf file.
+    Header-only: see probe_abf.
     """
-    filepath = Path(filepath)
-    abf = pyabf.ABF(filepath)
-    channel_count = abf.channelCount
-    sweep_count = abf.sweepCount
-    sample_rate = abf.sampleRate
-    sweep_duration = len(abf.getAllXs()) / sample_rate  # duration in seconds
-    dict_metadata = {
-        "channel_count": channel_count,
-        "sweep_count": sweep_count,
-        "sample_rate": sample_rate,  # TODO: implement sample_rate, for listing in df_project
-        "sweep_duration": sweep_duration,
-    }
-    return dict_metadata
+    meta = probe_abf(Path(filepath))
+    return {key: meta[key] for key in ("channel_count", "sweep_count", "sample_rate", "sweep_duration")}
 
 
 # %%
@@ -316,10 +673,7 @@ def parse_atfFolder(folderpath, dev=False):
     list_files = sorted([f for f in os.listdir(folderpath) if f.lower().endswith(".atf")])
     if verbose:
         print(f"list_files (atf): {list_files}")
-    listdf = []
-    for filename in list_files:
-        df = parse_atf(Path(folderpath) / filename)
-        listdf.append(df)
+    listdf = _parallel_map(parse_atf, [Path(folderpath) / filename for filename in list_files])
     df = pd.concat(listdf).reset_index(drop=True)
     return df
 
@@ -360,10 +714,7 @@ def parse_abfFolder(folderpath, dev=False):
     list_files = sorted([i for i in os.listdir(folderpath) if -1 < i.find(".abf")])  # [:2] # stop before item 2 [begin:end]
     if verbose:
         print(f"list_files: {list_files}")
-    listdf = []
-    for filename in list_files:
-        df = parse_abf(folderpath / filename)
-        listdf.append(df)
+    listdf = _parallel_map(parse_abf, [Path(folderpath) / filename for filename in list_files])
     df = pd.concat(listdf)
     df.reset_index(drop=True, inplace=True)
     # Check first timestamp in each df, verify correct sequence, raise error
@@ -401,6 +752,127 @@ def parse_abf(filepath):
     return df
 
 
+def parse_abf_matrices(filepath):
+    """
+    Matrix counterpart of parse_abf: returns {channel: RecordingMatrix} with
+    voltage in V, t0 = abf.sweepTimesSec and datetime = abfDateTime + t0.
+    """
+    abf = pyabf.ABF(filepath)
+    n_points = abf.sweepPointCount
+    t0 = np.asarray(abf.sweepTimesSec, dtype=np.float64)
+    datetime = (t0 * 1_000_000_000).astype("datetime64[ns]") + (abf.abfDateTime - pd.to_datetime(0))
+    matrices = {}
+    for j in abf.channelList:
+        voltage = abf.getAllYs(j).reshape(abf.sweepCount, -1)[:, :n_points] / 1000  # mV to V
+        matrices[j] = RecordingMatrix.from_arrays(voltage, abf.getAllXs(j)[:n_points], t0=t0, datetime=datetime)
+    return matrices
+
+
+# Measured peak bytes per sample while a block is held long-form (raw + filter DataFrames and their Arrow tables).
+ABF_BYTES_PER_SAMPLE = 208
+
+
+def _abf_int16_scale(abf, channel):
+    """
+    (gain, offset) that pyabf applies to channel's int16 samples, or None if this pyabf does not
+    expose them as the private _dataGain/_dataOffset lists (pyabf 2.x, checked against getAllYs
+    in test_recording_import). There is no public accessor for the scale.
+    """
+    if not pyabf.__version__.startswith("2."):
+        return None
+    gain, offset = getattr(abf, "_dataGain", None), getattr(abf, "_dataOffset", None)
+    if gain is None or offset is None or len(gain) != abf.channelCount or len(offset) != abf.channelCount:
+        return None
+    return gain[channel], offset[channel]
+
+
+def abf_blocks(abf, channel, max_samples, samples=None):
+    """
+    Yield (first_sweep, first_sample, voltage) blocks of one channel of an ABF opened with
+    pyabf.ABF(filepath, loadData=False), read through a memory map of the file's data section
+    (closed when the generator finishes or is closed).
+
+    voltage is float32 in V, shape (n_sweeps, n_samples), scaled exactly as parse_abf does.
+    samples (a step-1 range of within-sweep sample indices, default all) limits what is read.
+    Blocks are whole sweeps while a sweep fits in max_samples; longer sweeps (gap-free
+    recordings are one long sweep) are split into sample ranges. Blocks come in sweep-major order.
+    If the int16 scale cannot be read from this pyabf (see _abf_int16_scale), the file is loaded
+    whole and the blocks are cut from getAllYs instead.
+    """
+    n_points = abf.sweepPointCount
+    samples = range(n_points) if samples is None else samples
+    sweeps_per_block = max(1, max_samples // max(1, len(samples)))
+    samples_per_block = max(1, min(len(samples), max_samples))
+    dtype = {2: np.int16, 4: np.float32}[abf.dataPointByteSize]
+    scale = _abf_int16_scale(abf, channel) if dtype == np.int16 else None
+    with contextlib.ExitStack() as stack:
+        if dtype == np.int16 and scale is None:
+            print(f" - - abf_blocks: no int16 scale in pyabf {pyabf.__version__}; loading {abf.abfFilePath} whole.")
+            data, channel = pyabf.ABF(abf.abfFilePath).getAllYs(channel)[:, None], 0
+        else:
+            f = stack.enter_context(open(abf.abfFilePath, "rb"))
+            mm = stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            data = np.frombuffer(mm, dtype=dtype, count=abf.dataPointCount, offset=abf.dataByteStart).reshape(-1, abf.channelCount)
+        try:
+            for sweep in range(0, abf.sweepCount, sweeps_per_block):
+                n_sweeps = min(sweeps_per_block, abf.sweepCount - sweep)
+                for sample in range(samples.start, samples.stop, samples_per_block):
+                    n_samples = min(samples_per_block, samples.stop - sample)
+                    rows = (np.arange(sweep, sweep + n_sweeps)[:, None] * n_points + np.arange(sample, sample + n_samples)).ravel()
+                    voltage = data[rows, channel].astype(np.float32)
+                    if scale is not None:
+                        voltage = voltage * scale[0] + scale[1]
+                    yield sweep, sample, (voltage / 1000).reshape(n_sweeps, n_samples)  # mV to V
+        finally:
+            del data  # release the buffer before the memory map is closed
+
+
+def abf_block_to_long(abf, first_sweep, first_sample, voltage):
+    """
+    Long-format rows (sweep, time, voltage_raw, t0, datetime) of an abf_blocks block, as
+    parse_abf_matrices(...).to_long() gives for the whole file (datetime = sweep start + time).
+    """
+    n_sweeps, n_samples = voltage.shape
+    time = np.arange(first_sample, first_sample + n_samples) / abf.sampleRate
+    t0 = np.asarray(abf.sweepTimesSec[first_sweep : first_sweep + n_sweeps], dtype=np.float64)
+    starts = (t0 * 1_000_000_000).astype("datetime64[ns]") + (abf.abfDateTime - pd.to_datetime(0))
+    offsets = np.round(time * 1e9).astype("int64").astype("timedelta64[ns]")
+    datetime = (starts[:, None] + offsets[None, :]).ravel()
+    t0 = np.repeat(t0, n_samples)
+    time = np.tile(time, n_sweeps)
+    return pd.DataFrame(
+        {
+            "sweep": np.repeat(np.arange(first_sweep, first_sweep + n_sweeps), n_samples),
+            "time": time,
+            "voltage_raw": voltage.ravel(),
+            "t0": t0,
+            "datetime": datetime,
+        }
+    )
+
+
+def parse_atf_matrices(filepath):
+    """
+    Matrix counterpart of parse_atf: returns {channel: RecordingMatrix}, voltage mV → V,
+    t0 NaN and datetime NaT (ATF embeds no absolute timestamp).
+    """
+    atf = pyabf.ATF(filepath)
+    matrices = {}
+    for ch in atf.channelList:
+        rows = []
+        for sweep in atf.sweepList:
+            atf.setSweep(sweep, channel=ch)
+            rows.append(atf.sweepY.astype(np.float64) / 1000)  # mV → V
+        matrices[ch] = RecordingMatrix.from_arrays(np.vstack(rows), atf.sweepX.astype(np.float64))
+    return matrices
+
+
+def _concat_channel_matrices(list_dicts):
+    # [{channel: matrix}, ...] per file → {channel: matrix} with sweeps stacked in file order
+    channels = list(dict.fromkeys(ch for d in list_dicts for ch in d))
+    return {ch: recording_matrix.concat([d[ch] for d in list_dicts if ch in d]) for ch in channels}
+
+
 def compute_sweep_hz(df):
     """Derive inter-sweep rate (Hz) from a raw data DataFrame.
 
@@ -569,17 +1041,7 @@ def source2dfs(
             # sort df by datetime
 
             for channel, df in dict_channeldfs.items():
-                # Group rows into sweeps by detecting time resets (time == 0 starts a new sweep).
-                sweep_groups = (df["time"] == 0).cumsum()
-                # Check that each sweep's start datetime is monotonically increasing.
-                sweep_start_dt = df.groupby(sweep_groups)["datetime"].first()
-                if not sweep_start_dt.is_monotonic_increasing:
-                    print(" - - Warning: sweep start datetimes not monotonic increasing, sorting sweeps.")
-                    t0 = time.time()
-                    sweep_order = sweep_start_dt.sort_values().index
-                    sorted_pieces = [df[sweep_groups == grp] for grp in sweep_order]
-                    dict_channeldfs[channel] = pd.concat(sorted_pieces).reset_index(drop=True)
-                    print(" - - Sorted sweeps in {:.2f} seconds".format(time.time() - t0))
+                dict_channeldfs[channel] = sort_sweeps_by_datetime(df)
             # generate 'sweep' column and drop channel column
             for df in dict_channeldfs.values():
                 df["sweep"] = df.groupby((df["time"] == 0).cumsum()).ngroup()
@@ -600,47 +1062,68 @@ def source2dfs(
 
     if split_odd_even:
         split_result = {}
-        for channel, df in dict_channeldfs.items():
-            sweeps = df["sweep"].unique()
-            sweeps_sorted = sorted(sweeps)
-            even_sweeps = {s for i, s in enumerate(sweeps_sorted) if i % 2 == 0}
-            odd_sweeps = {s for i, s in enumerate(sweeps_sorted) if i % 2 != 0}
-            df_even = df[df["sweep"].isin(even_sweeps)].copy().reset_index(drop=True)
-            df_odd = df[df["sweep"].isin(odd_sweeps)].copy().reset_index(drop=True)
-            # renumber sweeps to be contiguous from 0
-            for part_df in (df_even, df_odd):
-                old_sweeps = sorted(part_df["sweep"].unique())
-                remap = {old: new for new, old in enumerate(old_sweeps)}
-                part_df["sweep"] = part_df["sweep"].map(remap)
-            split_result[(channel, "even")] = df_even
-            split_result[(channel, "odd")] = df_odd
-            print(f" - - split_odd_even ch{channel}: " f"{len(even_sweeps)} even sweeps, {len(odd_sweeps)} odd sweeps.")
+        for channel in list(dict_channeldfs):
+            df = dict_channeldfs.pop(channel)  # release each source df as soon as it is split
+            grid = _sweep_matrix(df)
+            if grid is not None:
+                # Regular grid: the halves are every other row of the sweep matrix (strided views),
+                # expanded to long format one at a time after the source df is released.
+                columns, df = list(df.columns), None
+                n_even, n_odd = (grid[0].n_sweeps + 1) // 2, grid[0].n_sweeps // 2
+                for label, part_df in _split_to_long(recording_matrix.split_odd_even, *grid, columns).items():
+                    split_result[(channel, label)] = part_df
+            else:  # ragged or duplicated sweeps
+                sweeps = df["sweep"].unique()
+                sweeps_sorted = sorted(sweeps)
+                even_sweeps = {s for i, s in enumerate(sweeps_sorted) if i % 2 == 0}
+                odd_sweeps = {s for i, s in enumerate(sweeps_sorted) if i % 2 != 0}
+                df_even = df[df["sweep"].isin(even_sweeps)].copy().reset_index(drop=True)
+                df_odd = df[df["sweep"].isin(odd_sweeps)].copy().reset_index(drop=True)
+                # renumber sweeps to be contiguous from 0
+                for part_df in (df_even, df_odd):
+                    old_sweeps = sorted(part_df["sweep"].unique())
+                    remap = {old: new for new, old in enumerate(old_sweeps)}
+                    part_df["sweep"] = part_df["sweep"].map(remap)
+                split_result[(channel, "even")] = df_even
+                split_result[(channel, "odd")] = df_odd
+                n_even, n_odd = len(even_sweeps), len(odd_sweeps)
+            print(f" - - split_odd_even ch{channel}: " f"{n_even} even sweeps, {n_odd} odd sweeps.")
         return split_result
 
     if split_at_time is not None and split_at_time > 0:
         split_result = {}
-        for channel, df in dict_channeldfs.items():
+        for channel in list(dict_channeldfs):
+            df = dict_channeldfs.pop(channel)
             # Cut every sweep at the within-sweep time point.
             # Part 'a': time < split_at_time  (first event, e.g. baseline / first stim).
             # Part 'b': time >= split_at_time (second event), time re-zeroed to start from 0.
             # Both parts keep all sweeps.
-            df_a = df[df["time"] < split_at_time].copy().reset_index(drop=True)
-            df_b = df[df["time"] >= split_at_time].copy().reset_index(drop=True)
+            last_time, n_sweeps = df["time"].max(), df["sweep"].nunique()
+            grid = _sweep_matrix(df)
+            if grid is not None:
+                # Regular grid: each part is a column range of the sweep matrix (a view), and every
+                # sweep of part 'b' starts at the same grid time; long format is built per part.
+                columns, df = list(df.columns), None
+                split = functools.partial(recording_matrix.split_at_time, t_split=split_at_time)
+                parts = _split_to_long(split, *grid, columns)
+                df_a, df_b = parts["a"], parts["b"]
+            else:  # ragged or duplicated sweeps
+                df_a = df[df["time"] < split_at_time].copy().reset_index(drop=True)
+                df_b = df[df["time"] >= split_at_time].copy().reset_index(drop=True)
+                if not df_b.empty:
+                    # Re-zero time in part 'b' so it starts from 0 within each sweep,
+                    # matching the convention every downstream function expects.
+                    split_offset = df_b.groupby("sweep")["time"].transform("min")
+                    df_b["time"] = (df_b["time"] - split_offset).round(9)
             if df_a.empty:
                 print(f" - - split_at_time ch{channel}: split_at_time {split_at_time}s is at or " f"before the first sample; part 'a' is empty.")
             if df_b.empty:
                 print(
                     f" - - split_at_time ch{channel}: split_at_time {split_at_time}s is beyond "
-                    f"the last sample ({df['time'].max():.6g}s); part 'b' is empty."
+                    f"the last sample ({last_time:.6g}s); part 'b' is empty."
                 )
-            else:
-                # Re-zero time in part 'b' so it starts from 0 within each sweep,
-                # matching the convention every downstream function expects.
-                split_offset = df_b.groupby("sweep")["time"].transform("min")
-                df_b["time"] = (df_b["time"] - split_offset).round(9)
             split_result[(channel, "a")] = df_a
             split_result[(channel, "b")] = df_b
-            n_sweeps = df["sweep"].nunique()
             print(
                 f" - - split_at_time ch{channel}: cut at t={split_at_time}s; " f"'a' {len(df_a)} rows, 'b' {len(df_b)} rows across {n_sweeps} sweeps."
             )
@@ -649,6 +1132,92 @@ def source2dfs(
     return dict_channeldfs
 
 
+def sort_sweeps_by_datetime(df):
+    """
+    Reorder the sweeps of a single-channel long-format df by their start datetime.
+
+    Sweeps are row blocks, each starting where time == 0. If their first datetimes are
+    not monotonic increasing, the blocks are moved with one stable permutation of the
+    rows (O(n_rows)), rather than a boolean mask scan per sweep. Returns df unchanged
+    when already in order.
+    """
+    is_start = (df["time"] == 0).to_numpy()
+    starts = np.flatnonzero(is_start)
+    if len(starts) == 0 or starts[0] != 0:
+        starts = np.r_[0, starts]  # rows before the first time == 0 form their own block
+    sweep_start_dt = df["datetime"].to_numpy()[starts]
+    if pd.Series(sweep_start_dt).is_monotonic_increasing:
+        return df
+    print(" - - Warning: sweep start datetimes not monotonic increasing, sorting sweeps.")
+    t0 = time.time()
+    lengths = np.diff(np.r_[starts, len(df)])
+    order = np.argsort(sweep_start_dt, kind="stable")  # NaT last
+    new_lengths = lengths[order]
+    new_starts = np.r_[0, np.cumsum(new_lengths)[:-1]]
+    rows = np.arange(len(df)) + np.repeat(starts[order] - new_starts, new_lengths)
+    df = df.take(rows).reset_index(drop=True)
+    print(" - - Sorted sweeps in {:.2f} seconds".format(time.time() - t0))
+    return df
+
+
+def source2matrices(source, dev=False, gain=1.0, progress_callback=None, split_odd_even=False, split_at_time=None):
+    """
+    Matrix counterpart of source2dfs: identifies the type of file(s) and returns
+    {channel: RecordingMatrix}, or {stem: RecordingMatrix} for a folder of CSVs.
+    Sweeps are ordered by start datetime where known.
+    With split_odd_even or split_at_time, returns {(channel, label): RecordingMatrix} like
+    source2dfs; the split parts are views of the parsed voltage (no copy).
+    Use RecordingMatrix.to_long() where long format is needed.
+    """
+    if split_odd_even and split_at_time:
+        raise ValueError("split_odd_even and split_at_time are mutually exclusive.")
+    matrices = _source2matrices(source, dev=dev, gain=gain, progress_callback=progress_callback)
+    if split_odd_even:
+        return {(channel, label): part for channel, m in matrices.items() for label, part in recording_matrix.split_odd_even(m).items()}
+    if split_at_time is not None and split_at_time > 0:
+        return {(channel, label): part for channel, m in matrices.items() for label, part in recording_matrix.split_at_time(m, split_at_time).items()}
+    return matrices
+
+
+def _source2matrices(source, dev=False, gain=1.0, progress_callback=None):
+    path = Path(source)
+    if not path.exists():
+        raise FileNotFoundError(f"source2matrices: No such file or folder: '{source}'")
+    if path.is_dir():
+        files = [f for f in path.iterdir() if f.is_file()]
+        by_type = {ext: sorted(f for f in files if f.suffix.lstrip(".").lower() == ext) for ext in ("csv", "abf", "ibw", "atf")}
+        if by_type["csv"]:
+            return {stem: RecordingMatrix.from_long(df) for stem, df in parse_csvFolder(path).items()}
+        elif by_type["abf"]:
+            matrices = _concat_channel_matrices(_parallel_map(parse_abf_matrices, by_type["abf"]))
+        elif by_type["ibw"]:
+            matrices = {0: _ibw_results_to_matrix(_read_ibwFolder(path, dev=dev, progress_callback=progress_callback), gain=gain)}
+        elif by_type["atf"]:
+            matrices = _concat_channel_matrices(_parallel_map(parse_atf_matrices, by_type["atf"]))
+        else:
+            print("No valid files found.")
+            return {}
+    else:
+        filetype = path.suffix.lstrip(".").lower()
+        if filetype == "csv":
+            return {0: RecordingMatrix.from_long(parse_csv(source)[0])}
+        elif filetype == "abf":
+            matrices = parse_abf_matrices(source)
+        elif filetype == "ibw":
+            matrices = {0: _ibw_results_to_matrix([ibw_read(path)], gain=gain)}
+        elif filetype == "atf":
+            matrices = parse_atf_matrices(source)
+        else:
+            raise ValueError(f"Unsupported file type: {filetype}")
+
+    for channel, matrix in matrices.items():
+        if not np.isnat(matrix.datetime).any() and (np.diff(matrix.datetime) < np.timedelta64(0)).any():
+            print(" - - Warning: sweep start datetimes not monotonic increasing, sorting sweeps.")
+            order = np.argsort(matrix.datetime, kind="stable")
+            matrices[channel] = RecordingMatrix.from_arrays(matrix.voltage[order], matrix.time, t0=matrix.t0[order], datetime=matrix.datetime[order])
+    return matrices
+
+
 #############################################################
 #                  Standalone testing                       #
 #############################################################
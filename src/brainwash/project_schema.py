@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from pathlib import Path
+
 import pandas as pd
 
 INT_COLUMNS = ["stims", "sampling_rate", "bin_size"]
@@ -39,4 +41,117 @@ def df_projectTemplate():
     )
     for col in INT_COLUMNS:
         df[col] = df[col].astype(pd.Int64Dtype())
-    return df
\ No newline at end of file
+    return df
+
+
+def migrate_hierarchy(df: pd.DataFrame) -> pd.DataFrame:
+    """v0.16_n: Apply statistical_protocol defaults on load/import.
+
+    - Adds 'subject'/'slice' columns if missing (backcompat).
+    - Lowest-unique-integer subjects (respects manual values; fills gaps).
+    - Default slice="1" (one-slice-per-animal assumption).
+    - Uses string dtype for both (flexible labels; Option A from plan).
+    - Called from read_df_project, ProjectMixin.set_df_project, and import paths.
+    """
+    if "subject" not in df.columns:
+        df["subject"] = None
+    if "slice" not in df.columns:
+        df["slice"] = None
+
+    # Force string dtype (prevents int64 inference from numeric defaults like "1"/"2")
+    for col in ("subject", "slice"):
+        if df[col].dtype != "object" and not pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].astype("object")
+
+    # Canonical string keys so stats n_unit collapse treats 1 / "1" / 1.0 as one subject
+    try:
+        from brainwash_stats.data import _normalize_hierarchy_key
+    except Exception:
+
+        def _normalize_hierarchy_key(v):
+            return None if pd.isna(v) else str(v).strip()
+
+    for i, row in df.iterrows():
+        for hcol in ("subject", "slice"):
+            raw = row.get(hcol)
+            if pd.isna(raw) or str(raw).strip() == "":
+                continue
+            canon = _normalize_hierarchy_key(raw)
+            if canon is not None:
+                df.at[i, hcol] = canon
+
+    # Lowest-unique-integer subjects (string)
+    existing_subs = set()
+    for s in df["subject"].dropna().unique():
+        c = _normalize_hierarchy_key(s)
+        if c is not None:
+            existing_subs.add(c)
+    next_id = 1
+    for i, row in df.iterrows():
+        subj = row.get("subject")
+        if pd.isna(subj) or str(subj).strip() == "":
+            while str(next_id) in existing_subs:
+                next_id += 1
+            df.at[i, "subject"] = str(next_id)
+            existing_subs.add(str(next_id))
+            next_id += 1
+        slc = row.get("slice")
+        if pd.isna(slc) or str(slc).strip() == "":
+            df.at[i, "slice"] = "1"
+    return df
+
+
+def read_df_project(project_folder) -> pd.DataFrame:
+    """Read project_folder/project.brainwash with the schema, dtypes and defaults load_df_project applies."""
+    df = pd.read_csv(str(Path(project_folder) / "project.brainwash"), dtype={"group_IDs": str})
+    # Backfill any columns added to the schema since this project was last saved
+    for col in df_projectTemplate().columns:
+        if col not in df.columns:
+            df[col] = None
+    # Restore nullable-integer dtypes lost during CSV round-trip (CSV
+    # reads integer-with-NaN columns as float64, producing "1.0" display).
+    for col in INT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(pd.Int64Dtype())
+
+    # Ensure filter_params is an object column to accept dicts/json
+    if "filter_params" in df.columns:
+        df["filter_params"] = df["filter_params"].astype(object)
+
+    # Ensure filter column defaults to "voltage" instead of NaN, None, or "none"
+    if "filter" in df.columns:
+        df["filter"] = df["filter"].fillna("voltage")
+        df.loc[df["filter"] == "none", "filter"] = "voltage"
+        df.loc[df["filter"] == "", "filter"] = "voltage"
+
+    # v0.16_n: enforce statistical_protocol defaults (subject/slice hierarchy)
+    return migrate_hierarchy(df)
+
+
+def normalize_df_project(df: pd.DataFrame) -> pd.DataFrame:
+    """Dtypes and hierarchy defaults of a df_project about to be stored (ProjectMixin.set_df_project)."""
+    # Restore nullable-integer dtypes that pd.concat can degrade to
+    # object when mixing Int64 rows with newly-parsed Series rows.
+    for col in INT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(pd.Int64Dtype())
+    # sweeps is a mixed-type sentinel column: unparsed rows hold the
+    # string "..." while parsed rows hold a numeric sweep count.
+    # pd.concat can coerce the numeric values to strings (e.g. "1440")
+    # when object-dtype rows are concatenated with Int64 rows.
+    # Restore: convert anything that looks numeric back to int, leave
+    # "..." strings alone.
+    if "sweeps" in df.columns:
+
+        def _coerce_sweeps(v):
+            if v == "...":
+                return v
+            try:
+                return int(v)
+            except (TypeError, ValueError):
+                return v
+
+        df["sweeps"] = df["sweeps"].apply(_coerce_sweeps)
+
+    # v0.16_n: enforce hierarchy defaults (new projects, imports, bulk edits)
+    return migrate_hierarchy(df)
@@ -0,0 +1,359 @@
+"""
+Dense sweep-matrix representation of a single-channel recording.
+
+Long-format DataFrames (one row per (sweep, time) sample, with float64 time,
+t0 and datetime columns repeated on every row) are convenient for plotting and
+export but cost ~40 bytes per sample and force repeated pivot/stack/merge
+round-trips. RecordingMatrix keeps only what actually varies:
+
+    voltage   (n_sweeps, n_samples) float array (C-contiguous, except split views)
+    time      (n_samples,)          within-sweep time grid in seconds (shared by all sweeps)
+    t0        (n_sweeps,)           sweep start in seconds from recording start (NaN if unknown)
+    datetime  (n_sweeps,)           absolute wall-clock time of each sweep's first sample (NaT if unknown)
+    sweeps    (n_sweeps,)           sweep labels (0..n-1 unless built from relabelled data)
+
+Parsers produce it (parse.source2matrices), and recording import, live import
+and split imports work on it; ragged sources, whose sweeps share no grid, stay
+in long format. The analysis layer (dfmean, dffilter, find_events,
+build_dfoutput) still consumes long format, produced on demand by to_long().
+"""
+
+from __future__ import annotations
+
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class RecordingMatrix:
+    voltage: np.ndarray
+    time: np.ndarray
+    t0: np.ndarray
+    datetime: np.ndarray
+    sweeps: np.ndarray
+
+    def __post_init__(self):
+        self.voltage = np.asarray(self.voltage)  # strided views (split_odd_even, split_at_time) are kept as views
+        if self.voltage.ndim != 2:
+            raise ValueError(f"RecordingMatrix: voltage must be 2-D (n_sweeps, n_samples), got shape {self.voltage.shape}")
+        n_sweeps, n_samples = self.voltage.shape
+        self.time = np.asarray(self.time, dtype=np.float64)
+        self.t0 = np.asarray(self.t0, dtype=np.float64)
+        self.datetime = np.asarray(self.datetime, dtype="datetime64[ns]")
+        self.sweeps = np.asarray(self.sweeps)
+        if self.time.shape != (n_samples,):
+            raise ValueError(f"RecordingMatrix: time grid has shape {self.time.shape}, expected ({n_samples},)")
+        for name in ("t0", "datetime", "sweeps"):
+            if getattr(self, name).shape != (n_sweeps,):
+                raise ValueError(f"RecordingMatrix: {name} has shape {getattr(self, name).shape}, expected ({n_sweeps},)")
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_arrays(cls, voltage, time, t0=None, datetime=None, sweeps=None) -> RecordingMatrix:
+        """Build from a (n_sweeps, n_samples) array; missing per-sweep vectors default to NaN/NaT/0..n-1."""
+        voltage = np.asarray(voltage)
+        n_sweeps = voltage.shape[0]
+        if t0 is None:
+            t0 = np.full(n_sweeps, np.nan)
+        if datetime is None:
+            datetime = np.full(n_sweeps, np.datetime64("NaT"), dtype="datetime64[ns]")
+        if sweeps is None:
+            sweeps = np.arange(n_sweeps)
+        return cls(voltage=voltage, time=time, t0=t0, datetime=datetime, sweeps=sweeps)
+
+    @classmethod
+    def from_long(cls, df: pd.DataFrame, value_col: str = "voltage_raw") -> RecordingMatrix:
+        """
+        Build from a long-format DataFrame with columns sweep, time, <value_col>
+        and optionally t0, datetime.
+
+        Rows may come in any order. Raises ValueError if sweeps do not share one
+        time grid (ragged lengths, duplicated or missing samples).
+        """
+        if df is None or len(df) == 0:
+            raise ValueError("RecordingMatrix.from_long: empty DataFrame")
+        sweep = df["sweep"].to_numpy()
+        time = df["time"].to_numpy(dtype=np.float64)
+        values = df[value_col].to_numpy()
+        if not np.issubdtype(values.dtype, np.floating):
+            values = values.astype(np.float64)
+        order, n_sweeps, n_samples = grid_layout(sweep, time)
+        if order is not None:
+            sweep, time, values = sweep[order], time[order], values[order]
+        starts = np.arange(n_sweeps) * n_samples
+        grid = time[:n_samples]
+
+        t0 = np.full(n_sweeps, np.nan)
+        if "t0" in df.columns:
+            t0_col = df["t0"].to_numpy(dtype=np.float64)
+            t0 = (t0_col if order is None else t0_col[order])[starts]
+        datetime = np.full(n_sweeps, np.datetime64("NaT"), dtype="datetime64[ns]")
+        if "datetime" in df.columns:
+            dt_col = pd.to_datetime(df["datetime"], errors="coerce").to_numpy(dtype="datetime64[ns]")
+            datetime = (dt_col if order is None else dt_col[order])[starts]
+        return cls(voltage=values.reshape(n_sweeps, n_samples), time=grid.copy(), t0=t0, datetime=datetime, sweeps=sweep[starts])
+
+    # ------------------------------------------------------------------
+    # Shape and timing
+    # ------------------------------------------------------------------
+
+    @property
+    def n_sweeps(self) -> int:
+        return self.voltage.shape[0]
+
+    @property
+    def n_samples(self) -> int:
+        return self.voltage.shape[1]
+
+    @property
+    def dt(self) -> float:
+        """Sample interval in seconds (modal step of the time grid)."""
+        if self.n_samples < 2:
+            return float("nan")
+        steps, counts = np.unique(np.diff(self.time), return_counts=True)
+        return float(steps[np.argmax(counts)])
+
+    @property
+    def sampling_rate(self) -> int:
+        return int(round(1 / self.dt))
+
+    @property
+    def sweep_duration(self) -> float:
+        return round(float(self.time[-1]) + self.dt, 6)
+
+    @property
+    def nbytes(self) -> int:
+        return self.voltage.nbytes + self.time.nbytes + self.t0.nbytes + self.datetime.nbytes + self.sweeps.nbytes
+
+    # ------------------------------------------------------------------
+    # Derived matrices
+    # ------------------------------------------------------------------
+
+    def with_voltage(self, voltage: np.ndarray) -> RecordingMatrix:
+        """Same sweeps and timing, new sample values (e.g. after zeroing or filtering)."""
+        return RecordingMatrix(voltage=voltage, time=self.time, t0=self.t0, datetime=self.datetime, sweeps=self.sweeps)
+
+    def mean_waveform(self) -> np.ndarray:
+        """Mean across sweeps, per sample (NaN-skipping, like pivot_table(...).mean())."""
+        if np.isnan(self.voltage).any():
+            return np.nanmean(self.voltage, axis=0)
+        return self.voltage.mean(axis=0)
+
+    def zeroed(self, i_stim: int) -> RecordingMatrix:
+        """Subtract from each sweep its mean over samples [i_stim-20, i_stim-10) (same slice as parse.zeroSweeps)."""
+        baseline = self.voltage[:, i_stim - 20 : i_stim - 10]
+        if baseline.shape[1] == 0:
+            return self.with_voltage(np.full_like(self.voltage, np.nan))
+        return self.with_voltage(self.voltage - np.nanmean(baseline, axis=1, keepdims=True))
+
+    # ------------------------------------------------------------------
+    # Long format (export / legacy consumers)
+    # ------------------------------------------------------------------
+
+    def to_long(self, value_col: str = "voltage_raw") -> pd.DataFrame:
+        """
+        Expand to long format with columns sweep, time, <value_col>, t0, datetime.
+
+        datetime is reconstructed as the sweep's start datetime plus the
+        within-sweep offset, at nanosecond resolution.
+        """
+        n_sweeps, n_samples = self.voltage.shape
+        offset_ns = np.round((self.time - self.time[:1].sum()) * 1e9).astype("int64").astype("timedelta64[ns]")  # [:1]: empty-safe
+        datetime = (self.datetime[:, None] + offset_ns[None, :]).ravel()
+        values = self.voltage.ravel()  # a copy for strided views, a view of a contiguous matrix
+        if np.may_share_memory(values, self.voltage):
+            values = values.copy()
+        # Every column is a fresh array, so the frame takes them as they are (no second copy of the recording).
+        return pd.DataFrame(
+            {
+                "sweep": np.repeat(self.sweeps, n_samples),
+                "time": np.tile(self.time, n_sweeps),
+                value_col: values,
+                "t0": np.repeat(self.t0, n_samples),
+                "datetime": datetime,
+            },
+            copy=False,
+        )
+
+
+def grid_layout(sweep: np.ndarray, time: np.ndarray) -> tuple[np.ndarray | None, int, int]:
+    """
+    Check that long-format (sweep, time) columns describe a regular sample grid and
+    return (order, n_sweeps, n_samples). order is None when rows are already
+    sweep-major (values.reshape(n_sweeps, n_samples) is valid as-is), otherwise the
+    permutation that makes them so. Raises ValueError for ragged sweep lengths,
+    duplicated samples or sweeps on different time grids.
+    """
+    if _is_sweep_major(sweep, time):
+        order = None
+    else:
+        order = np.lexsort((time, sweep))
+        sweep, time = sweep[order], time[order]
+    starts = np.flatnonzero(np.r_[True, sweep[1:] != sweep[:-1]])
+    n_sweeps = len(starts)
+    if len(time) % n_sweeps != 0 or not np.all(np.diff(np.r_[starts, len(time)]) == len(time) // n_sweeps):
+        raise ValueError("RecordingMatrix.from_long: sweeps have ragged lengths")
+    n_samples = len(time) // n_sweeps
+    time_2d = time.reshape(n_sweeps, n_samples)
+    grid = time_2d[0]
+    if (np.diff(grid) <= 0).any():
+        raise ValueError("RecordingMatrix.from_long: duplicated (sweep, time) samples")
+    if not np.array_equal(time_2d, np.broadcast_to(grid, time_2d.shape)):
+        raise ValueError("RecordingMatrix.from_long: sweeps do not share the same time grid")
+    return order, n_sweeps, n_samples
+
+
+def _is_sweep_major(sweep: np.ndarray, time: np.ndarray) -> bool:
+    # True when rows are already grouped by non-decreasing sweep with increasing time inside each sweep.
+    if len(sweep) < 2:
+        return True
+    # Boolean comparisons only: np.diff would allocate two more float/int columns of the recording.
+    if not (sweep[1:] >= sweep[:-1]).all():
+        return False
+    return bool(((time[1:] > time[:-1]) | (sweep[1:] != sweep[:-1])).all())
+
+
+@dataclass(frozen=True)
+class SampleGrid:
+    """
+    Regular within-sweep time grid, time[i] = t0 + i * dt for i in 0..n-1.
+
+    Converts timepoints to integer sample indices, so analysis windows are array
+    slices instead of float comparisons against a time column. A timepoint within
+    INDEX_TOL samples of a grid point counts as on it, which absorbs the float
+    accumulation in ATF/IBW time columns (0.0114999... vs 0.0115).
+    """
+
+    t0: float
+    dt: float
+    n: int
+
+    INDEX_TOL = 1e-6  # samples
+    REGULAR_RTOL = 1e-3  # max deviation of a step from dt, relative to dt
+
+    @classmethod
+    def from_time(cls, time) -> SampleGrid | None:
+        """Grid of a sorted time array, or None if it has fewer than 2 samples or uneven steps (e.g. cropped gaps)."""
+        time = np.asarray(time, dtype=np.float64)
+        n = len(time)
+        if n < 2:
+            return None
+        dt = (time[-1] - time[0]) / (n - 1)
+        if not dt > 0 or np.abs(np.diff(time) - dt).max() > cls.REGULAR_RTOL * dt:
+            return None
+        return cls(t0=float(time[0]), dt=float(dt), n=n)
+
+    def _position(self, t: float) -> float:
+        return (t - self.t0) / self.dt
+
+    def nearest(self, t: float) -> int:
+        """Index of the sample nearest t (the earlier one on a tie), clipped to the grid."""
+        return min(max(int(np.ceil(self._position(t) - 0.5)), 0), self.n - 1)
+
+    def first_at_or_after(self, t: float) -> int:
+        return min(max(int(np.ceil(self._position(t) - self.INDEX_TOL)), 0), self.n)
+
+    def last_at_or_before(self, t: float) -> int:
+        return min(max(int(np.floor(self._position(t) + self.INDEX_TOL)), -1), self.n - 1)
+
+    def window(self, t_start: float, t_end: float, include_end: bool = True) -> slice:
+        """Samples with t_start <= time <= t_end (time < t_end if not include_end); an empty slice if none."""
+        start = self.first_at_or_after(t_start)
+        stop = self.last_at_or_before(t_end) + 1 if include_end else self.first_at_or_after(t_end)
+        return slice(start, max(start, stop))
+
+
+def split_odd_even(matrix: RecordingMatrix) -> dict[str, RecordingMatrix]:
+    """{"even": rows 0, 2, 4..., "odd": rows 1, 3, 5...}, sweeps relabelled 0..n-1; voltage is a strided view, not a copy."""
+    parts = {}
+    for label, rows in (("even", slice(0, None, 2)), ("odd", slice(1, None, 2))):
+        voltage = matrix.voltage[rows]
+        parts[label] = RecordingMatrix.from_arrays(voltage, matrix.time, t0=matrix.t0[rows], datetime=matrix.datetime[rows])
+    return parts
+
+
+def split_at_time(matrix: RecordingMatrix, t_split: float) -> dict[str, RecordingMatrix]:
+    """
+    Cut every sweep at within-sweep time t_split: {"a": time < t_split, "b": time >= t_split}.
+    Part b's time grid is re-zeroed to start at 0 and its datetime moved to its first sample;
+    both voltages are column-range views, not copies.
+    """
+    k = int(np.searchsorted(matrix.time, t_split, side="left"))
+    time_b = matrix.time[k:]
+    a = RecordingMatrix.from_arrays(matrix.voltage[:, :k], matrix.time[:k], t0=matrix.t0, datetime=matrix.datetime, sweeps=matrix.sweeps)
+    datetime_b = matrix.datetime
+    if len(time_b):
+        datetime_b = matrix.datetime + np.timedelta64(int(round((time_b[0] - matrix.time[0]) * 1e9)), "ns")
+        time_b = np.round(time_b - time_b[0], 9)
+    b = RecordingMatrix.from_arrays(matrix.voltage[:, k:], time_b, t0=matrix.t0, datetime=datetime_b, sweeps=matrix.sweeps)
+    return {"a": a, "b": b}
+
+
+def concat(matrices: list[RecordingMatrix]) -> RecordingMatrix:
+    """Stack matrices sweep-wise (e.g. one per file of a folder); sweeps are relabelled 0..n-1."""
+    if not matrices:
+        raise ValueError("recording_matrix.concat: nothing to concatenate")
+    shapes = {m.n_samples for m in matrices}
+    if len(shapes) != 1:
+        raise ValueError(f"Inconsistent sweep lengths detected: {sorted(shapes)}")
+    grid = matrices[0].time
+    for m in matrices[1:]:
+        if not np.array_equal(m.time, grid):
+            raise ValueError("recording_matrix.concat: sweeps do not share the same time grid")
+    voltage = np.concatenate([m.voltage for m in matrices], axis=0)
+    return RecordingMatrix.from_arrays(
+        voltage,
+        grid,
+        t0=np.concatenate([m.t0 for m in matrices]),
+        datetime=np.concatenate([m.datetime for m in matrices]),
+    )
+
+
+BIN_REDUCERS = ("mean", "median", "trimmed_mean")
+
+
+def _reduce_bins(blocks: np.ndarray, reducer: str, trim: float) -> np.ndarray:
+    # blocks: (n_bins, sweeps_per_bin, ...) → (n_bins, ...), NaN-skipping like a pandas groupby
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns (e.g. unknown t0) reduce to NaN
+        if reducer == "trimmed_mean":
+            from scipy.stats import trim_mean
+
+            return trim_mean(blocks, trim, axis=1, nan_policy="omit")
+        return np.nanmean(blocks, axis=1) if reducer == "mean" else np.nanmedian(blocks, axis=1)
+
+
+def bin_rows(values: np.ndarray, bin_ids: np.ndarray, reducer: str = "mean", trim: float = 0.1) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce the rows of values (n_rows, ...) that share a bin id: returns (bins, reduced), with
+    reduced[k] the reducer over the rows of bins[k]. Rows must be grouped by non-decreasing bin_ids.
+
+    When every bin but the last has the same number of rows (consecutive sweeps into bins of
+    bin_size), the full bins are one (n_bins, bin_size, ...) reshape reduced along axis 1 and the
+    ragged final bin a second, small reduction; otherwise each bin is reduced in turn.
+    reducer: "mean", "median" or "trimmed_mean" (cutting trim of the rows at each end).
+    """
+    if reducer not in BIN_REDUCERS:
+        raise ValueError(f"bin_rows: reducer must be one of {BIN_REDUCERS}, got {reducer!r}")
+    if len(bin_ids) > 1 and (np.diff(bin_ids) < 0).any():
+        raise ValueError("bin_rows: rows are not grouped by non-decreasing bin id")
+    bins, starts, counts = np.unique(bin_ids, return_index=True, return_counts=True)
+    reduced = np.empty((len(bins),) + values.shape[1:], dtype=np.float64)
+    if len(bins) == 0:
+        return bins, reduced
+    size = counts[0]
+    if (counts[:-1] == size).all():
+        n_full = len(bins) if counts[-1] == size else len(bins) - 1
+        reduced[:n_full] = _reduce_bins(values[: n_full * size].reshape((n_full, size) + values.shape[1:]), reducer, trim)
+        if n_full < len(bins):
+            reduced[-1] = _reduce_bins(values[starts[-1] :][None], reducer, trim)[0]
+    else:
+        for k, (start, count) in enumerate(zip(starts, counts)):
+            reduced[k] = _reduce_bins(values[start : start + count][None], reducer, trim)[0]
+    return bins, reduced
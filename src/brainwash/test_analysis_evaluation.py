@@ -0,0 +1,46 @@
+"""Tests for the find_timepoints parameter sweep in analysis_evaluation."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import pytest
+
+import analysis_evaluation
+import analysis_v3 as analysis
+from parse import build_dfmean, source2dfs
+from test_pipeline_fixtures import abf_path_for_parse, make_default_dict_t
+
+_ABF_1CH_DIR = Path(__file__).parent / "test_data" / "A_21_P0701-S2"
+_ABF_1CH = abf_path_for_parse(_ABF_1CH_DIR, "2022_07_01_0012")
+
+
+def test_pareto_front_keeps_non_dominated_rows():
+    dfsweep = pd.DataFrame({"mae_epsp": [1.0, 2.0, 0.5, 1.0, float("nan")], "ms_per_signal": [1.0, 0.5, 3.0, 2.0, 0.1]})
+    assert analysis_evaluation.pareto_front(dfsweep).tolist() == [True, True, True, False, False]
+
+
+@pytest.mark.skipif(_ABF_1CH is None, reason=f"real ABF absent in {_ABF_1CH_DIR}")
+def test_sweep_find_timepoints_scores_a_self_labelled_corpus():
+    df_raw = next(iter(source2dfs(str(_ABF_1CH), gain=1.0).values()))
+    dfmean, i_stim = build_dfmean(df_raw)
+    signals = [dfmean.iloc[i_stim - 5 : i_stim + 200].reset_index(drop=True)[["time", "voltage"]]]
+    for sweep in (0, 1):
+        dfsweep = df_raw[df_raw["sweep"] == sweep].reset_index(drop=True)
+        signals.append(dfsweep.iloc[i_stim - 5 : i_stim + 200].reset_index(drop=True).rename(columns={"voltage_raw": "voltage"})[["time", "voltage"]])
+    default_dict_t = make_default_dict_t()
+    # Ground truth = what the current defaults detect, so the default row must score perfectly
+    meta = pd.DataFrame([analysis.find_timepoints(signal, default_dict_t) for signal in signals])
+    grid = {"stim_amp": [0.005], "epsp_slope_n_points": [5, 7], "volley_slope_search_fraction": [0.5, 1.0]}
+    dfsweep = analysis_evaluation.sweep_find_timepoints(signals, meta, grid=grid, default_dict_t=default_dict_t, n_jobs=1)
+    assert len(dfsweep) == 4 and dfsweep["is_default"].sum() == 1
+    default = dfsweep[dfsweep["is_default"]].iloc[0]
+    assert default["mae_epsp"] == 0 and default["mae_volley"] == 0 and default["epsp_off_1"] == 0
+    assert (dfsweep["failed"] == 0).all() and (dfsweep["ms_per_signal"] > 0).all()
+    front = analysis_evaluation.report_sweep(dfsweep)
+    assert front["ms_per_signal"].is_monotonic_increasing
+    fig = analysis_evaluation.plot_pareto(dfsweep)
+    assert len(fig.axes) == 2
+    plt.close(fig)
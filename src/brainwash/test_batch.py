@@ -0,0 +1,77 @@
+"""Tests for batch (headless project processing, no Qt)."""
+
+from __future__ import annotations
+
+import json
+import os
+import pickle
+import subprocess
+import sys
+from pathlib import Path
+
+import batch
+import pandas as pd
+import pytest
+
+from brainwash_ui import recording_cache
+from project_schema import df_projectTemplate, read_df_project
+from test_pipeline_fixtures import make_sweep_df
+from ui_state_classes import UIstate
+
+
+def test_batch_imports_neither_qt_nor_a_matplotlib_backend():
+    code = (
+        f"import sys; sys.path.insert(0, {str(Path(batch.__file__).parent)!r}); import batch; "
+        "print([m for m in sys.modules if m.startswith('PyQt5') or m.startswith('matplotlib.backends.backend_') or m == 'matplotlib.pyplot'])"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+@pytest.fixture
+def project_folder(tmp_path):
+    folder = tmp_path / "projects" / "P"
+    folder.mkdir(parents=True)
+    rows = []
+    for i in range(4):
+        source = tmp_path / f"s{i}.csv"
+        make_sweep_df(n_sweeps=6, step_size=0.001 * (i + 1)).to_csv(source, index=False)
+        rows.append({"path": str(source), "recording_name": f"rec{i}", "sweeps": "..."})
+    pd.concat([df_projectTemplate(), pd.DataFrame(rows)], ignore_index=True).to_csv(folder / "project.brainwash", index=False)
+    return folder
+
+
+def test_run_project_imports_detects_and_exports(project_folder):
+    assert batch.run_project(project_folder, version="test", n_jobs=1) == []
+    df_p = read_df_project(project_folder)
+    assert df_p["sweeps"].tolist() == [6] * 4 and df_p["stims"].tolist() == [1] * 4
+    cache = project_folder.parent / "cache test" / "P"
+    for rec in df_p["recording_name"]:
+        assert Path(recording_cache.timepoints_parquet_path(project_folder / "timepoints", rec)).exists()
+        assert Path(recording_cache.output_parquet_path(cache, rec, bin_active=False)).exists()
+    assert sorted(p.name for p in (project_folder.parent / "Export").iterdir()) == [f"rec{i}_output.csv" for i in range(4)]
+
+    # Groups, test sets and a t-test set up in the GUI afterwards; the next run only adds group means and statistics.
+    ids = df_p["ID"].tolist()
+    groups = {1: {"group_name": "A", "show": True, "rec_IDs": ids[:2]}, 2: {"group_name": "B", "show": True, "rec_IDs": ids[2:]}}
+    with open(project_folder / "groups.pkl", "wb") as f:
+        pickle.dump(groups, f)
+    with open(project_folder / "test_sets.pkl", "wb") as f:
+        pickle.dump({1: {"set_name": "all", "show": True, "sweeps": list(range(6))}}, f)
+    uistate = UIstate()
+    uistate.stat_test.test_type = "t-test"
+    uistate.stat_test.buttonGroup_test_n = "recording"
+    uistate.save_cfg(project_folder, "test")
+    path_t = Path(recording_cache.timepoints_parquet_path(project_folder / "timepoints", "rec0"))
+    mtime = os.path.getmtime(path_t)
+    export = project_folder.parent / "nightly"
+    assert batch.run_project(project_folder, version="test", export_folder=export, n_jobs=1) == []
+    assert os.path.getmtime(path_t) == mtime
+
+    group_mean = pd.read_parquet(recording_cache.group_mean_parquet_path(cache, 1))
+    exported = pd.read_csv(export / "P_group_means.csv")
+    assert exported["group_name"].unique().tolist() == ["A", "B"]
+    assert exported.loc[exported["group_name"] == "A", "EPSP_amp_mean"].tolist() == pytest.approx((group_mean["EPSP_amp_mean"] * 1000).tolist())
+    with open(export / "P_statistics.json") as f:
+        statistics = json.load(f)
+    assert statistics[0]["config"]["type"] == "t-test" and statistics[0]["n1"] == 2 and statistics[0]["n2"] == 2
@@ -0,0 +1,98 @@
+"""Tests for brainwash_ui.data_parquet (compact data parquet layout)."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from brainwash_ui import data_parquet, live_import
+from recording_matrix import RecordingMatrix
+
+
+def _long_df(n_sweeps=3, n_samples=50, dt=1e-4):
+    time = np.arange(n_samples) * dt
+    t0 = np.arange(n_sweeps) * 10.0
+    starts = pd.Timestamp("2024-01-01") + pd.to_timedelta(t0, unit="s")
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "sweep": np.repeat(np.arange(n_sweeps), n_samples),
+            "time": np.tile(time, n_sweeps),
+            "voltage_raw": rng.normal(0, 1e-4, n_sweeps * n_samples).astype(np.float32),
+            "t0": np.repeat(t0, n_samples),
+            "datetime": np.repeat(starts, n_samples) + pd.to_timedelta(np.tile(time, n_sweeps), unit="s"),
+        }
+    )
+
+
+def test_round_trip_is_compact_and_lossless(tmp_path):
+    df = _long_df()
+    path = tmp_path / "rec.parquet"
+    assert data_parquet.write_df(path, df)
+    assert pq.read_schema(path).names == ["voltage_raw"]
+    pd.testing.assert_frame_equal(data_parquet.read_df(path), df)
+
+
+def test_irregular_time_grid_and_missing_timestamps_kept(tmp_path):
+    df = _long_df(n_samples=4)
+    df["time"] = np.tile([0.0, 0.001, 0.0025, 0.004], 3)  # not reproducible from a sampling rate
+    df["t0"] = np.nan
+    df.loc[df["sweep"] == 1, "datetime"] = pd.NaT
+    path = tmp_path / "rec.parquet"
+    assert data_parquet.write_df(path, df)
+    back = data_parquet.read_df(path)
+    np.testing.assert_array_equal(back["time"], df["time"])
+    assert back["t0"].isna().all()
+    assert back.loc[back["sweep"] == 1, "datetime"].isna().all()
+    assert back.loc[back["sweep"] != 1, "datetime"].notna().all()
+
+
+def test_float32_option(tmp_path):
+    df = _long_df()
+    df["voltage_raw"] = df["voltage_raw"].astype(np.float64) + 1e-9
+    path = tmp_path / "rec.parquet"
+    data_parquet.write_df(path, df, float32=True)
+    back = data_parquet.read_df(path)
+    assert back["voltage_raw"].dtype == np.float32
+    np.testing.assert_allclose(back["voltage_raw"], df["voltage_raw"], rtol=1e-7)
+
+
+def test_ragged_or_annotated_frames_stay_long(tmp_path):
+    ragged = _long_df().iloc[:-1]
+    annotated = _long_df().assign(annotation="x")
+    for i, df in enumerate((ragged, annotated)):
+        path = tmp_path / f"rec{i}.parquet"
+        assert not data_parquet.write_df(path, df)
+        assert not data_parquet.is_compact(path)
+        pd.testing.assert_frame_equal(data_parquet.read_df(path), df.reset_index(drop=True))
+
+
+def test_read_matrix_and_sweep_datetimes_match_for_both_layouts(tmp_path):
+    df = _long_df()
+    compact, long = tmp_path / "compact.parquet", tmp_path / "long.parquet"
+    data_parquet.write_df(compact, df)
+    df.to_parquet(long, index=False)
+    np.testing.assert_array_equal(data_parquet.read_matrix(compact).voltage, data_parquet.read_matrix(long).voltage)
+    pd.testing.assert_frame_equal(data_parquet.read_sweep_datetimes(compact), data_parquet.read_sweep_datetimes(long))
+
+
+def test_live_import_dataset_reads_as_long(tmp_path):
+    dataset = tmp_path / "rec.parquet"
+    df = _long_df()
+    live_import.append_part(dataset, df[df["sweep"] < 2])
+    live_import.append_part(dataset, df[df["sweep"] == 2])
+    assert not data_parquet.is_compact(dataset)
+    pd.testing.assert_frame_equal(data_parquet.read_df(dataset), df)
+
+
+def test_compact_dataset_parts_read_as_one_recording(tmp_path):
+    dataset = tmp_path / "rec.parquet"
+    matrix = RecordingMatrix.from_long(_long_df())
+    for sweeps in ([0, 1], [2]):
+        part = RecordingMatrix.from_arrays(matrix.voltage[sweeps], matrix.time, t0=matrix.t0[sweeps], datetime=matrix.datetime[sweeps], sweeps=sweeps)
+        live_import.append_part(dataset, part)
+    assert data_parquet.is_compact(dataset)
+    np.testing.assert_array_equal(data_parquet.read_matrix(dataset).voltage, matrix.voltage)
+    pd.testing.assert_frame_equal(data_parquet.read_df(dataset), matrix.to_long())
+    pd.testing.assert_frame_equal(data_parquet.read_sweep_datetimes(dataset), pd.DataFrame({"sweep": matrix.sweeps, "datetime": matrix.datetime}))
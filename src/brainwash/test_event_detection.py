@@ -0,0 +1,48 @@
+"""Tests for brainwash_ui.event_detection (batch event detection, no Qt)."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from parse import build_dfmean
+
+from brainwash_ui import event_detection, recording_cache, recording_pipeline
+from test_pipeline_fixtures import make_default_dict_t, make_sweep_df
+
+_KWARGS = {"default_dict_t": make_default_dict_t(), "norm_output_from": 0, "norm_output_to": 10}
+
+
+def test_detect_recordings_matches_build_dft(tmp_path):
+    dfmean, _ = build_dfmean(make_sweep_df())
+    path = recording_cache.mean_parquet_path(str(tmp_path), "rec")
+    dfmean.to_parquet(path)
+    jobs = [(dfmean, "voltage"), (path, "voltage"), (tmp_path / "missing.parquet", "voltage")]
+    out = {i: (dft, err) for i, dft, err in event_detection.detect_recordings(jobs, n_jobs=1, **_KWARGS)}
+    expected = recording_pipeline.build_dft(dfmean, filter="voltage", **_KWARGS)
+    pd.testing.assert_frame_equal(out[0][0], expected)
+    pd.testing.assert_frame_equal(out[1][0], expected)
+    assert out[0][1] is None and out[1][1] is None
+    assert out[2][0] is None and out[2][1].startswith("FileNotFoundError")
+
+
+def test_write_timepoints_is_all_or_nothing(tmp_path):
+    dft = pd.DataFrame({"stim": [1], "t_stim": [0.01]})
+    event_detection.write_timepoints(tmp_path, {"a": dft, "b": dft})
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.parquet", "b.parquet"]
+    with pytest.raises(AttributeError):
+        event_detection.write_timepoints(tmp_path, {"a": dft.assign(t_stim=0.02), "b": None})
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.parquet", "b.parquet"]
+    assert pd.read_parquet(tmp_path / "a.parquet")["t_stim"].iloc[0] == 0.01
+
+
+def test_write_timepoints_removes_a_partly_written_tmp(tmp_path, monkeypatch):
+    def broken_to_parquet(self, path, **kwargs):
+        Path(path).write_bytes(b"PAR1")  # the write dies halfway through the file
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", broken_to_parquet)
+    with pytest.raises(OSError):
+        event_detection.write_timepoints(tmp_path, {"a": pd.DataFrame({"stim": [1], "t_stim": [0.01]})})
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,145 @@
+"""Tests for brainwash_ui.live_import (watch-folder import) and analysis_v3.append_dfoutput."""
+
+from __future__ import annotations
+
+import os
+
+import analysis_v3 as analysis
+import numpy as np
+import pandas as pd
+import parse
+import pytest
+
+from brainwash_ui import data_parquet, live_import, recording_cache
+from test_parse import _write_synthetic_ibw
+
+_N_SAMPLES = 300
+_DT = 1e-4
+
+
+def _sweep(i, seed=0):
+    # Stim artifact at sample 100, then a negative-going EPSP whose size varies per sweep.
+    rng = np.random.default_rng(seed + i)
+    t = np.arange(_N_SAMPLES) * _DT
+    v = rng.normal(0, 2e-5, _N_SAMPLES)
+    v[100:103] += [2e-3, 4e-3, 1e-3]
+    v[110:] -= (1 + 0.05 * i) * 1e-3 * (1 - np.exp(-(t[110:] - t[110]) / 2e-3))
+    return v
+
+
+def _write_sweeps(folder, start, n, settled=True):
+    folder.mkdir(exist_ok=True)
+    for i in range(start, start + n):
+        path = _write_synthetic_ibw(folder / f"sweep_{i:04d}.ibw", _sweep(i), dt=_DT, creation_date=3_700_000_000 + 10 * i)
+        if settled:
+            mtime = path.stat().st_mtime - 2 * live_import.SETTLE_SECONDS
+            os.utime(path, (mtime, mtime))
+
+
+def _dft():
+    # Two stims over the same waveform, so stim-mode rows are produced too.
+    row = {
+        "t_stim": 0.0101,
+        "t_EPSP_amp": 0.02,
+        "t_EPSP_amp_halfwidth": 0.0,
+        "t_EPSP_slope_start": 0.0115,
+        "t_EPSP_slope_end": 0.0135,
+        "t_volley_amp": np.nan,
+        "t_volley_slope_start": np.nan,
+        "t_volley_slope_end": np.nan,
+        "norm_output_from": 0,
+        "norm_output_to": 2,
+    }
+    return pd.DataFrame([{"stim": 1, **row}, {"stim": 2, **row}])
+
+
+def _live(tmp_path, **kwargs):
+    return live_import.LiveRecording(tmp_path / "acq", "live", data_folder=tmp_path / "data", cache_folder=tmp_path / "cache", **kwargs)
+
+
+def test_append_part_builds_readable_dataset(tmp_path):
+    dataset = tmp_path / "rec.parquet"
+    live_import.append_part(dataset, pd.DataFrame({"sweep": [0, 0], "voltage": [1.0, 2.0]}))
+    live_import.append_part(dataset, pd.DataFrame({"sweep": [1, 1], "voltage": [3.0, 4.0]}))
+    assert [p.name for p in data_parquet.part_paths(dataset)] == ["part-00000.parquet", "part-00001.parquet"]
+    assert pd.read_parquet(dataset)["voltage"].tolist() == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_append_part_refuses_single_file(tmp_path):
+    path = tmp_path / "rec.parquet"
+    pd.DataFrame({"a": [1]}).to_parquet(path)
+    with pytest.raises(ValueError):
+        live_import.append_part(path, pd.DataFrame({"a": [2]}))
+
+
+def test_poll_waits_for_files_to_settle(tmp_path):
+    _write_sweeps(tmp_path / "acq", 0, 2, settled=False)
+    live = _live(tmp_path)
+    assert live.poll() == []  # sizes recorded, not yet known to be stable
+    assert len(live.poll()) == 2
+
+
+def test_incremental_import_matches_full_import(tmp_path):
+    live = _live(tmp_path)
+    _write_sweeps(tmp_path / "acq", 0, 3)
+    assert live.update() == 3
+    assert live.update() == 0
+    _write_sweeps(tmp_path / "acq", 3, 4)
+    assert live.update() == 4
+
+    df_full = parse.source2dfs(str(tmp_path / "acq"))[0]
+    data_path = recording_cache.data_parquet_path(tmp_path / "data", "live")
+    assert len(data_parquet.part_paths(data_path)) == 2 and data_parquet.is_compact(data_path)
+    assert data_parquet.read_matrix(data_path).voltage.shape == (7, _N_SAMPLES)
+    df_live = data_parquet.read_df(data_path)
+    for col in ("sweep", "time", "voltage_raw", "t0"):
+        np.testing.assert_array_equal(df_live[col].to_numpy(), df_full[col].to_numpy())
+    assert (df_live["datetime"] - df_full["datetime"]).abs().max() <= pd.Timedelta(1, "us")
+
+    pd.testing.assert_frame_equal(data_parquet.read_sweep_datetimes(data_path), df_full.groupby("sweep", as_index=False)["datetime"].first())
+
+    dfmean_full, i_stim = parse.build_dfmean(df_full)
+    assert live.i_stim == i_stim
+    np.testing.assert_allclose(live.dfmean[["voltage", "prim", "bis"]].to_numpy(), dfmean_full[["voltage", "prim", "bis"]].to_numpy(), atol=1e-9)
+    dffilter_full = parse.zeroSweeps(df_full, i_stim=i_stim)
+    np.testing.assert_allclose(live.dffilter["voltage"].to_numpy(), dffilter_full["voltage"].to_numpy(), atol=1e-9)
+    dffilter_disk = pd.read_parquet(recording_cache.filter_parquet_path(tmp_path / "cache", "live"))
+    assert list(dffilter_disk.columns) == list(dffilter_full.columns)
+    assert len(dffilter_disk) == 7 * _N_SAMPLES
+    assert live.metadata() == {"nsweeps": 7, "sweep_duration": 0.03, "sampling_rate": 10000, "sweep_hz": 0.1}
+
+
+def test_dffilter_batches_are_joined_on_read(tmp_path):
+    live = _live(tmp_path, persist=False)
+    _write_sweeps(tmp_path / "acq", 0, 2)
+    live.update()
+    _write_sweeps(tmp_path / "acq", 2, 3)
+    live.update()
+    assert len(live._dffilter_parts) == 2  # appending did not copy the first batch
+    assert live.dffilter["sweep"].unique().tolist() == [0, 1, 2, 3, 4]
+    assert live.dffilter is live.dffilter
+
+
+def test_update_extends_dfoutput(tmp_path):
+    live = _live(tmp_path, persist=False)
+    dft = _dft()
+    _write_sweeps(tmp_path / "acq", 0, 3)
+    live.update(dft=dft)
+    first = live.dfoutput
+    _write_sweeps(tmp_path / "acq", 3, 2)
+    live.update(dft=dft, dfoutput=first)
+    expected = analysis.build_dfoutput(live.dffilter, live.dfmean, dft)
+    pd.testing.assert_frame_equal(live.dfoutput, expected, check_dtype=False)
+    assert not (tmp_path / "data").exists()
+
+
+def test_append_dfoutput_matches_build_dfoutput(tmp_path):
+    _write_sweeps(tmp_path / "acq", 0, 6)
+    df_raw = parse.source2dfs(str(tmp_path / "acq"))[0]
+    dfmean, i_stim = parse.build_dfmean(df_raw)
+    dffilter = parse.zeroSweeps(df_raw, i_stim=i_stim)
+    dft = _dft()
+    head = dffilter[dffilter["sweep"] < 4]
+    tail = dffilter[dffilter["sweep"] >= 4]
+    appended = analysis.append_dfoutput(analysis.build_dfoutput(head, dfmean, dft), tail, dfmean, dft)
+    pd.testing.assert_frame_equal(appended, analysis.build_dfoutput(dffilter, dfmean, dft), check_dtype=False)
@@ -7,10 +7,14 @@
 #   - zeroSweeps                    (pure logic, synthetic data)
 #   - persistdf                     (I/O, temp directory)
 #   - source2dfs                    (file I/O — skipped when real ABFs are absent)
+#   - sort_sweeps_by_datetime       (pure logic, synthetic data)
 #   - source2dfs split_odd_even     (pure logic, synthetic CSV)
 #   - source2dfs split_at_time      (pure logic, synthetic CSV)
+#   - split grid path vs fallback and peak memory, source2matrices split views (synthetic CSV)
 #   - sources2dfs                   (file I/O — skipped when real ABFs are absent)
 #   - parse_abf / folder            (file I/O — skipped when real ABFs are absent)
+#   - probe_source / probe_sources  (header-only metadata; synthetic IBW/ATF/CSV, real ABF when present)
+#   - parse_csv / parse_csvFolder   (Arrow CSV reader, pandas fallback; synthetic CSV)
 #
 # Real test-data ABF files are not committed to the repo. Place them at:
 #   src/brainwash/test_data/A_21_P0701-S2/2022_07_01_0012.abf  (1-channel)
@@ -19,12 +23,16 @@
 
 import os
 import shutil
+import struct
 import tempfile
+import tracemalloc
 import unittest
 from pathlib import Path
+from unittest import mock
 
 import numpy as np
 import pandas as pd
+import parse
 from parse import (
     _BW_CSV_SWEEP_COLS,
     build_dfmean,
@@ -37,7 +45,10 @@ from parse import (
     parse_atfFolder,
     parse_csv,
     parse_csvFolder,
+    parse_ibw,
     persistdf,
+    probe_source,
+    probe_sources,
     sample_atf,
     source2dfs,
     sources2dfs,
@@ -120,6 +131,23 @@ def _write_synthetic_atf(
     return path
 
 
+def _write_synthetic_ibw(path: Path, voltage, dt: float = 1e-4, creation_date: int = 3_700_000_000) -> Path:
+    """
+    Write a minimal Igor binary wave (version 5, little-endian, float32) holding one sweep.
+    creation_date is in Igor seconds (since 1904-01-01, as stored by Igor).
+    """
+    data = np.asarray(voltage, dtype="<f4").tobytes()
+    n = len(voltage)
+    # WaveHeader5 up to sfA: next, creationDate, modDate, npnts, type (2 = float32), dLock, whpad1,
+    # whVersion, bname, whpad2, dFolder, nDim[4], sfA[4]; the rest of the 320-byte header is zero.
+    wave_header = struct.pack("<IIIihh6sh32siI4i4d", 0, creation_date, creation_date, n, 2, 0, b"", 1, b"wave0", 0, 0, n, 0, 0, 0, dt, 0, 0, 0)
+    # BinHeader5: version, checksum, wfmSize, formulaSize, noteSize, dataEUnitsSize, dimEUnitsSize[4],
+    # dimLabelsSize[4], sIndicesSize, optionsSize1, optionsSize2
+    bin_header = struct.pack("<hhllll4l4llll", 5, 0, 320 + len(data), 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+    Path(path).write_bytes(bin_header + wave_header.ljust(320, b"\0") + data)
+    return Path(path)
+
+
 # ---------------------------------------------------------------------------
 # Shared helpers
 # ---------------------------------------------------------------------------
@@ -297,6 +325,21 @@ class TestBuildDfmean(unittest.TestCase):
         n_unique_times = self.df["time"].nunique()
         self.assertEqual(len(dfmean), n_unique_times)
 
+    def test_reshape_path_matches_pivot_table(self):
+        """The regular-grid reshape path gives the same mean as the pivot_table reference."""
+        df = self.df.copy()
+        df["voltage_raw"] += np.random.default_rng(0).normal(0, 1e-5, len(df))
+        dfmean, i_stim = build_dfmean(df.sample(frac=1, random_state=0))
+        ref = pd.pivot_table(df, values="voltage_raw", index="sweep", columns="time", aggfunc="mean").mean().to_numpy()
+        ref = ref - ref[i_stim - 20 : i_stim - 10].mean()
+        np.testing.assert_allclose(dfmean["voltage"].to_numpy(), ref, atol=1e-15)
+
+    def test_ragged_sweeps_fall_back_to_pivot(self):
+        """A truncated last sweep still yields one row per unique time point."""
+        df = self.df.iloc[:-3]
+        dfmean, _ = build_dfmean(df)
+        self.assertEqual(len(dfmean), df["time"].nunique())
+
 
 # ---------------------------------------------------------------------------
 # Tests: zeroSweeps
@@ -339,6 +382,24 @@ class TestZeroSweeps(unittest.TestCase):
         zeroSweeps(self.df, i_stim=self.stim_index)
         self.assertAlmostEqual(self.df["voltage_raw"].sum(), original_col_sum)
 
+    def test_row_order_and_columns_preserved_for_shuffled_input(self):
+        """The reshape path writes voltage back in the caller's row order."""
+        df = self.df.copy()
+        df["voltage_raw"] += df["sweep"] * 0.01
+        shuffled = df.sample(frac=1, random_state=0)
+        df_zeroed = zeroSweeps(shuffled, i_stim=self.stim_index)
+        self.assertEqual(list(df_zeroed.columns), ["sweep", "time", "t0", "datetime", "voltage"])
+        np.testing.assert_array_equal(df_zeroed["time"].to_numpy(), shuffled["time"].to_numpy())
+        expected = np.where(shuffled["time"].to_numpy() >= self.stim_index * 0.001, 0.001, 0.0)
+        np.testing.assert_allclose(df_zeroed["voltage"].to_numpy(), expected, atol=1e-12)
+
+    def test_ragged_sweeps_fall_back_to_pivot(self):
+        """Sweeps of unequal length are zeroed via the pivot path without losing rows."""
+        df = self.df.iloc[:-3]
+        df_zeroed = zeroSweeps(df, i_stim=self.stim_index)
+        self.assertEqual(len(df_zeroed), len(df))
+        self.assertAlmostEqual(df_zeroed["voltage"].abs().max(), 0.001, places=9)
+
 
 # ---------------------------------------------------------------------------
 # Tests: persistdf
@@ -508,6 +569,48 @@ class TestParseAbf(unittest.TestCase):
         self.assertGreater(len(df), 0)
 
 
+# ---------------------------------------------------------------------------
+# Tests: sort_sweeps_by_datetime  (pure logic, synthetic parser-shaped data)
+# ---------------------------------------------------------------------------
+
+
+def _unsorted_sweeps_df(n_sweeps=12, n_timepoints=7, seed=0):
+    """parse_abf-shaped df (no sweep column, sweeps start at time == 0) with shuffled sweep start datetimes."""
+    rng = np.random.default_rng(seed)
+    starts = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.permutation(n_sweeps) * 10, unit="s")
+    times = np.round(np.arange(n_timepoints) * 0.001, 6)
+    return pd.DataFrame(
+        {
+            "time": np.tile(times, n_sweeps),
+            "voltage_raw": np.arange(n_sweeps * n_timepoints, dtype=float),
+            "datetime": np.repeat(starts, n_timepoints) + pd.to_timedelta(np.tile(times, n_sweeps), unit="s"),
+            "channel": 0,
+        }
+    )
+
+
+class TestSortSweepsByDatetime(unittest.TestCase):
+    def test_matches_per_sweep_reference(self):
+        df = _unsorted_sweeps_df()
+        groups = (df["time"] == 0).cumsum()
+        order = df.groupby(groups)["datetime"].first().sort_values(kind="stable").index
+        expected = pd.concat([df[groups == g] for g in order]).reset_index(drop=True)
+        pd.testing.assert_frame_equal(parse.sort_sweeps_by_datetime(df), expected)
+
+    def test_sorted_input_returned_unchanged(self):
+        df = parse.sort_sweeps_by_datetime(_unsorted_sweeps_df())
+        self.assertIs(parse.sort_sweeps_by_datetime(df), df)
+
+    def test_leading_partial_sweep_kept_as_block(self):
+        df = _unsorted_sweeps_df(n_sweeps=4)
+        df = pd.concat([df.iloc[[3]], df], ignore_index=True)  # leading rows before the first time == 0
+        df.loc[0, "datetime"] = pd.Timestamp("2030-01-01")
+        result = parse.sort_sweeps_by_datetime(df)
+        self.assertEqual(len(result), len(df))
+        self.assertEqual(result["datetime"].iloc[-1], pd.Timestamp("2030-01-01"))
+        self.assertTrue(result.groupby((result["time"] == 0).cumsum())["datetime"].first().is_monotonic_increasing)
+
+
 # ---------------------------------------------------------------------------
 # Helpers for split tests: write a synthetic pre-parsed CSV that source2dfs
 # accepts via parse_csv (the 'sweep' column fast-path) so we can exercise the
@@ -745,6 +848,89 @@ class TestSource2dfsSplitAtTime(unittest.TestCase):
         self.assertTrue(combined["voltage_raw"].equals(df_plain["voltage_raw"]))
 
 
+# ---------------------------------------------------------------------------
+# Tests: splitting on the sweep grid vs the per-sweep fallback, and matrix views
+# ---------------------------------------------------------------------------
+
+
+class TestSplitGridPath(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.csv_path = Path(self._tmpdir.name) / "rec.csv"
+        _write_synthetic_csv(self.csv_path, n_sweeps=7, n_timepoints=20)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _assert_grid_matches_fallback(self, **split):
+        grid = source2dfs(str(self.csv_path), **split)
+        with mock.patch.object(parse, "_sweep_matrix", return_value=None):
+            fallback = source2dfs(str(self.csv_path), **split)
+        self.assertEqual(list(grid), list(fallback))
+        for key in grid:
+            pd.testing.assert_frame_equal(grid[key], fallback[key])
+
+    def test_odd_even_matches_fallback(self):
+        self._assert_grid_matches_fallback(split_odd_even=True)
+
+    def test_split_at_time_matches_fallback(self):
+        self._assert_grid_matches_fallback(split_at_time=0.0075)
+
+    def test_split_at_time_beyond_last_sample_matches_fallback(self):
+        self._assert_grid_matches_fallback(split_at_time=1.0)
+
+    def test_matrix_split_parts_are_views(self):
+        for split, labels in (({"split_odd_even": True}, ("even", "odd")), ({"split_at_time": 0.0075}, ("a", "b"))):
+            parts = parse.source2matrices(str(self.csv_path), **split)
+            first, second = (parts[(0, label)].voltage for label in labels)
+            self.assertFalse(first.flags["OWNDATA"])
+            self.assertIs(first.base, second.base)
+
+    def test_matrix_split_matches_source2dfs(self):
+        for split in ({"split_odd_even": True}, {"split_at_time": 0.0075}):
+            dfs = source2dfs(str(self.csv_path), **split)
+            matrices = parse.source2matrices(str(self.csv_path), **split)
+            self.assertEqual(set(dfs), set(matrices))
+            for key, df in dfs.items():
+                long = matrices[key].to_long()
+                for col in ("sweep", "time", "voltage_raw", "t0"):
+                    np.testing.assert_array_equal(long[col].to_numpy(), df[col].to_numpy())
+
+    def test_split_does_not_hold_source_and_parts_at_once(self):
+        n_sweeps, n_samples = 200, 2000
+        time_grid = np.round(np.arange(n_samples) * 1e-4, 6)
+        source_bytes = {}
+
+        def parse_csv(source):
+            # Built inside the mock so that source2dfs holds the only reference to the source df.
+            df = pd.DataFrame(
+                {
+                    "sweep": np.repeat(np.arange(n_sweeps), n_samples),
+                    "time": np.tile(time_grid, n_sweeps),
+                    "voltage_raw": np.random.default_rng(0).random(n_sweeps * n_samples).astype(np.float32),
+                    "t0": np.repeat(np.arange(n_sweeps) * 1.0, n_samples),
+                }
+            )
+            df["datetime"] = pd.Timestamp("2024-01-01") + pd.to_timedelta(df["t0"] + df["time"], unit="s")
+            source_bytes["n"] = int(df.memory_usage().sum())
+            tracemalloc.reset_peak()
+            source_bytes["traced"] = tracemalloc.get_traced_memory()[0]
+            return {0: df}
+
+        for split in ({"split_odd_even": True}, {"split_at_time": 0.1}):
+            tracemalloc.start()
+            try:
+                with mock.patch.object(parse, "parse_csv", side_effect=parse_csv):
+                    parts = source2dfs(str(self.csv_path), **split)
+                peak = tracemalloc.get_traced_memory()[1] - source_bytes["traced"]
+            finally:
+                tracemalloc.stop()
+            self.assertEqual(sum(len(df) for df in parts.values()), n_sweeps * n_samples)
+            # The parts replace the source rather than being built next to it (a copy of both halves
+            # next to the source would peak above its full size).
+            self.assertLess(peak, 0.75 * source_bytes["n"])
+
+
 # ---------------------------------------------------------------------------
 # CSV schema detection
 # ---------------------------------------------------------------------------
@@ -861,6 +1047,37 @@ class TestParseCsv(unittest.TestCase):
         with self.assertRaises(ValueError):
             parse_csv(p)
 
+    def test_column_types(self):
+        p = Path(self.tmpdir) / "rec.csv"
+        _write_sweep_csv(p)
+        df = parse_csv(p)[0]
+        self.assertEqual(df["sweep"].dtype, np.int64)
+        self.assertEqual(df["voltage_raw"].dtype, np.float64)
+        self.assertEqual(df["datetime"].dtype, "datetime64[ns]")
+
+    def test_empty_and_nat_datetimes_are_null(self):
+        p = Path(self.tmpdir) / "rec.csv"
+        _write_sweep_csv(p, n_sweeps=2, n_timepoints=2)
+        df_raw = pd.read_csv(p)
+        df_raw["datetime"] = df_raw["datetime"].astype(object)
+        df_raw.loc[0, "datetime"] = "NaT"
+        df_raw.loc[1, "datetime"] = None
+        df_raw.to_csv(p, index=False)
+        df = parse_csv(p)[0]
+        self.assertTrue(df["datetime"].iloc[:2].isna().all())
+        self.assertFalse(df["datetime"].iloc[2:].isna().any())
+
+    def test_unparseable_datetime_falls_back_to_pandas(self):
+        p = Path(self.tmpdir) / "rec.csv"
+        _write_sweep_csv(p, n_sweeps=2, n_timepoints=2)
+        df_raw = pd.read_csv(p)
+        df_raw["datetime"] = df_raw["datetime"].astype(object)
+        df_raw.loc[0, "datetime"] = "not a date"
+        df_raw.to_csv(p, index=False)
+        df = parse_csv(p)[0]
+        self.assertTrue(pd.isna(df["datetime"].iloc[0]))
+        self.assertEqual(len(df), 4)
+
     def test_source2dfs_accepts_csv(self):
         """source2dfs should return the same {0: df} result for a sweep CSV."""
         p = Path(self.tmpdir) / "rec.csv"
@@ -1169,6 +1386,72 @@ class TestCsvRoundTrip(unittest.TestCase):
             self.assertAlmostEqual(vals[0], float(sw))
 
 
+# ---------------------------------------------------------------------------
+# Header-only probing
+# ---------------------------------------------------------------------------
+
+
+class TestProbeSource(unittest.TestCase):
+    _KEYS = ("channel_count", "sweep_count", "sample_rate", "sweep_duration", "start_time")
+
+    def setUp(self):
+        self.tmpdir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_ibw_file_matches_parse(self):
+        path = _write_synthetic_ibw(self.tmpdir / "w.ibw", np.linspace(0, 1e-3, 250), dt=1e-4)
+        meta = probe_source(path)
+        self.assertEqual(tuple(meta), self._KEYS)
+        df = parse_ibw(path)
+        self.assertEqual(meta["sample_rate"], 10000)
+        self.assertAlmostEqual(meta["sweep_duration"], 0.025)
+        self.assertEqual(meta["sweep_count"], 1)
+        self.assertEqual(meta["start_time"], df["datetime"].iloc[0])
+
+    def test_ibw_folder_counts_files_and_takes_earliest_start(self):
+        for i, stamp in enumerate((3_700_000_020, 3_700_000_000, 3_700_000_010)):
+            _write_synthetic_ibw(self.tmpdir / f"w{i}.ibw", np.zeros(100), creation_date=stamp)
+        meta = probe_source(self.tmpdir)
+        self.assertEqual(meta["sweep_count"], 3)
+        self.assertEqual(meta["start_time"], source2dfs(self.tmpdir)[0]["datetime"].iloc[0])
+
+    def test_atf_matches_full_load(self):
+        path = _write_synthetic_atf(self.tmpdir / "a.atf", n_sweeps=5, n_timepoints=100, n_channels=2)
+        meta = probe_source(path)
+        self.assertEqual((meta["channel_count"], meta["sweep_count"], meta["sample_rate"]), (2, 5, 10000))
+        self.assertAlmostEqual(meta["sweep_duration"], 0.01)
+        self.assertIsNone(meta["start_time"])
+
+    def test_csv_reads_first_sweep_and_last_line(self):
+        path = self.tmpdir / "s.csv"
+        _write_sweep_csv(path, n_sweeps=7, n_timepoints=20)
+        meta = probe_source(path)
+        self.assertEqual((meta["channel_count"], meta["sweep_count"], meta["sample_rate"]), (1, 7, 1000))
+        self.assertAlmostEqual(meta["sweep_duration"], 0.02)
+        self.assertEqual(meta["start_time"], pd.Timestamp("2024-01-01"))
+
+    def test_probe_sources_returns_none_for_unreadable(self):
+        good = _write_synthetic_ibw(self.tmpdir / "w.ibw", np.zeros(10))
+        bad = self.tmpdir / "notes.txt"
+        bad.write_text("hello")
+        metas = probe_sources([str(good), str(bad)])
+        self.assertEqual(metas[0]["sweep_count"], 1)
+        self.assertIsNone(metas[1])
+
+    @_skip_no_2ch
+    def test_abf_matches_parsed_metadata(self):
+        meta = probe_source(_ABF_2CH)
+        dict_dfs = source2dfs(_ABF_2CH)
+        parsed = metadata(dict_dfs[0])
+        self.assertEqual(meta["channel_count"], len(dict_dfs))
+        self.assertEqual(meta["sweep_count"], parsed["nsweeps"])
+        self.assertEqual(meta["sample_rate"], parsed["sampling_rate"])
+        self.assertAlmostEqual(meta["sweep_duration"], parsed["sweep_duration"])
+        self.assertEqual(meta["start_time"], dict_dfs[0]["datetime"].iloc[0])
+
+
 # ---------------------------------------------------------------------------
 
 if __name__ == "__main__":
@@ -6,11 +6,12 @@ import os
 import tempfile
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pytest
 
 import analysis_v3 as analysis
-from brainwash_ui import plot_stim
+from brainwash_ui import plot_stim, recording_pipeline
 from parse import build_dfmean, source2dfs, zeroSweeps
 from test_pipeline_fixtures import (
     abf_path_for_parse,
@@ -167,4 +168,217 @@ def test_data_source_01_pipeline_build_dfoutput():
     assert dft is not None and not dft.empty
     dfoutput = analysis.build_dfoutput(dffilter=dffilter, dfmean=dfmean, dft=dft)
     assert len(dfoutput) == 1080
-    assert "EPSP_amp" in dfoutput.columns
\ No newline at end of file
+    assert "EPSP_amp" in dfoutput.columns
+
+
+def _pipeline_inputs():
+    df_raw = make_sweep_df(n_sweeps=4, n_timepoints=200, dt=0.0001, stim_index=60)
+    df_raw["voltage_raw"] += df_raw["sweep"] * 1e-4 - (df_raw["time"] > 0.008) * df_raw["time"] * 0.05
+    dfmean, i_stim = build_dfmean(df_raw)
+    dffilter = zeroSweeps(df_raw, i_stim=i_stim)
+    dft = pd.DataFrame(
+        [
+            {
+                "stim": 1,
+                "t_stim": 0.006,
+                "t_EPSP_amp": 0.0115,
+                "t_EPSP_amp_halfwidth": 0.0003,
+                "t_EPSP_slope_start": 0.0110,
+                "t_EPSP_slope_end": 0.0130,
+                "t_volley_amp": 0.0075,
+                "t_volley_slope_start": 0.0070,
+                "t_volley_slope_end": 0.0080,
+                "norm_output_from": 0,
+                "norm_output_to": 1,
+            }
+        ]
+    )
+    return dffilter, dfmean, dft
+
+
+def test_build_dfoutput_accumulated_time_matches_exact_grid():
+    dffilter, dfmean, dft = _pipeline_inputs()
+    expected = analysis.build_dfoutput(dffilter, dfmean, dft)
+    drifted = dffilter.copy()
+    n = drifted.groupby("sweep").cumcount().to_numpy()
+    drifted["time"] = (np.cumsum(np.full(n.max() + 1, 0.0001)) - 0.0001)[n]  # ATF/IBW-style accumulated time
+    pd.testing.assert_frame_equal(analysis.build_dfoutput(drifted, dfmean, dft), expected)
+
+
+def test_build_dfoutput_time_mask_fallback_matches_grid():
+    dffilter, dfmean, dft = _pipeline_inputs()
+    expected = analysis.build_dfoutput(dffilter, dfmean, dft)
+    ragged = dffilter[~((dffilter["sweep"] == 3) & (dffilter["time"] > 0.019))]  # last sweep shorter: no shared grid
+    result = analysis.build_dfoutput(ragged, dfmean, dft)
+    pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-9)
+
+
+def test_fit_slopes_matches_linregress():
+    from scipy.stats import linregress
+
+    rng = np.random.default_rng(3)
+    x = np.arange(200) * 1e-4
+    values = rng.normal(0, 1e-4, (5, 200)) + np.outer(rng.normal(0, 1, 5), x)
+    windows = [slice(10, 40), slice(30, 31), slice(120, 200)]
+    fit = analysis.fit_slopes(values, x, windows, with_stats=True)
+    assert fit["slope"].shape == (5, 3)
+    assert np.isnan(fit["slope"][:, 1]).all() and np.isnan(fit["r2"][:, 1]).all()
+    for j in (0, 2):
+        x_w = x[windows[j]]
+        for row in range(5):
+            ref = linregress(x_w, values[row, windows[j]])
+            resid = values[row, windows[j]] - (ref.slope * x_w + ref.intercept)
+            assert fit["slope"][row, j] == pytest.approx(ref.slope, rel=1e-9)
+            assert fit["r2"][row, j] == pytest.approx(ref.rvalue**2, rel=1e-9)
+            assert fit["residual_se"][row, j] == pytest.approx(np.sqrt(resid @ resid / (len(x_w) - 2)), rel=1e-9)
+
+
+def test_fit_slopes_nan_only_voids_the_windows_it_falls_in():
+    rng = np.random.default_rng(5)
+    x = np.arange(100) * 1e-4
+    values = rng.normal(0, 1e-4, (3, 100)) + np.outer(rng.normal(0, 1, 3), x)
+    windows = [slice(10, 40), slice(60, 90)]
+    clean = analysis.fit_slopes(values, x, windows, with_stats=True)
+    values[0, 50] = np.nan  # between the windows
+    values[1, 20] = np.nan  # inside the first window
+    fit = analysis.fit_slopes(values, x, windows, with_stats=True)
+    for key in ("slope", "r2", "residual_se"):
+        np.testing.assert_allclose(fit[key][0], clean[key][0], rtol=1e-12)
+        assert np.isnan(fit[key][1, 0])
+        assert fit[key][1, 1] == pytest.approx(clean[key][1, 1], rel=1e-12)
+        np.testing.assert_array_equal(fit[key][2], clean[key][2])
+
+
+def test_build_dfoutput_nan_between_slope_windows_keeps_the_slopes():
+    dffilter, dfmean, dft = _pipeline_inputs()
+    expected = analysis.build_dfoutput(dffilter, dfmean, dft)
+    # t = 0.009 s lies between the volley (0.007-0.008) and EPSP (0.011-0.013) windows and in no amplitude window
+    dffilter.loc[(dffilter["sweep"] == 0) & np.isclose(dffilter["time"], 0.009), "voltage"] = np.nan
+    result = analysis.build_dfoutput(dffilter, dfmean, dft)
+    assert result.loc[0, ["EPSP_slope", "volley_slope"]].notna().all()
+    pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-12)
+
+
+def test_sliding_fit_matches_polyfit_per_window():
+    rng = np.random.default_rng(4)
+    x = 0.0123 + np.arange(40) * 1e-4
+    y = -0.5 * x + rng.normal(0, 1e-5, 40)
+    y[20:27] = 0.001  # flat stretch: R² 0
+    fit = analysis.sliding_fit(y, x, 7)
+    assert fit["slope"].shape == fit["r2"].shape == (34,)
+    for k in range(34):
+        coefs = np.polyfit(x[k : k + 7], y[k : k + 7], 1)
+        residual = y[k : k + 7] - np.polyval(coefs, x[k : k + 7])
+        ss_tot = np.sum((y[k : k + 7] - y[k : k + 7].mean()) ** 2)
+        assert fit["slope"][k] == pytest.approx(coefs[0], rel=1e-6, abs=1e-9)
+        assert fit["r2"][k] == pytest.approx(1 - residual @ residual / ss_tot if ss_tot > 1e-20 else 0.0, abs=1e-6)
+    assert len(analysis.sliding_fit(y[:5], x[:5], 7)["slope"]) == 0
+
+
+@pytest.mark.skipif(_ABF_1CH is None, reason=f"real ABF absent in {_ABF_1CH_DIR}")
+def test_find_timepoints_profiles_cover_the_searched_windows():
+    df_raw = next(iter(source2dfs(str(_ABF_1CH), gain=1.0).values()))
+    dfmean, i_stim = build_dfmean(df_raw)
+    snippet = dfmean.iloc[i_stim - 5 : i_stim + 200].reset_index(drop=True)
+    tp = analysis.find_timepoints(snippet, make_default_dict_t(), profiles=True)
+    assert tp["volley_detected"] and tp["epsp_detected"]
+    assert "EPSP_slope_profile" not in analysis.find_timepoints(snippet, make_default_dict_t())
+    volley, epsp = tp["volley_slope_profile"], tp["EPSP_slope_profile"]
+    assert list(epsp.columns) == ["t_start", "slope", "r2"]
+    assert tp["t_volley_slope_start"] == volley.loc[volley["slope"].idxmin(), "t_start"]
+    assert tp["t_EPSP_slope_start"] == epsp.loc[epsp["r2"].idxmax(), "t_start"]
+
+
+def test_build_dfoutput_windowed_amps_match_per_sweep_lambda():
+    dffilter, dfmean, dft = _pipeline_inputs()
+    dft = dft.assign(t_volley_amp_halfwidth=0.0002)
+    # The per-sweep groupby.apply that the windowed-amplitude paths replace
+    amp_zero = analysis._compute_amp_zero_per_sweep(dffilter, 0.006, "voltage")
+    expected = {}
+    for name, t_amp, half in (("EPSP", 0.0115, 0.0003), ("volley", 0.0075, 0.0002)):
+        expected[name] = dffilter.groupby("sweep").apply(
+            lambda s: -(s.loc[(s["time"] >= t_amp - half) & (s["time"] <= t_amp + half), "voltage"].mean() - amp_zero.get(s.name, 0.0))
+        )
+    ragged = dffilter[~((dffilter["sweep"] == 3) & (dffilter["time"] > 0.019))]
+    for df in (dffilter, ragged):
+        result = analysis.build_dfoutput(df, dfmean, dft).set_index("sweep")
+        for name in ("EPSP", "volley"):
+            np.testing.assert_allclose(result[f"{name}_amp"].loc[expected[name].index], expected[name].to_numpy(), rtol=1e-9)
+
+
+def test_add_filter_savgol_matrix_matches_per_sweep():
+    from scipy.signal import savgol_filter
+
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame({"sweep": np.repeat(np.arange(6), 50), "time": np.tile(np.arange(50) * 1e-4, 6), "voltage": rng.normal(0, 1e-3, 300)})
+    expected = np.concatenate([savgol_filter(df.loc[df["sweep"] == s, "voltage"], 9, 3) for s in range(6)])
+    shuffled = df.sample(frac=1, random_state=0)
+    np.testing.assert_allclose(analysis.addFilterSavgol(df, window_length=8, poly_order=3), expected, rtol=1e-12, atol=1e-15)
+    np.testing.assert_allclose(analysis.addFilterSavgol(shuffled, window_length=8, poly_order=3).sort_index(), expected, rtol=1e-12, atol=1e-15)
+    ragged = df[~((df["sweep"] == 5) & (df["time"] > 0.00245))].copy()  # last sweep 25 samples
+    smoothed = analysis.addFilterSavgol(ragged, window_length=31, poly_order=3)
+    last = ragged["sweep"] == 5
+    np.testing.assert_allclose(smoothed[last], savgol_filter(ragged.loc[last, "voltage"], 25, 3), rtol=1e-12, atol=1e-15)
+    assert smoothed is not None and ragged["savgol"].equals(smoothed)
+
+
+def test_build_dfbinstimoutput_matches_per_snippet_measure_waveform():
+    dffilter, dfmean, dft = _pipeline_inputs()
+    second = dft.iloc[0] + 0.004
+    second[["stim", "t_EPSP_amp_halfwidth", "norm_output_from", "norm_output_to"]] = [2, 0.0, 0, 1]
+    dft = pd.concat([dft, second.to_frame().T], ignore_index=True)
+    expected = []
+    for bin_nr, bin_df in dffilter.groupby("sweep"):
+        for _, t_row in dft.iterrows():
+            dict_t = t_row.to_dict()
+            t_end = dict_t["t_EPSP_amp"] + 2 * dict_t["t_EPSP_amp_halfwidth"]
+            snippet = bin_df[(bin_df["time"] >= dict_t["t_stim"] - 0.002) & (bin_df["time"] <= t_end)].reset_index(drop=True)
+            expected.append({"bin": bin_nr, "stim": dict_t["stim"], **analysis.measure_waveform(snippet, dict_t)})
+    expected = pd.DataFrame(expected)
+    result = analysis.build_dfbinstimoutput(dffilter, dft)
+    pd.testing.assert_frame_equal(result, expected[result.columns], check_dtype=False, rtol=1e-9)
+    stim_rows = analysis.build_dfoutput(dffilter, dfmean, dft).query("sweep.isna()")
+    assert stim_rows["stim"].tolist() == [1, 2] and stim_rows["EPSP_amp"].notna().all()
+
+
+def _drifting_epsp_sweeps(n_sweeps=10):
+    # Stim artefact at sample 60; the EPSP trough moves one sample (0.1 ms) later every sweep
+    time = np.round(np.arange(400) * 1e-4, 6)
+    values = np.zeros((n_sweeps, 400))
+    values[:, 60], values[:, 61] = -0.01, 0.01
+    for s in range(n_sweeps):
+        values[s] -= 0.002 * np.exp(-0.5 * ((np.arange(400) - 110 - s) / 8) ** 2)
+    return time, values
+
+
+def test_find_sweep_timepoints_tracks_epsp_drift():
+    time, values = _drifting_epsp_sweeps()
+    dfmean = pd.DataFrame({"time": time, "voltage": values.mean(axis=0)})
+    dft = analysis.find_events(dfmean, make_default_dict_t(), i_stims=[60])
+    on_mean = analysis.find_sweep_timepoints(dfmean[["voltage"]].to_numpy().T, time, dft, make_default_dict_t(), i_stims=[60])
+    for key in analysis.SWEEP_TIMEPOINT_COLUMNS:
+        assert on_mean.loc[0, key] == pytest.approx(dft.loc[0, key], abs=1e-12)
+    dfsweept = analysis.find_sweep_timepoints(values, time, dft, make_default_dict_t(), sweeps=np.arange(10) + 5, i_stims=[60])
+    assert dfsweept["sweep"].tolist() == list(range(5, 15))
+    np.testing.assert_allclose(dfsweept["t_EPSP_amp"], 0.011 + np.arange(10) * 1e-4)
+    drift = analysis.timepoint_drift(dfsweept).set_index("timepoint")
+    assert drift.loc["t_EPSP_amp", "drift"] == pytest.approx(0.0009)
+    assert drift.loc["t_stim", "drift"] == pytest.approx(0.0, abs=1e-12)
+    assert drift.loc["t_EPSP_amp", "detected"] == 1.0
+
+
+@pytest.mark.skipif(_ABF_KO is None, reason=f"KO ABF absent in {_ABF_KO_DIR}")
+def test_ko_abf_find_sweep_timepoints_on_the_mean_matches_dft():
+    # The mean as the only sweep must reproduce the dft exactly; channel 1's t_stim sits 5 samples
+    # before the i_stim find_events cuts around, so cutting around t_stim shifted the snippet.
+    for df_raw in source2dfs(str(_ABF_KO), gain=1.0).values():
+        dfmean, _i_stim = build_dfmean(df_raw)
+        dft = analysis.find_events(dfmean=dfmean, default_dict_t=make_default_dict_t(), verbose=False)
+        time = dfmean["time"].to_numpy()
+        i_stims = analysis.find_i_stims(dfmean=dfmean)
+        on_mean = analysis.find_sweep_timepoints(dfmean[["voltage"]].to_numpy().T, time, dft, make_default_dict_t(), i_stims=i_stims)
+        dffilter = dfmean[["time", "voltage"]].assign(sweep=0)
+        via_pipeline = recording_pipeline.build_dfsweept(dffilter, dfmean, dft, default_dict_t=make_default_dict_t(), filter_val="voltage")
+        for dfsweept in (on_mean, via_pipeline):
+            for key in analysis.SWEEP_TIMEPOINT_COLUMNS:
+                np.testing.assert_allclose(dfsweept[key].to_numpy(dtype=float), dft[key].to_numpy(dtype=float), atol=1e-12, err_msg=key)
@@ -31,4 +31,12 @@ def test_group_mean_parquet_path():
 
 
 def test_timepoints_cache_key_constant():
-    assert recording_cache.TIMEPOINTS_CACHE_KEY == "timepoints"
\ No newline at end of file
+    assert recording_cache.TIMEPOINTS_CACHE_KEY == "timepoints"
+
+
+def test_df_parquet_path():
+    folders = {"cache": "/cache", "timepoints": "/tp", "data": "/data"}
+    assert recording_cache.df_parquet_path(folders, "rec1") == "/cache/rec1.parquet"
+    assert recording_cache.df_parquet_path(folders, "rec1", "timepoints") == "/tp/rec1.parquet"
+    assert recording_cache.df_parquet_path(folders, "rec1", "data") == "/data/rec1.parquet"
+    assert recording_cache.df_parquet_path(folders, "rec1", "output_bin") == recording_cache.output_parquet_path("/cache", "rec1", bin_active=True)
@@ -0,0 +1,163 @@
+"""Tests for brainwash_ui.recording_import (parallel import worker, no Qt)."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import parse
+import pyabf.abfWriter
+import pyarrow.parquet as pq
+import pytest
+from joblib import parallel_config
+
+from brainwash_ui import data_parquet, recording_cache, recording_import
+from test_pipeline_fixtures import make_sweep_df
+
+
+def test_recording_names_single_channel():
+    assert recording_import.recording_names("rec", {0: None}) == {"rec": 0}
+
+
+def test_recording_names_multi_channel_and_split():
+    assert recording_import.recording_names("rec", {0: None, 1: None}) == {"rec_ch0": 0, "rec_ch1": 1}
+    split = {(0, "even"): None, (0, "odd"): None}
+    assert recording_import.recording_names("rec", split) == {"rec_even": (0, "even"), "rec_odd": (0, "odd")}
+    split2 = {(0, "a"): None, (1, "a"): None}
+    assert list(recording_import.recording_names("rec", split2)) == ["rec_ch0_a", "rec_ch1_a"]
+
+
+def test_import_source_writes_parquets(tmp_path):
+    source = tmp_path / "src.csv"
+    make_sweep_df(n_sweeps=4).to_csv(source, index=False)
+    data, cache = tmp_path / "data", tmp_path / "cache"
+    results = recording_import.import_source(source, "rec", data_folder=data, cache_folder=cache)
+    assert [rec for rec, _ in results] == ["rec"]
+    assert results[0][1]["nsweeps"] == 4
+    assert data_parquet.is_compact(recording_cache.data_parquet_path(data, "rec"))
+    assert len(data_parquet.read_df(recording_cache.data_parquet_path(data, "rec"))) == 400
+    assert set(pd.read_parquet(recording_cache.mean_parquet_path(cache, "rec")).columns) >= {"time", "voltage"}
+    assert "voltage" in pd.read_parquet(recording_cache.filter_parquet_path(cache, "rec")).columns
+
+
+def test_import_source_parses_to_matrices_and_falls_back_for_ragged_sweeps(tmp_path):
+    regular, ragged = tmp_path / "regular.csv", tmp_path / "ragged.csv"
+    df = make_sweep_df(n_sweeps=4)
+    df.to_csv(regular, index=False)
+    df[~((df["sweep"] == 3) & (df["time"] > df["time"].max() - 0.001))].to_csv(ragged, index=False)
+    kwargs = {"data_folder": tmp_path / "data", "cache_folder": tmp_path / "cache"}
+    with mock.patch.object(parse, "source2dfs", wraps=parse.source2dfs) as source2dfs:
+        recording_import.import_source(regular, "regular", **kwargs)
+        assert not source2dfs.called
+        results = recording_import.import_source(ragged, "ragged", **kwargs)
+        assert source2dfs.called
+    assert results[0][1]["nsweeps"] == 4
+    assert not data_parquet.is_compact(recording_cache.data_parquet_path(tmp_path / "data", "ragged"))
+    dffilter = pd.read_parquet(recording_cache.filter_parquet_path(tmp_path / "cache", "regular"))
+    expected = parse.zeroSweeps(parse.source2dfs(str(regular))[0])
+    pd.testing.assert_frame_equal(dffilter, expected[dffilter.columns.tolist()])
+
+
+def test_import_source_persist_false_writes_nothing(tmp_path):
+    source = tmp_path / "src.csv"
+    make_sweep_df().to_csv(source, index=False)
+    results = recording_import.import_source(source, "rec", data_folder=tmp_path / "data", cache_folder=tmp_path / "cache", persist=False)
+    assert len(results) == 1
+    assert not (tmp_path / "data").exists()
+
+
+def test_import_sources_parallel_matches_sequential(tmp_path):
+    jobs = []
+    for i in range(3):
+        path = tmp_path / f"s{i}.csv"
+        make_sweep_df(n_sweeps=2 + i).to_csv(path, index=False)
+        jobs.append((str(path), f"rec{i}"))
+    kwargs = {"data_folder": tmp_path / "data", "cache_folder": tmp_path / "cache", "persist": False}
+    sequential = {i: res for i, res, _ in recording_import.import_sources(jobs, n_jobs=1, **kwargs)}
+    parallel = {i: res for i, res, _ in recording_import.import_sources(jobs, n_jobs=2, **kwargs)}
+    assert parallel == sequential
+    assert [rec for rec, _ in sequential[2]] == ["rec2"]
+    assert sequential[2][0][1]["nsweeps"] == 4
+
+
+def test_import_sources_reports_errors_per_job(tmp_path):
+    good = tmp_path / "good.csv"
+    make_sweep_df().to_csv(good, index=False)
+    jobs = [(str(tmp_path / "missing.abf"), "bad"), (str(good), "good")]
+    results = recording_import.import_sources(jobs, n_jobs=1, data_folder=tmp_path, cache_folder=tmp_path, persist=False)
+    out = {i: (res, err) for i, res, err in results}
+    assert out[0][0] == [] and "FileNotFoundError" in out[0][1]
+    assert out[1][1] is None and out[1][0][0][0] == "good"
+
+
+def test_import_sources_shares_memory_budget_between_workers(monkeypatch):
+    budgets = []
+    monkeypatch.setattr(recording_import, "import_source", lambda *args, memory_budget, **kwargs: budgets.append(memory_budget) or [])
+    jobs = [("a", "a"), ("b", "b"), ("c", "c")]
+    with parallel_config(backend="threading"):  # workers see the monkeypatched import_source
+        list(recording_import.import_sources(jobs, n_jobs=2, memory_budget=1000))
+    assert budgets == [500] * 3
+    budgets.clear()
+    list(recording_import.import_sources(jobs[:1], n_jobs=2, memory_budget=1000))
+    assert budgets == [1000]
+
+
+def test_memory_budget_from_project_settings():
+    assert recording_import.memory_budget({}) == recording_import.MEMORY_BUDGET
+    assert recording_import.memory_budget({"import_memory_mb": 256}) == 256 << 20
+
+
+def _write_abf(path, n_sweeps=6, n_samples=400):
+    rng = np.random.default_rng(0)
+    sweeps = rng.normal(0, 0.02, (n_sweeps, n_samples))
+    sweeps[:, 100:103] += [2.0, 4.0, 1.0]  # stim artifact, mV
+    sweeps[:, 110:] -= 1.0
+    pyabf.abfWriter.writeABF1(sweeps.astype(np.float32), str(path), 10000, units="mV")
+    return path
+
+
+def test_import_abf_chunked_matches_in_memory(tmp_path):
+    source = _write_abf(tmp_path / "src.abf")
+    ref = recording_import.import_source(source, "rec", data_folder=tmp_path / "data", cache_folder=tmp_path / "cache")
+    # whole-sweep blocks, then 250-sample blocks that split every 400-sample sweep in two
+    for budget in (parse.ABF_BYTES_PER_SAMPLE * 1000, parse.ABF_BYTES_PER_SAMPLE * 250):
+        data, cache = tmp_path / f"data_{budget}", tmp_path / f"cache_{budget}"
+        assert recording_import.import_source(source, "rec", data_folder=data, cache_folder=cache, memory_budget=budget) == ref
+        assert pq.ParquetFile(recording_cache.data_parquet_path(data, "rec")).num_row_groups > 1
+        pd.testing.assert_frame_equal(
+            data_parquet.read_df(recording_cache.data_parquet_path(data, "rec")),
+            data_parquet.read_df(recording_cache.data_parquet_path(tmp_path / "data", "rec")),
+        )
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(recording_cache.filter_parquet_path(cache, "rec")),
+            pd.read_parquet(recording_cache.filter_parquet_path(tmp_path / "cache", "rec")),
+        )
+        np.testing.assert_allclose(
+            pd.read_parquet(recording_cache.mean_parquet_path(cache, "rec"))["voltage"],
+            pd.read_parquet(recording_cache.mean_parquet_path(tmp_path / "cache", "rec"))["voltage"],
+            atol=1e-8,
+        )
+
+
+def test_abf_blocks_match_pyabf_with_and_without_the_private_scale(tmp_path):
+    source = _write_abf(tmp_path / "src.abf", n_sweeps=5)
+    abf = pyabf.ABF(str(source), loadData=False)
+    expected = pyabf.ABF(str(source)).getAllYs(0).reshape(5, -1) / 1000
+    assert abf.dataPointByteSize == 2 and parse._abf_int16_scale(abf, 0) is not None
+    for scale in (parse._abf_int16_scale(abf, 0), None):
+        with mock.patch.object(parse, "_abf_int16_scale", return_value=scale):
+            blocks = list(parse.abf_blocks(abf, 0, max_samples=3 * 400))
+        assert [(sweep, sample) for sweep, sample, _ in blocks] == [(0, 0), (3, 0)]
+        np.testing.assert_array_equal(np.concatenate([v for _, _, v in blocks]), expected)
+
+
+@pytest.mark.skipif(not Path("/proc/self/maps").exists(), reason="needs /proc to list memory maps")
+def test_abf_blocks_unmaps_the_file_when_closed(tmp_path):
+    source = _write_abf(tmp_path / "src.abf")
+    blocks = parse.abf_blocks(pyabf.ABF(str(source), loadData=False), 0, max_samples=400)
+    next(blocks)
+    assert str(source) in Path("/proc/self/maps").read_text()
+    blocks.close()  # a consumer that stops early
+    assert str(source) not in Path("/proc/self/maps").read_text()
@@ -0,0 +1,179 @@
+"""Tests for recording_matrix.RecordingMatrix and the matrix paths in parse.py."""
+
+from __future__ import annotations
+
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import parse
+import pytest
+from recording_matrix import RecordingMatrix, SampleGrid, bin_rows, concat
+
+from test_parse import _write_synthetic_atf
+from test_pipeline_fixtures import make_sweep_df
+
+_ABF_2CH = Path(__file__).parent / "test_data" / "KO_02" / "2022_01_24_0000.abf"
+
+
+def _noisy_sweep_df(n_sweeps=6, n_timepoints=120, stim_index=50, seed=0):
+    df = make_sweep_df(n_sweeps=n_sweeps, n_timepoints=n_timepoints, stim_index=stim_index)
+    rng = np.random.default_rng(seed)
+    df["voltage_raw"] = df["voltage_raw"] + rng.normal(0, 1e-5, len(df)) + df["sweep"] * 1e-4
+    return df
+
+
+def test_from_long_shapes_and_vectors():
+    df = _noisy_sweep_df()
+    m = RecordingMatrix.from_long(df)
+    assert m.voltage.shape == (6, 120)
+    assert m.voltage.flags["C_CONTIGUOUS"]
+    assert m.n_sweeps == 6 and m.n_samples == 120
+    assert m.dt == pytest.approx(0.001)
+    assert m.sampling_rate == 1000
+    np.testing.assert_array_equal(m.t0, df.groupby("sweep")["t0"].first().to_numpy())
+    np.testing.assert_array_equal(m.datetime, df.groupby("sweep")["datetime"].first().to_numpy())
+
+
+def test_to_long_round_trip():
+    df = _noisy_sweep_df()
+    out = RecordingMatrix.from_long(df).to_long()
+    assert list(out.columns) == ["sweep", "time", "voltage_raw", "t0", "datetime"]
+    for col in ("sweep", "time", "voltage_raw", "t0"):
+        np.testing.assert_array_equal(out[col].to_numpy(), df[col].to_numpy())
+    assert (out["datetime"] - df["datetime"]).abs().max() <= pd.Timedelta(1, "us")
+
+
+def test_from_long_accepts_shuffled_rows():
+    df = _noisy_sweep_df()
+    m = RecordingMatrix.from_long(df.sample(frac=1, random_state=1))
+    np.testing.assert_array_equal(m.voltage, RecordingMatrix.from_long(df).voltage)
+
+
+def test_from_long_rejects_ragged_sweeps():
+    df = _noisy_sweep_df()
+    df = df.drop(df.index[-1])
+    with pytest.raises(ValueError, match="ragged"):
+        RecordingMatrix.from_long(df)
+
+
+def test_matrix_is_smaller_than_long_format():
+    df = _noisy_sweep_df(n_sweeps=50, n_timepoints=1000)
+    m = RecordingMatrix.from_long(df)
+    assert df.memory_usage(index=False).sum() >= 3 * m.nbytes
+
+
+def test_build_dfmean_matrix_matches_long():
+    df = _noisy_sweep_df()
+    mean_long, i_long = parse.build_dfmean(df)
+    mean_mat, i_mat = parse.build_dfmean(RecordingMatrix.from_long(df))
+    assert i_mat == i_long
+    assert list(mean_mat.columns) == ["time", "voltage", "prim", "bis"]
+    np.testing.assert_allclose(mean_mat.to_numpy(), mean_long[["time", "voltage", "prim", "bis"]].to_numpy(), atol=1e-15)
+
+
+def test_zero_sweeps_matrix_matches_long():
+    df = _noisy_sweep_df()
+    _, i_stim = parse.build_dfmean(df)
+    expected = parse.zeroSweeps(df, i_stim=i_stim)
+    zeroed = parse.zeroSweeps(RecordingMatrix.from_long(df), i_stim=i_stim)
+    assert isinstance(zeroed, RecordingMatrix)
+    np.testing.assert_allclose(zeroed.to_long("voltage")["voltage"].to_numpy(), expected["voltage"].to_numpy(), atol=1e-15)
+
+
+def test_concat_rejects_mismatched_lengths():
+    a = RecordingMatrix.from_arrays(np.zeros((2, 10)), np.arange(10) * 0.001)
+    b = RecordingMatrix.from_arrays(np.zeros((2, 12)), np.arange(12) * 0.001)
+    with pytest.raises(ValueError):
+        concat([a, b])
+
+
+def test_source2matrices_atf_matches_source2dfs(tmp_path):
+    path = _write_synthetic_atf(tmp_path / "rec.atf", n_sweeps=4, n_timepoints=10, n_channels=2)
+    dfs = parse.source2dfs(str(path))
+    matrices = parse.source2matrices(str(path))
+    assert set(matrices) == set(dfs)
+    for channel, df in dfs.items():
+        long = matrices[channel].to_long()
+        np.testing.assert_array_equal(long["voltage_raw"].to_numpy(), df["voltage_raw"].to_numpy())
+        np.testing.assert_array_equal(long["time"].to_numpy(), df["time"].to_numpy())
+
+
+def test_source2matrices_csv(tmp_path):
+    path = tmp_path / "rec.csv"
+    _noisy_sweep_df().to_csv(path, index=False)
+    matrices = parse.source2matrices(str(path))
+    assert matrices[0].voltage.shape == (6, 120)
+
+
+@pytest.mark.skipif(not _ABF_2CH.exists(), reason=f"real ABF absent: {_ABF_2CH}")
+def test_source2matrices_abf_matches_source2dfs():
+    dfs = parse.source2dfs(str(_ABF_2CH))
+    matrices = parse.source2matrices(str(_ABF_2CH))
+    for channel, df in dfs.items():
+        long = matrices[channel].to_long()
+        for col in ("sweep", "time", "voltage_raw", "t0"):
+            np.testing.assert_array_equal(long[col].to_numpy(), df[col].to_numpy())
+        assert (long["datetime"].to_numpy() - df["datetime"].to_numpy()).max() <= np.timedelta64(1, "us")
+
+
+def test_sample_grid_indices():
+    grid = SampleGrid.from_time(np.arange(100) * 1e-4)
+    assert (grid.t0, grid.n) == (0.0, 100)
+    assert grid.nearest(0.00114) == 11 and grid.nearest(0.00115) == 11 and grid.nearest(1.0) == 99
+    assert grid.window(0.0011, 0.0015) == slice(11, 16)
+    assert grid.window(0.0011, 0.0015, include_end=False) == slice(11, 15)
+    assert grid.window(0.00111, 0.00119) == slice(12, 12)  # between samples: empty
+    assert grid.window(-1.0, 0.0002) == slice(0, 3) and grid.window(0.2, 0.3) == slice(100, 100)
+
+
+def test_sample_grid_absorbs_accumulated_time():
+    # Accumulated float time (ATF/IBW style) lands just off the grid values a dft is written in.
+    time = np.cumsum(np.full(200, 1e-4)) - 1e-4
+    assert time[115] != 0.0115
+    grid = SampleGrid.from_time(time)
+    assert grid.window(0.0115, 0.0120) == slice(115, 121)
+    assert grid.nearest(0.0115) == 115
+
+
+def test_sample_grid_rejects_uneven_time():
+    assert SampleGrid.from_time([0.0]) is None
+    assert SampleGrid.from_time(np.r_[np.arange(10), np.arange(12, 20)] * 1e-4) is None
+
+
+def test_bin_rows_reshape_with_ragged_final_bin():
+    from scipy.stats import trim_mean
+
+    values = np.random.default_rng(2).normal(size=(11, 4))
+    bin_ids = np.arange(11) // 4  # bins of 4, 4 and 3 rows
+    bins, means = bin_rows(values, bin_ids)
+    assert bins.tolist() == [0, 1, 2]
+    np.testing.assert_allclose(means, [values[0:4].mean(0), values[4:8].mean(0), values[8:11].mean(0)])
+    _, medians = bin_rows(values, bin_ids, reducer="median")
+    np.testing.assert_allclose(medians[2], np.median(values[8:11], axis=0))
+    _, trimmed = bin_rows(values, bin_ids, reducer="trimmed_mean", trim=0.25)
+    np.testing.assert_allclose(trimmed[0], trim_mean(values[0:4], 0.25, axis=0))
+    gaps = np.array([0, 0, 2, 2, 2, 5, 7, 7, 7, 7, 9])  # unequal bins: reduced one by one
+    bins, means = bin_rows(values, gaps)
+    assert bins.tolist() == [0, 2, 5, 7, 9]
+    np.testing.assert_allclose(means[3], values[6:10].mean(0))
+    with pytest.raises(ValueError):
+        bin_rows(values, bin_ids[::-1])
+    with pytest.raises(ValueError):
+        bin_rows(values, bin_ids, reducer="mode")
+
+
+def test_bin_rows_trimmed_mean_skips_nan_like_mean_and_median():
+    from scipy.stats import trim_mean
+
+    values = np.random.default_rng(3).normal(size=(8, 3))
+    values[1, 0] = np.nan
+    values[4:8, 2] = np.nan  # all-NaN column in the second bin
+    bin_ids = np.arange(8) // 4
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        _, trimmed = bin_rows(values, bin_ids, reducer="trimmed_mean", trim=0.25)
+    np.testing.assert_allclose(trimmed[0, 0], trim_mean(values[[0, 2, 3], 0], 0.25))
+    np.testing.assert_allclose(trimmed[0, 1:], trim_mean(values[0:4, 1:], 0.25, axis=0))
+    assert np.isnan(trimmed[1, 2]) and not np.isnan(trimmed[1, :2]).any()
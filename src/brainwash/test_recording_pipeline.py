@@ -3,7 +3,9 @@
 from __future__ import annotations
 
 import analysis_v3 as analysis
+import numpy as np
 import pandas as pd
+import pytest
 from parse import build_dfmean, zeroSweeps
 
 from brainwash_ui import recording_pipeline
@@ -77,4 +79,104 @@ def test_clean_dfoutput_from_parquet_drops_index():
     df = pd.DataFrame({"stim": [1], "sweep": [0], "index": [99]})
     cleaned, repersist = recording_pipeline.clean_dfoutput_from_parquet(df)
     assert repersist is True
-    assert "index" not in cleaned.columns
\ No newline at end of file
+    assert "index" not in cleaned.columns
+
+
+def _two_stim_inputs():
+    df_raw = make_sweep_df(n_sweeps=6, n_timepoints=300, dt=0.0001, stim_index=60)
+    df_raw["voltage_raw"] += df_raw["sweep"] * 1e-4 - (df_raw["time"] > 0.008) * df_raw["time"] * 0.05
+    dfmean, i_stim = build_dfmean(df_raw)
+    dffilter = zeroSweeps(df_raw, i_stim=i_stim)
+    stim1 = {
+        "stim": 1,
+        "t_stim": 0.006,
+        "t_EPSP_amp": 0.0115,
+        "t_EPSP_amp_halfwidth": 0.0003,
+        "t_EPSP_slope_start": 0.0110,
+        "t_EPSP_slope_end": 0.0130,
+        "t_volley_amp": 0.0075,
+        "t_volley_amp_halfwidth": 0.0,
+        "t_volley_slope_start": 0.0070,
+        "t_volley_slope_end": 0.0080,
+        "norm_output_from": 0,
+        "norm_output_to": 2,
+    }
+    stim2 = {key: (value + 0.01 if key.startswith("t_") and key.endswith(("stim", "amp", "start", "end")) else value) for key, value in stim1.items()}
+    stim2["stim"] = 2
+    return dffilter, dfmean, pd.DataFrame([stim1, stim2])
+
+
+def test_update_dfoutput_from_inputs_patches_only_changed_stim():
+    dffilter, dfmean, dft = _two_stim_inputs()
+    dfoutput = analysis.build_dfoutput(dffilter, dfmean, dft)
+    dft_new = dft.copy()
+    dft_new.loc[1, ["t_EPSP_slope_start", "t_EPSP_slope_end"]] = (0.0205, 0.0225)
+    patched = recording_pipeline.update_dfoutput_from_inputs(
+        dfoutput, dffilter, dfmean, dft_new.iloc[[1]].copy(), ["t_EPSP_slope_start", "t_EPSP_slope_end"], filter_val="voltage"
+    )
+    expected = analysis.build_dfoutput(dffilter, dfmean, dft_new)
+    pd.testing.assert_frame_equal(patched, expected, check_exact=False, rtol=1e-9)
+    stim1 = dfoutput["stim"] == 1
+    pd.testing.assert_frame_equal(patched[stim1], dfoutput[stim1])
+    assert not (patched.loc[~stim1, "EPSP_slope"] == dfoutput.loc[~stim1, "EPSP_slope"]).all()
+
+
+def test_update_dfoutput_amp_and_norm_fields_match_full_rebuild():
+    dffilter, dfmean, dft = _two_stim_inputs()
+    dfoutput = analysis.build_dfoutput(dffilter, dfmean, dft)
+    dft_new = dft.copy()
+    dft_new.loc[0, ["t_volley_amp", "t_volley_amp_halfwidth", "norm_output_to"]] = (0.0078, 0.0002, 4)
+    fields = ["t_volley_amp", "t_volley_amp_halfwidth", "norm_output_to"]
+    assert analysis.output_columns_for_fields(fields) == ["volley_amp"]
+    patched = analysis.update_dfoutput(dfoutput, dffilter, dfmean, dft_new.iloc[[0]], fields)
+    pd.testing.assert_frame_equal(patched, analysis.build_dfoutput(dffilter, dfmean, dft_new), check_exact=False, rtol=1e-9)
+
+
+def test_normalize_output_matches_build_with_new_range():
+    dffilter, dfmean, dft = _two_stim_inputs()
+    dfoutput = analysis.build_dfoutput(dffilter, dfmean, dft)
+    renormalized = analysis.normalize_output(dfoutput, 1, 3)
+    expected = analysis.build_dfoutput(dffilter, dfmean, dft.assign(norm_output_from=1, norm_output_to=3))
+    pd.testing.assert_frame_equal(renormalized, expected, check_exact=False, rtol=1e-12)
+    assert renormalized.loc[renormalized["sweep"].isna(), "EPSP_slope_norm"].isna().all()
+
+
+def test_build_dfbin_matches_per_bin_groupby():
+    df_raw = make_sweep_df(n_sweeps=7, n_timepoints=40, dt=0.0001, stim_index=10)
+    dffilter = zeroSweeps(df_raw, i_stim=10)
+    dffilter["voltage"] += np.random.default_rng(4).normal(0, 1e-4, len(dffilter))
+    ragged = dffilter[~((dffilter["sweep"] == 6) & (dffilter["time"] > 0.002))]
+    for df in (dffilter, ragged):
+        dfbin = recording_pipeline.build_dfbin(df, 3)
+        assert dfbin.columns.tolist() == ["t0", "datetime", "voltage", "time", "sweep"]
+        assert sorted(dfbin["sweep"].unique()) == [0, 1, 2]
+        for bin_nr in range(3):
+            expected = df[df["sweep"] // 3 == bin_nr].groupby("time")["voltage"].mean()
+            got = dfbin[dfbin["sweep"] == bin_nr].set_index("time")["voltage"]
+            np.testing.assert_allclose(got.loc[expected.index], expected, rtol=1e-12)
+    medians = recording_pipeline.build_dfbin(dffilter, 3, reducer="median")
+    expected = dffilter[dffilter["sweep"] // 3 == 1].groupby("time")["voltage"].median()
+    np.testing.assert_allclose(medians[medians["sweep"] == 1]["voltage"], expected, rtol=1e-12)
+
+
+def test_build_dfsweept_ragged_matches_grid():
+    dffilter, dfmean, dft = _two_stim_inputs()
+    expected = recording_pipeline.build_dfsweept(dffilter, dfmean, dft, default_dict_t=make_default_dict_t(), filter_val="voltage")
+    assert len(expected) == dffilter["sweep"].nunique() * len(dft)
+    ragged = dffilter[~((dffilter["sweep"] == 0) & (dffilter["time"] > dffilter["time"].max() - 0.001))]
+    shuffled = ragged.sample(frac=1, random_state=0)
+    result = recording_pipeline.build_dfsweept(shuffled, dfmean, dft, default_dict_t=make_default_dict_t(), filter_val="voltage")
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_apply_uniform_timepoints_copies_offsets_of_strongest_stim():
+    dffilter, dfmean, dft = _two_stim_inputs()
+    dfoutput = analysis.build_dfoutput(dffilter, dfmean, dft)
+    assert recording_pipeline.apply_uniform_timepoints(dft.copy(), dfoutput, precision=4, column="missing") is None
+    stim_max = dfoutput.loc[dfoutput["EPSP_slope"].idxmax(), "stim"]
+    template = dft[dft["stim"] == stim_max].iloc[0]
+    uniform = recording_pipeline.apply_uniform_timepoints(dft.copy(), dfoutput, precision=4)
+    for _, row in uniform.iterrows():
+        assert row["t_EPSP_slope_start"] - row["t_stim"] == pytest.approx(template["t_EPSP_slope_start"] - template["t_stim"], abs=1e-4)
+        assert row["t_EPSP_slope_method"] == f"=stim_{stim_max}"
+    assert list(uniform["stim"]) == [1, 2]
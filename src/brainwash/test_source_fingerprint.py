@@ -0,0 +1,115 @@
+"""Tests for brainwash_ui.source_fingerprint and recording_import.reuse_source (no Qt)."""
+
+from __future__ import annotations
+
+import os
+
+import pandas as pd
+
+from brainwash_ui import data_parquet, recording_cache, recording_import, source_fingerprint
+from test_pipeline_fixtures import make_sweep_df
+
+
+def _csv(tmp_path, name="src.csv", n_sweeps=4):
+    path = tmp_path / name
+    make_sweep_df(n_sweeps=n_sweeps).to_csv(path, index=False)
+    return path
+
+
+def test_fingerprint_is_stable(tmp_path):
+    path = _csv(tmp_path)
+    assert source_fingerprint.source_fingerprint(path) == source_fingerprint.source_fingerprint(path)
+
+
+def test_fingerprint_changes_with_mtime_size_and_options(tmp_path):
+    path = _csv(tmp_path)
+    fp = source_fingerprint.source_fingerprint(path)
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    fp_touched = source_fingerprint.source_fingerprint(path)
+    assert fp_touched != fp
+    with open(path, "a") as fh:
+        fh.write("\n")
+    assert source_fingerprint.source_fingerprint(path) != fp_touched
+    assert source_fingerprint.source_fingerprint(path, gain=2.0) != source_fingerprint.source_fingerprint(path)
+    assert source_fingerprint.source_fingerprint(path, split_odd_even=True) != source_fingerprint.source_fingerprint(path)
+
+
+def test_fingerprint_folder_ignores_unsupported_files(tmp_path):
+    folder = tmp_path / "folder"
+    folder.mkdir()
+    _csv(folder, "a.csv")
+    fp = source_fingerprint.source_fingerprint(folder)
+    (folder / "notes.txt").write_text("irrelevant")
+    assert source_fingerprint.source_fingerprint(folder) == fp
+    _csv(folder, "b.csv")
+    assert source_fingerprint.source_fingerprint(folder) != fp
+
+
+def test_index_round_trip_and_lookup_invalidation(tmp_path):
+    data, cache = tmp_path / "data", tmp_path / "cache"
+    path = _csv(tmp_path)
+    results = recording_import.import_source(path, "rec", data_folder=data, cache_folder=cache)
+    fp = source_fingerprint.source_fingerprint(path)
+    index = {}
+    source_fingerprint.record(index, fp, "rec", results)
+    source_fingerprint.save_index(tmp_path, index)
+    loaded = source_fingerprint.load_index(tmp_path)
+    assert source_fingerprint.lookup(loaded, fp, data)["recording_name"] == "rec"
+    assert source_fingerprint.lookup(loaded, "other", data) is None
+    os.remove(recording_cache.data_parquet_path(data, "rec"))
+    assert source_fingerprint.lookup(loaded, fp, data) is None
+
+
+def test_lookup_rejects_a_data_parquet_stamped_by_another_source(tmp_path):
+    data, cache = tmp_path / "data", tmp_path / "cache"
+    path, other = _csv(tmp_path), _csv(tmp_path, "other.csv", n_sweeps=3)
+    results = recording_import.import_source(path, "rec", data_folder=data, cache_folder=cache)
+    fp = source_fingerprint.source_fingerprint(path)
+    assert data_parquet.read_fingerprint(recording_cache.data_parquet_path(data, "rec")) == fp
+    index = {}
+    source_fingerprint.record(index, fp, "rec", results)
+    recording_import.import_source(other, "rec", data_folder=data, cache_folder=cache)  # e.g. renamed/purged, then reused
+    assert source_fingerprint.lookup(index, fp, data) is None
+
+
+def test_forget_recordings_prunes_entries_naming_them(tmp_path):
+    index = {
+        "a": {"recording_name": "old", "recordings": [["old_ch0", {}], ["old_ch1", {}]]},
+        "b": {"recording_name": "keep", "recordings": [["keep", {}]]},
+    }
+    source_fingerprint.save_index(tmp_path, index)
+    source_fingerprint.forget_recordings(tmp_path, ["old_ch1"])
+    assert list(source_fingerprint.load_index(tmp_path)) == ["b"]
+    assert not source_fingerprint.forget(index, ["missing"])
+
+
+def test_load_index_tolerates_corrupt_file(tmp_path):
+    source_fingerprint.index_path(tmp_path).write_text("{not json")
+    assert source_fingerprint.load_index(tmp_path) == {}
+
+
+def test_renamed_recordings_keeps_suffixes():
+    entry = {"recording_name": "old", "recordings": [["old_ch0", {"n": 1}], ["old_ch1", {"n": 2}]]}
+    assert source_fingerprint.renamed_recordings(entry, "new") == [("old_ch0", "new_ch0", {"n": 1}), ("old_ch1", "new_ch1", {"n": 2})]
+
+
+def test_reuse_source_copies_parquets_and_rebuilds_missing_cache(tmp_path):
+    data, cache = tmp_path / "data", tmp_path / "cache"
+    path = _csv(tmp_path)
+    results = recording_import.import_source(path, "rec", data_folder=data, cache_folder=cache)
+    index = {}
+    source_fingerprint.record(index, "fp", "rec", results)
+    os.remove(recording_cache.filter_parquet_path(cache, "rec"))
+
+    reused = recording_import.reuse_source(index["fp"], "rec(1)", data_folder=data, cache_folder=cache)
+    assert reused == [("rec(1)", results[0][1])]
+    pd.testing.assert_frame_equal(
+        data_parquet.read_df(recording_cache.data_parquet_path(data, "rec(1)")),
+        data_parquet.read_df(recording_cache.data_parquet_path(data, "rec")),
+    )
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(recording_cache.mean_parquet_path(cache, "rec(1)")),
+        pd.read_parquet(recording_cache.mean_parquet_path(cache, "rec")),
+    )
+    assert "voltage" in pd.read_parquet(recording_cache.filter_parquet_path(cache, "rec(1)")).columns
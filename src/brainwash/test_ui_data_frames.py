@@ -0,0 +1,47 @@
+"""DataFrameMixin.renormalize on a Qt-free host: the new norm range reaches every dft, in memory and on disk."""
+
+from __future__ import annotations
+
+from unittest import mock
+
+import pandas as pd
+
+from brainwash_ui import recording_cache
+
+
+def test_renormalize_updates_dft_norm_range_in_memory_and_on_disk(tmp_path):
+    from ui_data_frames import DataFrameMixin
+
+    dft = pd.DataFrame({"stim": [1, 2], "t_stim": [0.01, 0.06], "norm_output_from": [0, 0], "norm_output_to": [10, 10]})
+    dft.to_parquet(recording_cache.timepoints_parquet_path(str(tmp_path), "rec"), index=False)
+
+    class Host(DataFrameMixin):
+        def __init__(self):
+            self.uistate = mock.MagicMock()
+            self.uistate.project.default_dict_t = {"norm_output_from": 0, "norm_output_to": 10}
+            self.uistate.project.lineEdit = {"norm_EPSP_from": 5, "norm_EPSP_to": 15}
+            self.uiplot = mock.MagicMock()
+            self.dict_folders = {"project": tmp_path, "cache": tmp_path, "timepoints": tmp_path}
+            self.dict_ts = {}
+            self.usage = self.uiFreeze = self.uiThaw = self.tableUpdate = mock.MagicMock()
+            self.group_cache_purge = self.update_show = self.mouseoverUpdate = mock.MagicMock()
+
+        def get_df_project(self):
+            return pd.DataFrame({"ID": ["r1"], "recording_name": ["rec"], "sweeps": [2]})
+
+        def get_dfoutput(self, row, reset=False, dft=None):
+            return pd.DataFrame({"sweep": [0, 1], "EPSP_amp": [1.0, 2.0]})
+
+        def get_dfmean(self, row):
+            return None
+
+        def df2file(self, df, filename=None, key=None, rec=None):
+            df.to_parquet(recording_cache.df_parquet_path(self.dict_folders, filename, key), index=False)
+
+    host = Host()
+    host.renormalize()
+    assert host.uistate.project.default_dict_t == {"norm_output_from": 5, "norm_output_to": 15}
+    for df in (host.dict_ts["rec"], pd.read_parquet(recording_cache.timepoints_parquet_path(str(tmp_path), "rec"))):
+        assert df["norm_output_from"].tolist() == [5, 5]
+        assert df["norm_output_to"].tolist() == [15, 15]
+        assert df["t_stim"].tolist() == [0.01, 0.06]
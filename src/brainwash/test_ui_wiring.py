@@ -1,5 +1,6 @@
 """pytest-qt smoke tests (offscreen; no full UIsub)."""
 
+import pytest
 from PyQt5 import QtWidgets
 
 from brainwash_ui import app_context, statusbar, view_state
@@ -107,4 +108,21 @@ def test_hidden_group_excluded_from_visible_ids(qtbot):
         "G1": {"show": True, "rec_IDs": ["r1"]},
         "G2": {"show": False, "rec_IDs": ["r2"]},
     }
-    assert view_state.visible_group_ids(dd) == ["G1"]
\ No newline at end of file
+    assert view_state.visible_group_ids(dd) == ["G1"]
+
+
+def test_probe_sources_thread_emits_metadata_off_the_ui_thread(qtbot, tmp_path):
+    import ui_widgets
+    from test_parse import _write_synthetic_atf
+
+    atf = _write_synthetic_atf(tmp_path / "a.atf", n_sweeps=3, n_timepoints=100)
+    paths = [str(atf), str(tmp_path / "missing.abf")]
+    thread = ui_widgets.ProbeSourcesThread(paths)
+    with qtbot.waitSignal(thread.probed, timeout=10_000) as blocker:
+        thread.start()
+    thread.wait()
+    emitted_paths, metas = blocker.args
+    assert emitted_paths == paths
+    assert (metas[0]["sweep_count"], metas[0]["sample_rate"]) == (3, 10000)
+    assert metas[0]["sweep_duration"] == pytest.approx(0.01)
+    assert metas[1] is None
@@ -38,7 +38,7 @@ import uuid  # generating unique talkback ID
 from datetime import datetime  # used in project name defaults
 
 import analysis_v3 as analysis
-from brainwash_ui import plot_series
+from brainwash_ui import event_detection, plot_series, recording_cache, recording_pipeline
 
 # brainwash files
 import parse
@@ -956,7 +956,9 @@ class UIsub(
         self.dict_bins = {}  # all binned data, based on filters
         self.dict_means = {}  # all means
         self.dict_ts = {}  # all timepoints
+        self.dict_sweepts = {}  # per-sweep (per-bin) timepoints, drift QC
         self.dict_outputs = {}  # all outputs, x per sweep
+        self.dict_output_norms = {}  # norm range (from, to) the _norm columns of each dict_outputs entry were derived for
         self.dict_group_means = {}  # means of all group outputs (level-aware keys (gid, level))
         self.dict_global_units = {}  # global subject/slice unit dfs (keyed by (level, subject, slice?))
         self.dd_testsets = {}  # test/sweep sets for group comparisons
@@ -1181,7 +1183,10 @@ class UIsub(
 
     def trigger_set_norm_range_all(self):
         self.usage("trigger_set_norm_range_all")
-        self.recalculate()
+        low, high = self.editSort(self.lineEdit_norm_EPSP_start, start=self.lineEdit_norm_EPSP_start, end=self.lineEdit_norm_EPSP_end)
+        self.uistate.project.lineEdit["norm_EPSP_from"] = low
+        self.uistate.project.lineEdit["norm_EPSP_to"] = high
+        self.renormalize()
 
     def trigger_set_bin_size_all(self):
         self.usage("trigger_set_bin_size_all")
@@ -1909,6 +1914,85 @@ class UIsub(
         self.update_show(reset=True)
         self.mouseoverUpdate()
 
+    def triggerDetectEvents(self):
+        self.usage("triggerDetectEvents")
+        self.detectEvents(self.uistate.plot.list_idx_select_recs or None)
+
+    def detectEvents(self, indices=None):
+        # Re-run find_events for the recordings at indices (all parsed recordings if None) in a process pool
+        if getattr(self, "_current_detect_thread", None) is not None:
+            print("detectEvents: already detecting, ignoring duplicate call")
+            return
+        df_p = self.get_df_project()
+        if indices is None:
+            indices = df_p.index.tolist()
+        jobs = []
+        for index in indices:
+            p_row = df_p.loc[index]
+            if not recording_pipeline.is_recording_parsed(p_row):
+                print(f"detectEvents: {p_row['recording_name']} not parsed yet.")
+                continue
+            rec = p_row["recording_name"]
+            path_mean = Path(recording_cache.mean_parquet_path(self.dict_folders["cache"], rec))
+            dfmean = path_mean if path_mean.exists() and rec not in self.dict_means else self.get_dfmean(p_row)
+            jobs.append((rec, dfmean, p_row["filter"]))
+        if not jobs:
+            print("detectEvents: nothing to detect.")
+            return
+        self.uiFreeze()
+        detect_kwargs = {
+            "default_dict_t": self.uistate.project.default_dict_t.copy(),
+            "norm_output_from": self.uistate.project.lineEdit["norm_EPSP_from"],
+            "norm_output_to": self.uistate.project.lineEdit["norm_EPSP_to"],
+        }
+        thread = ui_widgets.DetectEventsThread(jobs, detect_kwargs)
+        self._current_detect_thread = thread
+        thread.progress.connect(lambda i: self.progressBarManager.update(i, "Detecting events"))
+        thread.status_update.connect(lambda text: self.progressBarManager.set_status(text))
+        thread.finished.connect(self.onDetectEventsFinished)
+        thread.finished.connect(thread.deleteLater)
+        thread.finished.connect(lambda: self._threads.remove(thread) if thread in self._threads else None)
+        self._threads.append(thread)
+        self.progressBarManager = ui_widgets.ProgressBarManager(self.progressBar, len(jobs))
+        self.progressBarManager.__enter__()
+        self.progressBarManager.update(0, "Detecting events")
+        thread.start()
+
+    def onDetectEventsFinished(self):
+        # Apply a finished batch: uniform timepoints where configured, then all timepoints parquets and df_project "stims" at once
+        thread = self._current_detect_thread
+        self._current_detect_thread = None
+        self.progressBarManager.__exit__(None, None, None)
+        df_p = self.get_df_project()
+        dfts = {}
+        for rec, dft in thread.dfts.items():
+            if dft is None:
+                print(f"detectEvents: no stims found for {rec}, timepoints kept.")
+                continue
+            p_row = df_p[df_p["recording_name"] == rec].iloc[0]
+            for cache in (self.dict_outputs, self.dict_output_norms, self.dict_sweepts):
+                cache.pop(rec, None)
+            self.dict_ts[rec] = dft
+            if not self.uistate.project.checkBox["timepoints_per_stim"] and len(dft) > 1:
+                dfoutput = self.get_dfoutput(p_row, reset=True, dft=dft)
+                recording_pipeline.apply_uniform_timepoints(dft, dfoutput, precision=self.uistate.project.settings["precision"])
+                recording_pipeline.normalize_dft_dtypes(dft)
+            dfts[rec] = dft
+            df_p.loc[df_p["recording_name"] == rec, "stims"] = len(dft)
+        if dfts and not self.config.transient:
+            event_detection.write_timepoints(self.dict_folders["timepoints"], dfts)
+        self.set_df_project(df_p)
+        for rec in dfts:
+            p_row = df_p[df_p["recording_name"] == rec].iloc[0]
+            self.persistOutput(rec, self.get_dfoutput(p_row, reset=True), p_row=p_row)
+            self.set_rec_status(rec)
+            self.uiplot.unPlot(p_row["ID"])
+        print(f"detectEvents: {len(dfts)} updated, {len(thread.dfts) - len(dfts)} without stims, {len(thread.errors)} failed")
+        self.uiThaw()
+        if dfts:
+            self.uistate.project.list_idx_recs2preload = df_p.index[df_p["recording_name"].isin(list(dfts))].tolist()
+            self.graphPreload()
+
     def checkBox_splitOddEven_changed(self, state):
         self.uistate.project.checkBox["splitOddEven"] = state == 2
         logger.debug("checkBox_splitOddEven_changed: %s", state)
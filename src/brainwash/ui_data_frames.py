@@ -15,7 +15,7 @@ import analysis_v3 as analysis
 import numpy as np
 import pandas as pd
 import parse
-from brainwash_ui import recording_cache, recording_pipeline, stim_intensity
+from brainwash_ui import data_parquet, recording_cache, recording_pipeline, stim_intensity
 
 class DataFrameMixin:
     """Mixin that provides the internal DataFrame computation layer for UIsub.
@@ -210,6 +210,40 @@ class DataFrameMixin:
         self.mouseoverUpdate()
         self.uiThaw()
 
+    def renormalize(self):
+        # Applies a new norm range: *_norm columns are derived on read (_normalized_output), so only the
+        # dfts' norm_output_from/to are re-persisted and plots and group means refreshed; no dfoutput is rebuilt.
+        self.usage("renormalize")
+        self.uiFreeze()
+        if hasattr(self, "turn_heatmap_off"):
+            self.turn_heatmap_off()
+        dt = self.uistate.project.default_dict_t
+        dt["norm_output_from"] = self.uistate.project.lineEdit["norm_EPSP_from"]
+        dt["norm_output_to"] = self.uistate.project.lineEdit["norm_EPSP_to"]
+        self.uistate.save_cfg(projectfolder=self.dict_folders["project"])
+
+        self.uiplot.unPlot()
+        self.uiplot.unPlotGroup()  # all levels (full clear)
+        for _, p_row in self.get_df_project().iterrows():
+            if not recording_pipeline.is_recording_parsed(p_row):
+                continue
+            df_t = self.get_dft(p_row)
+            if df_t is not None:
+                df_t["norm_output_from"] = dt["norm_output_from"]
+                df_t["norm_output_to"] = dt["norm_output_to"]
+                self.set_dft(p_row["recording_name"], df_t)
+            dfoutput = self.get_dfoutput(p_row)
+            self.uiplot.addRow(p_row, df_t, self.get_dfmean(p_row), self.V2mV(dfoutput))
+        self.tableUpdate(restore_selection=True)
+        self.group_cache_purge()  # group means average the _norm columns
+        if hasattr(self, "dd_group_samples"):
+            self.dd_group_samples = {}
+
+        self.uiplot.hideAll()
+        self.update_show(reset=True)
+        self.mouseoverUpdate()
+        self.uiThaw()
+
     # ------------------------------------------------------------------
     # Timepoints (dft) persistence
     # ------------------------------------------------------------------
@@ -327,8 +361,41 @@ class DataFrameMixin:
             self.dict_ts[rec] = dft
             self.df2file(df=dft, filename=rec, key="timepoints")  # persist dft as parquet
             self.set_rec_status(rec)  # update status in df_project
+            if self.uistate.project.settings.get("timepoints_per_sweep", False):
+                self.get_dfsweept(row, reset=True)  # drift QC on every new dft
             return dft
 
+    def get_dfsweept(self, row, reset=False):
+        # returns per-sweep (per-bin, when binned) timepoints around the stims of dft, with a drift summary printed on (re)build
+        rec = row["recording_name"]
+        dft = self.get_dft(row)
+        if dft is None:
+            return None
+        if rec in self.dict_sweepts and not reset:
+            return self.dict_sweepts[rec]
+        path = Path(recording_cache.sweep_timepoints_parquet_path(self.dict_folders["cache"], rec))
+        binned = pd.notna(row["bin_size"])
+        dfsource = self.get_dfbin(row) if binned else self.get_dffilter(row)
+        if path.exists() and not reset:
+            dfsweept = pd.read_parquet(path)
+            # stale if stims were added/removed or sweeps/bins changed since it was built
+            if set(dfsweept["stim"]) == set(dft["stim"]) and dfsweept["sweep"].nunique() == dfsource["sweep"].nunique():
+                self.dict_sweepts[rec] = dfsweept
+                return dfsweept
+        dfsweept = recording_pipeline.build_dfsweept(
+            dfsource,
+            self.get_dfmean(row),
+            dft,
+            default_dict_t=self.uistate.project.default_dict_t.copy(),
+            filter_val=row["filter"],
+            n_jobs=parse.N_JOBS,
+        )
+        print(f"get_dfsweept: {rec}, {dfsweept['sweep'].nunique()} {'bins' if binned else 'sweeps'}, timepoint drift:")
+        print(analysis.timepoint_drift(dfsweept).to_string(index=False))
+        self.dict_sweepts[rec] = dfsweept
+        self.df2file(df=dfsweept, filename=rec, key="timepoints_sweep")
+        return dfsweept
+
     # ------------------------------------------------------------------
     # Output DataFrame
     # ------------------------------------------------------------------
@@ -365,7 +432,7 @@ class DataFrameMixin:
         bin_active = pd.notna(row["bin_size"])
         cache_key = recording_cache.output_cache_key(bin_active=bin_active)
         if rec in self.dict_outputs and not reset:  # 1: Return cached (re-join µA each time)
-            return self._join_stim_intensity(row, self.dict_outputs[rec])
+            return self._join_stim_intensity(row, self._normalized_output(rec, self.dict_outputs[rec], cached=True))
         str_output_path = recording_cache.output_parquet_path(
             self.dict_folders["cache"], rec, bin_active=bin_active
         )
@@ -396,9 +463,20 @@ class DataFrameMixin:
             # Persist the clean version to disk (measurements only; µA joined below).
             self.df2file(df=dfoutput, filename=rec, key=cache_key)
         # Cache measurements without depending on CSV; join µA on every return.
-        self.dict_outputs[rec] = dfoutput
+        dfoutput = self._normalized_output(rec, dfoutput)
         return self._join_stim_intensity(row, dfoutput)
 
+    def _normalized_output(self, rec, dfoutput, cached=False):
+        # *_norm columns are derived on read from EPSP_amp/EPSP_slope and the project norm range, and
+        # memoized per recording on that range: changing the range re-divides, nothing is rebuilt or re-persisted.
+        # cached=True: dfoutput is dict_outputs[rec], normalized for dict_output_norms[rec].
+        norm_range = (self.uistate.project.lineEdit["norm_EPSP_from"], self.uistate.project.lineEdit["norm_EPSP_to"])
+        if not cached or self.dict_output_norms.get(rec) != norm_range:
+            dfoutput = analysis.normalize_output(dfoutput, *norm_range)
+            self.dict_output_norms[rec] = norm_range
+        self.dict_outputs[rec] = dfoutput
+        return dfoutput
+
     # ------------------------------------------------------------------
     # Raw data DataFrame
     # ------------------------------------------------------------------
@@ -410,7 +488,7 @@ class DataFrameMixin:
             return self.dict_datas[recording_name]
         path_data = Path(recording_cache.data_parquet_path(self.dict_folders["data"], recording_name))
         try:  # 2: Read from file - datafile should always exist
-            dfdata = pd.read_parquet(path_data)
+            dfdata = data_parquet.read_df(path_data)
             self.dict_datas[recording_name] = dfdata
             return self.dict_datas[recording_name]
         except FileNotFoundError:
@@ -426,8 +504,11 @@ class DataFrameMixin:
         recording_name = row["recording_name"]
         persist = False
 
+        live = getattr(self, "_live", None)  # folder being watched; see ParseMixin.watchFolderStart
         if recording_name in self.dict_filters:  # 1: Return cached
             dffilter = self.dict_filters[recording_name]
+        elif live is not None and live.recording_name == recording_name and live.dffilter is not None:  # 1b: Live batches, joined on read
+            dffilter = live.dffilter
         else:
             path_filter = Path(recording_cache.filter_parquet_path(self.dict_folders["cache"], recording_name))
             if Path(path_filter).exists():  # 2: Read from file
@@ -485,22 +566,7 @@ class DataFrameMixin:
             else:
                 bin_size = int(p_row["bin_size"])
                 df_filter = self.get_dffilter(p_row)
-                max_sweep = df_filter["sweep"].max()
-                num_bins = (max_sweep // bin_size) + 1
-                binned_data = []
-                for bin_num in range(num_bins):
-                    sweep_start = bin_num * bin_size
-                    sweep_end = sweep_start + bin_size
-                    df_bin = df_filter[(df_filter["sweep"] >= sweep_start) & (df_filter["sweep"] < sweep_end)]
-                    if df_bin.empty:
-                        continue
-                    agg_funcs = {col: "mean" for col in df_bin.columns if col not in ["sweep", "time"]}
-                    agg_funcs["time"] = "first"  # Keep the first time value as representative
-                    df_bin_grouped = df_bin.groupby("time", as_index=False).agg(agg_funcs)
-                    # Assign the bin number as the new sweep value
-                    df_bin_grouped["sweep"] = bin_num
-                    binned_data.append(df_bin_grouped)
-                df_bins = pd.concat(binned_data, ignore_index=True)
+                df_bins = recording_pipeline.build_dfbin(df_filter, bin_size)
                 persist = True
                 print(f"recalculate: {rec}, binned {df_filter['sweep'].nunique()} sweeps into {len(df_bins['sweep'].unique())} bins")
 
@@ -1157,52 +1223,11 @@ class DataFrameMixin:
     # ------------------------------------------------------------------
 
     def set_uniformTimepoints(self, p_row=None, dft=None, dfoutput=None):  # NB: requires both dfoutput and df_t to be present!
-        variables = [
-            "t_volley_amp",
-            "t_volley_slope_start",
-            "t_volley_slope_end",
-            "t_EPSP_amp",
-            "t_EPSP_slope_start",
-            "t_EPSP_slope_end",
-        ]
-        methods = [
-            "t_volley_amp_method",
-            "t_volley_slope_method",
-            "t_EPSP_amp_method",
-            "t_EPSP_slope_method",
-        ]
-        params = [
-            "t_volley_amp_params",
-            "t_volley_slope_params",
-            "t_EPSP_amp_params",
-            "t_EPSP_slope_params",
-        ]
-
         def use_t_from_stim_with_max(p_row, df_t, dfoutput, column):
             # find highest EPSP_slope in df_output and apply uniform timepoints to all stims
             print(f" - use_t_from_stim_with_max called with df_t:\n{df_t}")
             precision = self.uistate.project.settings["precision"]
-            if column in dfoutput.columns:
-                print(f"dfoutput:\n{dfoutput}")
-                idx_max_EPSP = dfoutput[column].idxmax()
-                print(f"idx_max_EPSP: {idx_max_EPSP}")
-                stim_max = dfoutput.loc[idx_max_EPSP, "stim"]
-                print(f"stim_max: {stim_max}")
-                t_template_row = df_t[df_t["stim"] == stim_max].copy()
-                print(f"t_template_row: {t_template_row}")
-                t_stim = round(t_template_row["t_stim"].values[0], precision)
-                for var in variables:
-                    t_template_row[var] = round(t_template_row[var].values[0] - t_stim, precision)
-                if "stim" not in df_t.columns:
-                    df_t["stim"] = None
-                for i, row_t in df_t.iterrows():
-                    df_t.at[i, "stim"] = i + 1  # stims numbered from 1
-                    for var in variables:
-                        df_t.at[i, var] = round(t_template_row[var].values[0] + row_t["t_stim"], precision)
-                    for method in methods:
-                        df_t.at[i, method] = f"=stim_{stim_max}"
-                    for param in params:
-                        df_t.at[i, param] = f"=stim_{stim_max}"
+            if recording_pipeline.apply_uniform_timepoints(df_t, dfoutput, precision=precision, column=column) is not None:
                 print(f"Uniform timepoints applied to {p_row['recording_name']}.")
                 self.set_dft(p_row["recording_name"], df_t)
                 dfoutput = self.get_dfoutput(p_row, reset=True)
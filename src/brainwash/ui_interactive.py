@@ -5,7 +5,7 @@ import numpy as np
 import pandas as pd
 from PyQt5 import QtCore, QtGui, QtWidgets
 
-from brainwash_ui import plot_drag, plot_series
+from brainwash_ui import plot_drag, plot_series, recording_pipeline
 from brainwash import analysis_v3 as analysis
 from brainwash import ui_plot
 
@@ -925,6 +925,7 @@ class InteractivePlotMixin:
                 method_field = values[0]
                 aspect = values[1]
                 dict_t_updates = values[2]
+                fields = list(dict_t_updates)  # the dft fields this drag changed
                 update_function = values[3]
                 dict_t_updates[method_field] = "manual"
                 dict_t_updates.update(
@@ -961,8 +962,6 @@ class InteractivePlotMixin:
             dffilter = self.get_dfbin(prow)
         else:
             dffilter = self.get_dffilter(row=prow)
-        stim_num = trow_temp["stim"]
-
         n_stims = prow["stims"]
         if not self.uistate.project.checkBox["timepoints_per_stim"] and n_stims > 1:
             dft_to_update = self.uistate.plot.dft_temp.copy()
@@ -972,73 +971,23 @@ class InteractivePlotMixin:
             dft_to_update = self.uistate.plot.dft_temp.iloc[[stim_idx]].copy()
             dft_to_update.update(pd.DataFrame([dict_t_updates]))
 
-        rec_filter = prow.get("filter")
-        if pd.isna(rec_filter) or not rec_filter or rec_filter == "none":
-            rec_filter = "voltage"
-
-        new_dfoutput = analysis.build_dfoutput(
-            dffilter=dffilter,
-            dfmean=dfmean,
-            dft=dft_to_update,
-            filter=rec_filter,
+        # Re-measure only the columns the changed fields affect, for the stims in dft_to_update;
+        # their sweep rows, _norm columns and stim-mode rows are patched.
+        dfoutput = recording_pipeline.update_dfoutput_from_inputs(
+            dfoutput,
+            dffilter,
+            dfmean,
+            dft_to_update,
+            fields,
+            filter_val=prow.get("filter"),
         )
-        # print(f"dfoutput: {dfoutput}")
-        # update volley means
-        if aspect == "volley amp":
-            if not self.uistate.project.checkBox["timepoints_per_stim"] and n_stims > 1:
-                for s in new_dfoutput["stim"].unique():
-                    dft_temp.loc[dft_temp["stim"] == s, "volley_amp_mean"] = new_dfoutput[new_dfoutput["stim"] == s]["volley_amp"].mean()
-            else:
-                dft_temp.loc[dft_temp.index[stim_idx], "volley_amp_mean"] = new_dfoutput["volley_amp"].mean()
-        elif aspect == "volley slope":
-            if not self.uistate.project.checkBox["timepoints_per_stim"] and n_stims > 1:
-                for s in new_dfoutput["stim"].unique():
-                    dft_temp.loc[dft_temp["stim"] == s, "volley_slope_mean"] = new_dfoutput[new_dfoutput["stim"] == s]["volley_slope"].mean()
-            else:
-                dft_temp.loc[dft_temp.index[stim_idx], "volley_slope_mean"] = new_dfoutput["volley_slope"].mean()
-
-        if self.uistate.project.checkBox["timepoints_per_stim"] or n_stims == 1:
-            new_dfoutput["stim"] = int(stim_num)
-
-        dfoutput.set_index(["stim", "sweep"], inplace=True)
-        new_dfoutput.set_index(["stim", "sweep"], inplace=True)
-        dfoutput = dfoutput.astype(float)
-        new_dfoutput = new_dfoutput.astype(float)
-        dfoutput.update(new_dfoutput)
-        dfoutput.reset_index(inplace=True)
-        new_dfoutput.reset_index(inplace=True)
-
-        # --- 8.4: Refresh the stim-mode row (sweep==NaN) for this stim ---
-        # build_dfoutput with dft_single (len=1) only produces sweep-mode rows.
-        # Re-measure dfmean around the stim window so the stim-mode aggregate
-        # reflects the new timepoints after the drag.
-        if len(dft_temp) > 1:
-            stims_to_update = dft_to_update["stim"].tolist()
-            for s_num in stims_to_update:
-                dict_t_stim = dft_to_update[dft_to_update["stim"] == s_num].iloc[0].to_dict()
-                t_stim = dict_t_stim.get("t_stim", 0.0)
-                t_win_start = t_stim - 0.002
-                t_win_end = dict_t_stim.get("t_EPSP_amp", t_stim + 0.01) + dict_t_stim.get(
-                    "t_EPSP_amp_width",
-                    2 * dict_t_stim.get("t_EPSP_amp_halfwidth", 0.001),
-                )
-                snippet = dfmean[(dfmean["time"] >= t_win_start) & (dfmean["time"] <= t_win_end)].copy().reset_index(drop=True)
-                measured = analysis.measure_waveform(snippet, dict_t_stim, filter=prow.get("filter", "voltage"))
-                # Update the stim-mode row in dfoutput
-                stim_mask = (dfoutput["stim"] == int(s_num)) & dfoutput["sweep"].isna()
-                if stim_mask.any():
-                    for col, val in measured.items():
-                        if col in dfoutput.columns:
-                            dfoutput.loc[stim_mask, col] = val
-                else:
-                    # Stim-mode row doesn't exist yet (shouldn't happen, but be safe)
-                    stim_row = {"stim": int(s_num), "sweep": np.nan}
-                    stim_row.update(measured)
-                    stim_row["EPSP_amp_norm"] = np.nan
-                    stim_row["EPSP_slope_norm"] = np.nan
-                    dfoutput = pd.concat([dfoutput, pd.DataFrame([stim_row])], ignore_index=True)
-
-        self.persistOutput(rec_name=rec_name, dfoutput=dfoutput, p_row=prow)
+        # update volley means (backfilled into dft_to_update)
+        if aspect in ("volley amp", "volley slope"):
+            col = "volley_amp_mean" if aspect == "volley amp" else "volley_slope_mean"
+            for _, t_row in dft_to_update.iterrows():
+                dft_temp.loc[dft_temp["stim"] == t_row["stim"], col] = t_row[col]
+
+        dfoutput = self.persistOutput(rec_name=rec_name, dfoutput=dfoutput, p_row=prow)
         self.uiplot.updateStimLines(rec_name=rec_name, dfoutput=self.V2mV(dfoutput))
 
         self.set_dft(rec_name, dft_temp)
@@ -130,6 +130,15 @@ class MenuMixin:
         self.actionParse.setShortcut("Ctrl+I")
         self.menuData.addAction(self.actionParse)
 
+        self.actionWatchFolder = QtWidgets.QAction("Watch acquisition folder")
+        self.actionWatchFolder.setCheckable(True)
+        self.actionWatchFolder.triggered.connect(self.triggerWatchFolder)
+        self.menuData.addAction(self.actionWatchFolder)
+
+        self.actionDetectEvents = QtWidgets.QAction("Detect events (selected, or all)")
+        self.actionDetectEvents.triggered.connect(self.triggerDetectEvents)
+        self.menuData.addAction(self.actionDetectEvents)
+
         self.actionDelete = QtWidgets.QAction("Delete selected data")
         self.actionDelete.triggered.connect(self.triggerDelete)
         self.actionDelete.setShortcut("DEL")
@@ -14,15 +14,16 @@ from __future__ import annotations
 import logging
 import os
 import re
+import shutil
 import time
 from pathlib import Path
 
 import pandas as pd
 from PyQt5 import QtCore, QtWidgets
 
-import parse
 import ui_widgets  # for ParseDataThread, ProgressBarManager, Filetreesub etc. (consistent with ui_table, ui_graph)
-import uuid
+from brainwash_ui import live_import, recording_import, source_fingerprint
+from project_schema import df_projectTemplate
 
 # ---------------------------------------------------------------------------
 # Uses self.uistate / self.config / self.uiplot on UIsub (see ui.py).
@@ -88,7 +89,9 @@ class ParseMixin:
 
         def removeFromDisk(folder_name, file_suffix):
             file_path = Path(self.dict_folders[folder_name] / (rec_name + file_suffix))
-            if file_path.exists():
+            if file_path.is_dir():  # parquet dataset written by live_import
+                shutil.rmtree(file_path)
+            elif file_path.exists():
                 file_path.unlink()
             else:
                 print(f"purgeRecordingData: file not found: {file_path}")
@@ -111,6 +114,8 @@ class ParseMixin:
             "dict_filters",
             "dict_bins",
             "dict_outputs",
+            "dict_output_norms",
+            "dict_sweepts",
             "dict_diffs",
         ]:
             removeFromCache(cache_name)
@@ -121,8 +126,10 @@ class ParseMixin:
             ("cache", "_filter.parquet"),
             ("cache", "_bin.parquet"),
             ("cache", "_output.parquet"),
+            ("cache", "_timepoints_sweep.parquet"),
         ]:
             removeFromDisk(folder_name, file_suffix)
+        source_fingerprint.forget_recordings(self.dict_folders["project"], [rec_name])
 
     def parseData(self):
         if hasattr(self, "_current_parse_thread") and self._current_parse_thread is not None:
@@ -198,6 +205,93 @@ class ParseMixin:
     def triggerParse(self):  # parse non-parsed files and folders in self.df_project
         self.parseData()
 
+    # ------------------------------------------------------------------
+    # Watch folder (live acquisition)
+    # ------------------------------------------------------------------
+
+    def triggerWatchFolder(self, checked=False):
+        if not checked:
+            self.watchFolderStop()
+            return
+        folder = QtWidgets.QFileDialog.getExistingDirectory(self.mainwindow, "Watch acquisition folder", str(self.user_documents))
+        if not folder:
+            self.actionWatchFolder.setChecked(False)
+            return
+        self.watchFolderStart(folder)
+
+    def watchFolderStart(self, folder):
+        # Adds folder as a recording and appends its new .ibw/.abf files as sweeps every POLL_INTERVAL_MS.
+        self.watchFolderStop()
+        dfAdd = df_projectTemplate()
+        dfAdd["path"] = [str(folder)]
+        dfAdd["host"] = str(self.fqdn)
+        dfAdd["filter"] = "voltage"
+        dfAdd["recording_name"] = [os.path.basename(os.path.dirname(folder)) + "_" + os.path.basename(folder)]
+        self.addData(dfAdd)
+        p_row = self.get_df_project().iloc[-1]  # addData appends, possibly renamed for uniqueness
+        self._live = live_import.LiveRecording(
+            folder,
+            p_row["recording_name"],
+            data_folder=self.dict_folders["data"],
+            cache_folder=self.dict_folders["cache"],
+            gain=self.uistate.project.lineEdit["import_gain"],
+            persist=not self.config.transient,
+        )
+        self._live_ID = p_row["ID"]
+        self._live_timer = QtCore.QTimer(self.mainwindow)
+        self._live_timer.timeout.connect(self.watchFolderTick)
+        self._live_timer.start(live_import.POLL_INTERVAL_MS)
+        print(f"watchFolderStart: watching {folder} as {p_row['recording_name']}")
+        self.watchFolderTick()
+
+    def watchFolderStop(self):
+        timer = getattr(self, "_live_timer", None)
+        if timer is not None:
+            timer.stop()
+            print(f"watchFolderStop: stopped watching {self._live.folder}")
+        self._live_timer = None
+        self._live = None
+
+    def watchFolderTick(self):
+        live = getattr(self, "_live", None)
+        if live is None:
+            return
+        df_p = self.get_df_project()
+        mask = df_p["ID"] == self._live_ID
+        if not mask.any():  # recording deleted, or another project loaded
+            self.watchFolderStop()
+            return
+        rec = live.recording_name
+        try:
+            n_new = live.update(dft=self.dict_ts.get(rec), dfoutput=self.dict_outputs.get(rec))
+        except Exception as e:
+            logger.exception(f"watchFolderTick: {rec}: {e}")
+            return
+        if not n_new:
+            return
+        idx = df_p.index[mask][0]
+        dict_meta = live.metadata()
+        df_p.loc[idx, "sweeps"] = dict_meta["nsweeps"]
+        df_p.loc[idx, "sweep_duration"] = dict_meta["sweep_duration"]
+        df_p.loc[idx, "sampling_rate"] = dict_meta["sampling_rate"]
+        df_p.loc[idx, "sweep_hz"] = dict_meta["sweep_hz"] if dict_meta["sweep_hz"] is not None else float("nan")
+        df_p.loc[idx, "gain"] = live.gain
+        df_p.loc[idx, "status"] = "Read|live"
+        self.set_df_project(df_p)
+        p_row = df_p.loc[idx]
+        # Raw data is read back from its parquet dataset on demand, and dffilter from live (get_dffilter) when next needed.
+        self.dict_datas.pop(rec, None)
+        self.dict_bins.pop(rec, None)
+        self.dict_filters.pop(rec, None)
+        self.dict_means[rec] = live.dfmean
+        if rec in self.dict_ts and live.dfoutput is not None and pd.isna(p_row["bin_size"]):
+            self.persistOutput(rec, live.dfoutput, p_row=p_row)
+        else:
+            self.dict_outputs.pop(rec, None)  # first data, or binned: built in full by get_dft/get_dfoutput
+        self.uiplot.unPlot(p_row["ID"])
+        self.graphUpdate(row=p_row)
+        self.tableUpdate(restore_selection=True)
+
     def reanalyze_recordings(self):
         if not self.uistate.plot.list_idx_select_recs:
             print("No recordings selected for reanalysis.")
@@ -237,45 +331,16 @@ class ParseMixin:
         ]:
             src = Path(self.dict_folders[folder]) / (source_p_row["recording_name"] + suffix)
             dst = Path(self.dict_folders[folder]) / (new_name + suffix)
-            if src.exists():
-                import shutil
+            if src.is_dir():  # parquet dataset written by live_import
+                shutil.copytree(src, dst)
+            elif src.exists():
                 shutil.copy(src, dst)
         self.tableUpdate(restore_selection=True)
         print(f"Duplicated {source_p_row['recording_name']} as {new_name}")
 
-    def create_recording(self, df_proj_row, rec, df_raw, status_callback=None):
-        def create_row(df_proj_row, new_name, dict_meta):
-            df_proj_new_row = df_proj_row.copy()
-            df_proj_new_row["ID"] = str(uuid.uuid4())
-            df_proj_new_row["recording_name"] = new_name
-            df_proj_new_row["gain"] = self.uistate.project.lineEdit["import_gain"]  # capture gain at parse time
-            df_proj_new_row["sweeps"] = dict_meta.get("nsweeps", None)
-            df_proj_new_row["channel"] = ""  # dict_meta.get('channel', None)
-            df_proj_new_row["sweep_duration"] = dict_meta.get("sweep_duration", None)
-            df_proj_new_row["sampling_rate"] = dict_meta.get("sampling_rate", None)
-            df_proj_new_row["resets"] = ""  # dict_meta.get('resets', None)
-            # sweep_hz: inter-sweep rate derived from t0 timestamps; NaN if unavailable
-            sweep_hz = dict_meta.get("sweep_hz", None)
-            df_proj_new_row["sweep_hz"] = sweep_hz if sweep_hz is not None else float("nan")
-            # Build pipe-delimited status flags; append "default Hz" when sweep_hz is absent
-            status_flags = ["Read"]
-            if sweep_hz is None:
-                status_flags.append("default Hz")
-            df_proj_new_row["status"] = "|".join(status_flags)
-            return df_proj_new_row
-
-        if status_callback:
-            status_callback("building dataframe...")
-        self.df2file(df=df_raw, filename=rec, key="data")  # persist raws
-        dfmean, i_stim = parse.build_dfmean(df_raw)
-        if status_callback:
-            status_callback("writing to disk...")
-        self.df2file(df=dfmean, filename=rec, key="mean")  # persist mean
-        df = parse.zeroSweeps(df_raw, i_stim=i_stim)
-        self.df2file(df=df, filename=rec, key="filter")  # persist zeroed
-        dict_meta = parse.metadata(df)  # extract metadata
-        df_proj_new_row = create_row(df_proj_row=df_proj_row, new_name=rec, dict_meta=dict_meta)
-        return df_proj_new_row
+    def create_recording_row(self, df_proj_row, new_name, dict_meta):
+        # capture gain at parse time
+        return recording_import.recording_row(df_proj_row, new_name, dict_meta, gain=self.uistate.project.lineEdit["import_gain"])
 
     def deleteSelectedRows(self):
         # moved some purge logic here too for parse flow
@@ -26,7 +26,8 @@ from PyQt5 import QtCore, QtWidgets
 
 import brainwash.parse as parse
 import ui_widgets
-from project_schema import INT_COLUMNS, df_projectTemplate
+from brainwash_ui import data_parquet, recording_cache, recording_pipeline, source_fingerprint
+from project_schema import df_projectTemplate, normalize_df_project, read_df_project
 
 logger = logging.getLogger(__name__)
 
@@ -65,8 +66,7 @@ class ProjectMixin:
             print(f"Warning: The following columns in column_order don't exist in dfoutput: {missing_columns}")
         if extra_columns:
             print(f"Warning: The following columns exist in dfoutput but not in column_order: {extra_columns}")
-        dfoutput = dfoutput.reindex(columns=column_order)
-        self.dict_outputs[rec_name] = dfoutput
+        dfoutput = self._normalized_output(rec_name, dfoutput.reindex(columns=column_order))
         # Select cache key based on bin state (Phase 6).
         if p_row is not None and pd.notna(p_row["bin_size"]):
             cache_key = "output_bin"
@@ -81,6 +81,7 @@ class ProjectMixin:
                 self._invalidate_global_units_for_rec(rec_id)
             except Exception:
                 pass
+        return dfoutput  # as cached: column order and _norm columns for the current norm range
 
     # ------------------------------------------------------------------
     # Bootstrapping — general (non-project-specific) UI init
@@ -220,18 +221,14 @@ class ProjectMixin:
         if self.config.transient:
             return
         self.dict_folders["cache"].mkdir(exist_ok=True)
-        filetype = "parquet"
-        if key is None:
-            filepath = f"{self.dict_folders['cache']}/{filename}.{filetype}"
-        elif key == "timepoints":
-            filepath = f"{self.dict_folders['timepoints']}/{filename}.{filetype}"
-        elif key == "data":
-            filepath = f"{self.dict_folders['data']}/{filename}.{filetype}"
+        if key == "data":
             self.dict_folders["data"].mkdir(exist_ok=True)
-        else:
-            filepath = f"{self.dict_folders['cache']}/{filename}_{key}.{filetype}"
+        filepath = recording_cache.df_parquet_path(self.dict_folders, filename, key)
 
-        df.to_parquet(filepath, index=False)
+        if key == "data":
+            data_parquet.write_df(filepath, df)  # compact layout; see brainwash_ui.data_parquet
+        else:
+            df.to_parquet(filepath, index=False)
         print(f"saved {filepath}")
 
     # ------------------------------------------------------------------
@@ -309,31 +306,7 @@ class ProjectMixin:
         if df is None:
             self.df_project = df_projectTemplate()
         else:
-            # Restore nullable-integer dtypes that pd.concat can degrade to
-            # object when mixing Int64 rows with newly-parsed Series rows.
-            for col in INT_COLUMNS:
-                if col in df.columns:
-                    df[col] = df[col].astype(pd.Int64Dtype())
-            # sweeps is a mixed-type sentinel column: unparsed rows hold the
-            # string "..." while parsed rows hold a numeric sweep count.
-            # pd.concat can coerce the numeric values to strings (e.g. "1440")
-            # when object-dtype rows are concatenated with Int64 rows.
-            # Restore: convert anything that looks numeric back to int, leave
-            # "..." strings alone.
-            if "sweeps" in df.columns:
-
-                def _coerce_sweeps(v):
-                    if v == "...":
-                        return v
-                    try:
-                        return int(v)
-                    except (TypeError, ValueError):
-                        return v
-
-                df["sweeps"] = df["sweeps"].apply(_coerce_sweeps)
-
-            # v0.16_n: enforce hierarchy defaults (new projects, imports, bulk edits)
-            df = self._migrate_hierarchy(df)
+            df = normalize_df_project(df)
             self.df_project = df
         self.save_df_project()
         if hasattr(self, "tableUpdate"):
@@ -348,29 +321,7 @@ class ProjectMixin:
         self.projects_folder = path_projectfolder.parent
         print(f"load_df_project: {self.projectname}")
         self.dict_folders = self.build_dict_folders()
-        self.df_project = pd.read_csv(str(path_projectfolder / "project.brainwash"), dtype={"group_IDs": str})
-        # Backfill any columns added to the schema since this project was last saved
-        for col in df_projectTemplate().columns:
-            if col not in self.df_project.columns:
-                self.df_project[col] = None
-        # Restore nullable-integer dtypes lost during CSV round-trip (CSV
-        # reads integer-with-NaN columns as float64, producing "1.0" display).
-        for col in INT_COLUMNS:
-            if col in self.df_project.columns:
-                self.df_project[col] = self.df_project[col].astype(pd.Int64Dtype())
-
-        # Ensure filter_params is an object column to accept dicts/json
-        if "filter_params" in self.df_project.columns:
-            self.df_project["filter_params"] = self.df_project["filter_params"].astype(object)
-
-        # Ensure filter column defaults to "voltage" instead of NaN, None, or "none"
-        if "filter" in self.df_project.columns:
-            self.df_project["filter"] = self.df_project["filter"].fillna("voltage")
-            self.df_project.loc[self.df_project["filter"] == "none", "filter"] = "voltage"
-            self.df_project.loc[self.df_project["filter"] == "", "filter"] = "voltage"
-
-        # v0.16_n: enforce statistical_protocol defaults (subject/slice hierarchy)
-        self.df_project = self._migrate_hierarchy(self.df_project)
+        self.df_project = read_df_project(path_projectfolder)
 
         self._backfill_sweep_hz()
         self.uistate.load_cfg(self.dict_folders["project"], self.config.version)
@@ -400,13 +351,12 @@ class ProjectMixin:
             if not path_data.exists():
                 continue
             try:
-                # Read only the columns needed — fast even for large files.
-                schema = pq.read_schema(str(path_data))
-                available = set(schema.names)
-                if "sweep" not in available or "datetime" not in available:
-                    continue
-                df_raw = pd.read_parquet(str(path_data), columns=["sweep", "datetime"])
-                sweep_hz = parse.compute_sweep_hz(df_raw)
+                # Read only the per-sweep start times — fast even for large files.
+                if not data_parquet.is_compact(path_data):
+                    available = set(pq.read_schema(str(path_data)).names)
+                    if "sweep" not in available or "datetime" not in available:
+                        continue
+                sweep_hz = parse.compute_sweep_hz(data_parquet.read_sweep_datetimes(path_data))
                 if sweep_hz is not None:
                     df_p.at[idx, "sweep_hz"] = sweep_hz
                     # Clear the "default Hz" status flag.
@@ -419,60 +369,6 @@ class ProjectMixin:
             print(f"_backfill_sweep_hz: computed sweep_hz for {updated} recording(s)")
             self.save_df_project()
 
-    def _migrate_hierarchy(self, df: pd.DataFrame) -> pd.DataFrame:
-        """v0.16_n: Apply statistical_protocol defaults on load/import.
-
-        - Adds 'subject'/'slice' columns if missing (backcompat).
-        - Lowest-unique-integer subjects (respects manual values; fills gaps).
-        - Default slice="1" (one-slice-per-animal assumption).
-        - Uses string dtype for both (flexible labels; Option A from plan).
-        - Called from load_df_project, set_df_project, and import paths.
-        """
-        if "subject" not in df.columns:
-            df["subject"] = None
-        if "slice" not in df.columns:
-            df["slice"] = None
-
-        # Force string dtype (prevents int64 inference from numeric defaults like "1"/"2")
-        for col in ("subject", "slice"):
-            if df[col].dtype != "object" and not pd.api.types.is_string_dtype(df[col]):
-                df[col] = df[col].astype("object")
-
-        # Canonical string keys so stats n_unit collapse treats 1 / "1" / 1.0 as one subject
-        try:
-            from brainwash_stats.data import _normalize_hierarchy_key
-        except Exception:
-            _normalize_hierarchy_key = lambda v: None if pd.isna(v) else str(v).strip()
-
-        for i, row in df.iterrows():
-            for hcol in ("subject", "slice"):
-                raw = row.get(hcol)
-                if pd.isna(raw) or str(raw).strip() == "":
-                    continue
-                canon = _normalize_hierarchy_key(raw)
-                if canon is not None:
-                    df.at[i, hcol] = canon
-
-        # Lowest-unique-integer subjects (string)
-        existing_subs = set()
-        for s in df["subject"].dropna().unique():
-            c = _normalize_hierarchy_key(s)
-            if c is not None:
-                existing_subs.add(c)
-        next_id = 1
-        for i, row in df.iterrows():
-            subj = row.get("subject")
-            if pd.isna(subj) or str(subj).strip() == "":
-                while str(next_id) in existing_subs:
-                    next_id += 1
-                df.at[i, "subject"] = str(next_id)
-                existing_subs.add(str(next_id))
-                next_id += 1
-            slc = row.get("slice")
-            if pd.isna(slc) or str(slc).strip() == "":
-                df.at[i, "slice"] = "1"
-        return df
-
     def save_df_project(self):  # writes df_project to .csv
         path = self.dict_folders["project"] / "project.brainwash"
         self.df_project.to_csv(str(path), index=False)
@@ -1168,8 +1064,6 @@ class ProjectMixin:
             print(f"new_recording_name {new_recording_name} is not a valid filename")
 
     def rename_files_by_rec_name(self, old_name, new_name):
-        from brainwash_ui import recording_cache
-
         for folder_name, file_suffix in [
             ("data", ".parquet"),
             ("timepoints", ".parquet"),
@@ -1185,6 +1079,7 @@ class ProjectMixin:
             elif folder_name == "data":
                 print(f"recording_rename_files: file not found: {old_file_path}")
                 raise FileNotFoundError
+        source_fingerprint.forget_recordings(self.dict_folders["project"], [old_name])  # its data parquet no longer sits at the indexed path
         # Stim intensity: path helper strips a redundant .csv so we never get .csv.csv
         if "stim_intensity" in self.dict_folders:
             old_si = Path(recording_cache.stim_intensity_csv_path(str(self.dict_folders["stim_intensity"]), old_name))
@@ -1200,31 +1095,25 @@ class ProjectMixin:
     def set_rec_status(self, rec_name=None):  # TODO: should run on ID - not name!
         # Updates df_project['status'] to 'manual' if there is a single manual point, else 'default' if there is a default point, else 'auto'
         # TODO: expand this to cover more issues with recordings and specify algorithm used.
-        def status(rec_name, dfp, marker_list):
+        def status(rec_name, dfp):
             prow = dfp[dfp["recording_name"] == rec_name]
             if isinstance(prow, pd.DataFrame):
                 p_series = prow.iloc[0]
             else:
                 p_series = prow
-            dft = self.get_dft(p_series)
-            for marker in marker_list:
-                if marker in dft.values:
-                    dfp.loc[dfp["recording_name"] == rec_name, "status"] = marker
-                    logger.debug("set_rec_status: %s set to status = '%s'", rec_name, marker)
-                    print(f"set_rec_status: {rec_name} set to status = '{marker}'")
-                    return
-            dfp.loc[dfp["recording_name"] == rec_name, "status"] = "auto"
-            return
+            marker = recording_pipeline.timepoints_status(self.get_dft(p_series))
+            dfp.loc[dfp["recording_name"] == rec_name, "status"] = marker
+            if marker != "auto":
+                logger.debug("set_rec_status: %s set to status = '%s'", rec_name, marker)
+                print(f"set_rec_status: {rec_name} set to status = '{marker}'")
 
-        # in order of priority, look for these markers in the timepoints dataframe
-        marker_list = ["manual", "default"]
         dfp = self.get_df_project()
 
         if rec_name is not None:
-            status(rec_name, dfp, marker_list)
+            status(rec_name, dfp)
         else:
             for i, row in dfp.iterrows():
-                status(row["recording_name"], dfp, marker_list)
+                status(row["recording_name"], dfp)
 
         self.set_df_project(dfp)
         # tableUpdate() touches Qt widgets and must only run on the GUI thread.
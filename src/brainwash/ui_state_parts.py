@@ -85,6 +85,8 @@ class ProjectPersistedState:
             "alpha_mark": 0.4,
             "alpha_line": 1,
             "journal_export": "jneurosci",
+            "timepoints_per_sweep": False,
+            "import_memory_mb": 1024,  # RAM for parsing sources, shared by all import workers
         }
         self.zoom = {
             "mean_xlim": (0, 1),
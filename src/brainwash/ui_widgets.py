@@ -25,6 +25,7 @@ from matplotlib.figure import Figure
 
 # brainwash
 import parse
+from brainwash_ui import event_detection, recording_import, source_fingerprint
 from project_schema import df_projectTemplate
 
 logger = logging.getLogger(__name__)
@@ -463,57 +464,138 @@ class ParseDataThread(QtCore.QThread):
         self.total = len(df_p_to_update)
 
     def run(self):
-        """Parse data from files, persist them as bw parquet:s, and update df_p"""
+        """Parse data from files, persist them as bw parquet:s, and update df_p
+
+        Sources whose fingerprint (files + import options) is already in the project's
+        fingerprint index are imported by copying their earlier parquets instead of re-parsing.
+        A single pending source is read in this thread (its .ibw folder is itself read in
+        parallel, with per-file sub_progress). Several sources are fanned out across a
+        process pool; workers write the data/mean/filter parquets and return metadata only.
+        """
         try:
-            for i, (_, df_proj_row) in enumerate(self.df_p_to_update.iterrows()):
-                recording_name = df_proj_row["recording_name"]
-                source_path = df_proj_row["path"]
-                self.progress.emit(i)
-                split_odd_even = self.uisub.uistate.project.checkBox.get("splitOddEven", False)
-                split_at_time = self.uisub.uistate.project.lineEdit.get("split_at_time", 0) or None
-
-                def _sub_progress_callback(idx, total):
-                    self.sub_progress.emit(idx, total)
-
-                def _status_callback(text):
-                    self.status_update.emit(text)
-
-                dict_dfs_raw = parse.source2dfs(
-                    source=source_path,
-                    gain=self.uisub.uistate.project.lineEdit["import_gain"],
-                    split_odd_even=split_odd_even,
-                    split_at_time=split_at_time,
-                    progress_callback=_sub_progress_callback,
-                )
-                if not dict_dfs_raw:
-                    print(f"Failed to read source file at: {source_path}")
+            project = self.uisub.uistate.project
+            options = {
+                "data_folder": self.dict_folders["data"],
+                "cache_folder": self.dict_folders["cache"],
+                "gain": project.lineEdit["import_gain"],
+                "split_odd_even": project.checkBox.get("splitOddEven", False),
+                "split_at_time": project.lineEdit.get("split_at_time", 0) or None,
+                "persist": not self.uisub.config.transient,
+                "memory_budget": recording_import.memory_budget(project.settings),
+            }
+            proj_rows = [df_proj_row for _, df_proj_row in self.df_p_to_update.iterrows()]
+            jobs = [(df_proj_row["path"], df_proj_row["recording_name"]) for df_proj_row in proj_rows]
+            results_by_job = {}
+            fingerprints = {}
+            if options["persist"]:
+                index = source_fingerprint.load_index(self.dict_folders["project"])
+                fp_options = {k: options[k] for k in ("gain", "split_odd_even", "split_at_time")}
+                for i, (source_path, recording_name) in enumerate(jobs):
+                    try:
+                        fingerprints[i] = source_fingerprint.source_fingerprint(source_path, **fp_options)
+                    except OSError as e:
+                        print(f"ParseDataThread: no fingerprint for {source_path}: {e}")
+                        continue
+                    entry = source_fingerprint.lookup(index, fingerprints[i], options["data_folder"])
+                    if entry is not None:
+                        print(f"ParseDataThread: {source_path} unchanged, reusing {entry['recording_name']}")
+                        results_by_job[i] = recording_import.reuse_source(
+                            entry, recording_name, data_folder=options["data_folder"], cache_folder=options["cache_folder"]
+                        )
+            pending = [i for i in range(len(jobs)) if i not in results_by_job]
+            if len(pending) == 1 or parse.N_JOBS == 1:
+                for i in pending:
+                    source_path, recording_name = jobs[i]
+                    self.progress.emit(i)
+                    results_by_job[i] = recording_import.import_source(
+                        source_path,
+                        recording_name,
+                        progress_callback=lambda idx, total: self.sub_progress.emit(idx, total),
+                        status_callback=self.status_update.emit,
+                        **options,
+                    )
+            elif pending:
+                self.progress.emit(len(jobs) - len(pending))
+                pending_jobs = [jobs[i] for i in pending]
+                for n_done, (j, results, error) in enumerate(recording_import.import_sources(pending_jobs, **options), start=1):
+                    i = pending[j]
+                    if error is not None:
+                        print(f"Failed to read source file at: {jobs[i][0]}: {error}")
+                    results_by_job[i] = results
+                    self.status_update.emit(f"{n_done} / {len(pending)} read")
+                    if n_done < len(pending):
+                        self.progress.emit(len(jobs) - len(pending) + n_done)
+            if fingerprints:
+                for i, fp in fingerprints.items():
+                    source_fingerprint.record(index, fp, jobs[i][1], results_by_job.get(i))
+                source_fingerprint.save_index(self.dict_folders["project"], index)
+            # Rows are added in df_project order, regardless of completion order.
+            for i, df_proj_row in enumerate(proj_rows):
+                results = results_by_job.get(i)
+                if not results:
+                    print(f"Failed to read source file at: {df_proj_row['path']}")
                     continue
-                # Keys are either plain channel ints {ch: df} or split tuples {(ch, label): df}.
-                # Normalise both into recording_name:df, appending _ch / _label suffixes as needed.
-                first_key = next(iter(dict_dfs_raw))
-                split_keys = isinstance(first_key, tuple)
-                n_channels = len({k[0] for k in dict_dfs_raw} if split_keys else dict_dfs_raw)
-                dict_name_df = {}
-                for key, df in dict_dfs_raw.items():
-                    if split_keys:
-                        channel, label = key
-                        ch_suffix = f"_ch{channel}" if n_channels > 1 else ""
-                        dict_name_df[f"{recording_name}{ch_suffix}_{label}"] = df
-                    else:
-                        channel = key
-                        ch_suffix = f"_ch{channel}" if n_channels > 1 else ""
-                        dict_name_df[f"{recording_name}{ch_suffix}"] = df
-                for rec, df_raw in dict_name_df.items():
+                for rec, dict_meta in results:
                     logger.debug("ParseDataThread: %s", rec)
                     print(f"ParseDataThread: {rec}")
-                    df_proj_new_row = self.uisub.create_recording(df_proj_row, rec, df_raw, status_callback=_status_callback)
-                    self.rows.append(df_proj_new_row)
+                    self.rows.append(self.uisub.create_recording_row(df_proj_row, rec, dict_meta))
         except Exception as e:
             logger.exception(f"ParseDataThread.run: EXCEPTION: {e}\n{traceback.format_exc()}")
         finally:
             self.finished.emit()
 
 
+class ProbeSourcesThread(QtCore.QThread):
+    probed = QtCore.pyqtSignal(list, list)  # (paths, probe_source metadata aligned with paths; None where probing failed)
+
+    def __init__(self, paths):
+        super().__init__()
+        self.paths = list(paths)
+
+    def run(self):
+        """Header-only metadata of the selected sources (parse.probe_sources), off the UI thread."""
+        metas = [None] * len(self.paths)
+        try:
+            metas = parse.probe_sources(self.paths)
+        except Exception as e:
+            logger.exception(f"ProbeSourcesThread.run: EXCEPTION: {e}\n{traceback.format_exc()}")
+        finally:
+            self.probed.emit(self.paths, metas)
+
+
+class DetectEventsThread(QtCore.QThread):
+    progress = QtCore.pyqtSignal(int)
+    status_update = QtCore.pyqtSignal(str)
+    finished = QtCore.pyqtSignal()  # custom signal, decoupled from QThread.finished
+
+    def __init__(self, jobs, detect_kwargs):
+        super().__init__()
+        self.jobs = jobs  # [(rec, dfmean or mean parquet path, filter), ...]
+        self.detect_kwargs = detect_kwargs
+        self.dfts = {}  # rec -> dft; None where no stims were found
+        self.errors = {}  # rec -> message
+        self.total = len(jobs)
+
+    def run(self):
+        """Run find_events for every job across a process pool (event_detection.detect_recordings); results stay on the thread for the UI to apply."""
+        try:
+            job_args = [(dfmean, filter) for _, dfmean, filter in self.jobs]
+            for n_done, (i, dft, error) in enumerate(event_detection.detect_recordings(job_args, **self.detect_kwargs), start=1):
+                rec = self.jobs[i][0]
+                if error is not None:
+                    print(f"DetectEventsThread: {rec}: {error}")
+                    self.errors[rec] = error
+                else:
+                    self.dfts[rec] = dft
+                self.status_update.emit(f"{n_done} / {self.total} detected")
+                if n_done < self.total:
+                    self.progress.emit(n_done)
+        except Exception as e:
+            logger.exception(f"DetectEventsThread.run: EXCEPTION: {e}\n{traceback.format_exc()}")
+        finally:
+            self.finished.emit()
+
+
 class graphPreloadThread(QtCore.QThread):
     finished = QtCore.pyqtSignal()
     progress = QtCore.pyqtSignal(int)
@@ -706,7 +788,7 @@ class TableProjSub(QtWidgets.QTableView):
                 return
             dfAdd = dfAdd.drop(dfAdd[dfAdd["path"].isin(duplicates)].index)
             dfAdd["recording_name"] = names
-            # v0.16_n: _migrate_hierarchy called inside parent.addData() -> set_df_project()
+            # v0.16_n: project_schema.migrate_hierarchy called inside parent.addData() -> set_df_project()
             self.parent.addData(dfAdd)
             event.acceptProposedAction()
         else:
@@ -744,6 +826,7 @@ class Filetreesub(Ui_Dialog):
 
         self.tablemodel = TableModel(self.dfAdd)
         self.tableView.setModel(self.tablemodel)
+        self._probe_threads = []  # running ProbeSourcesThreads, kept referenced until they finish
 
     def addDf(self):
         self.parent.slotAddDfData(self.dfAdd)
@@ -763,6 +846,13 @@ class Filetreesub(Ui_Dialog):
         dfAdd["recording_name"] = names
         # v0.16_n note: hierarchy migration happens downstream in set_df_project() via addData
         self.dfAdd = dfAdd
+        # Header-only probe in a worker thread; onSourcesProbed fills rate/duration when it is done
+        thread = ProbeSourcesThread(paths)
+        thread.probed.connect(self.onSourcesProbed)
+        thread.finished.connect(thread.deleteLater)
+        thread.finished.connect(lambda: self._probe_threads.remove(thread) if thread in self._probe_threads else None)
+        self._probe_threads.append(thread)
+        thread.start()
         # TODO: Add a loop that prevents duplicate names by adding a number until it becomes unique
         # format tableView
         header = self.tableView.horizontalHeader()
@@ -771,3 +861,14 @@ class Filetreesub(Ui_Dialog):
         header.setSectionResizeMode(3, QtWidgets.QHeaderView.ResizeToContents)  # name
         header.setSectionResizeMode(4, QtWidgets.QHeaderView.ResizeToContents)  # group
         self.tableView.update()
+
+    def onSourcesProbed(self, paths, metas):
+        # sweeps stays "..." (the unparsed marker) until ParseDataThread has read the source
+        if self.dfAdd["path"].tolist() != list(paths):
+            return  # the selection changed while probing; its own probe fills the table
+        for i, meta in enumerate(metas):
+            if meta is not None:
+                self.dfAdd.loc[i, "sampling_rate"] = meta["sample_rate"]
+                self.dfAdd.loc[i, "sweep_duration"] = meta["sweep_duration"]
+        self.tablemodel.setData(self.dfAdd)
+        self.tableView.update()